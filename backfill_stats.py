@@ -1,5 +1,6 @@
 import os
 import glob
+import gzip
 import re
 import argparse
 from datetime import datetime
@@ -30,19 +31,22 @@ def save_processed_log(timestamp):
 
 def find_log_pairs():
     """Finds matching pairs of debug and putt classification logs."""
-    debug_logs = glob.glob(os.path.join(LOG_DIR, "debug_log_*.txt"))
-    putt_logs = glob.glob(os.path.join(LOG_DIR, "putt_classification_log_*.csv"))
+    # Debug logs of finished sessions are gzip-compressed by tracker_logging.prune_logs.
+    debug_logs = glob.glob(os.path.join(LOG_DIR, "debug_log_*.txt")) + glob.glob(os.path.join(LOG_DIR, "debug_log_*.txt.gz"))
+    # Legacy CSV logs first, so a session's event log (.pel) wins if both exist.
+    putt_logs = glob.glob(os.path.join(LOG_DIR, "putt_classification_log_*.csv")) + \
+        glob.glob(os.path.join(LOG_DIR, "putt_classification_log_*.pel"))
 
     putt_log_map = {
         match.group(1): log
         for log in putt_logs
-        if (match := re.search(r'_(\d{8}_\d{6})\.csv$', log))
+        if (match := re.search(r'_(\d{8}_\d{6})\.(?:csv|pel)$', log))
     }
 
     log_pairs = [
         {"timestamp": match.group(1), "debug_log": debug_log, "putt_log": putt_log_map[match.group(1)]}
         for debug_log in debug_logs
-        if (match := re.search(r'_(\d{8}_\d{6})\.txt$', debug_log)) and match.group(1) in putt_log_map
+        if (match := re.search(r'_(\d{8}_\d{6})\.txt(?:\.gz)?$', debug_log)) and match.group(1) in putt_log_map
     ]
     
     return sorted(log_pairs, key=lambda x: x['timestamp'])
@@ -51,7 +55,8 @@ def extract_player_info(debug_log_path):
     """Parses the debug log to find the player ID and name for the session."""
     player_info_re = re.compile(r"Session started for: (.*) \(ID: ([-]?\d+)\)")
     try:
-        with open(debug_log_path, 'r') as f:
+        opener = gzip.open if debug_log_path.endswith(".gz") else open
+        with opener(debug_log_path, 'rt') as f:
             for line in f:
                 if match := player_info_re.search(line):
                     player_id = int(match.group(2))
@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class _KalmanTrack:
+    """Constant-velocity Kalman filter for one ball's center, with a variable time step."""
+
+    def __init__(self, detection, timestamp, process_noise, measurement_noise):
+        center_x, center_y, x1, y1, x2, y2, confidence = detection
+        self.state = np.array([center_x, center_y, 0.0, 0.0], dtype=np.float64)  # x, y, vx, vy
+        self.covariance = np.diag([measurement_noise, measurement_noise, 1e4, 1e4]).astype(np.float64)
+        self.half_size = ((x2 - x1) / 2.0, (y2 - y1) / 2.0)
+        self.confidence = confidence
+        self.timestamp = timestamp
+        self.last_detection_time = timestamp
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+    def _transition(self, dt):
+        f = np.eye(4)
+        f[0, 2] = f[1, 3] = dt
+        # Piecewise white-acceleration noise model
+        q = self.process_noise * np.array([
+            [dt ** 4 / 4, 0, dt ** 3 / 2, 0],
+            [0, dt ** 4 / 4, 0, dt ** 3 / 2],
+            [dt ** 3 / 2, 0, dt ** 2, 0],
+            [0, dt ** 3 / 2, 0, dt ** 2],
+        ])
+        return f, q
+
+    def predict(self, timestamp):
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return
+        f, q = self._transition(dt)
+        self.state = f @ self.state
+        self.covariance = f @ self.covariance @ f.T + q
+        self.timestamp = timestamp
+
+    def correct(self, detection, timestamp):
+        center_x, center_y, x1, y1, x2, y2, confidence = detection
+        self.predict(timestamp)
+        h = np.array([[1.0, 0, 0, 0], [0, 1.0, 0, 0]])
+        r = np.eye(2) * self.measurement_noise
+        innovation = np.array([center_x, center_y]) - h @ self.state
+        s = h @ self.covariance @ h.T + r
+        k = self.covariance @ h.T @ np.linalg.inv(s)
+        self.state = self.state + k @ innovation
+        self.covariance = (np.eye(4) - k @ h) @ self.covariance
+        self.half_size = ((x2 - x1) / 2.0, (y2 - y1) / 2.0)
+        self.confidence = confidence
+        self.last_detection_time = timestamp
+
+    def as_detection(self):
+        center_x, center_y = self.state[0], self.state[1]
+        half_w, half_h = self.half_size
+        return (center_x, center_y, center_x - half_w, center_y - half_h,
+                center_x + half_w, center_y + half_h, self.confidence)
+
+
+class BallTracker:
+    """
+    Predicts ball positions on frames where the detector did not run.
+
+    Each detected ball gets a constant-velocity Kalman track. When the detector runs, tracks
+    are matched to the new detections by nearest center and corrected; unmatched detections
+    start new tracks. On skipped frames predict() extrapolates every live track to the frame
+    time and returns tuples in the same format as VideoProcessor.process_frame, so the
+    classifier gets a position on every frame and quick events between detector runs (a ball
+    crossing the hole quadrants) are not lost.
+    """
+
+    def __init__(self, max_match_distance=80.0, max_coast_seconds=0.5, process_noise=5e5, measurement_noise=4.0):
+        """
+        Args:
+            max_match_distance (float): Largest pixel distance between a predicted track and a
+                detection for them to be considered the same ball.
+            max_coast_seconds (float): How long a track is extrapolated without a detection
+                before it is dropped.
+            process_noise (float): Acceleration noise of the motion model (pixels^2/s^4).
+            measurement_noise (float): Variance of detected centers (pixels^2).
+        """
+        self.max_match_distance = max_match_distance
+        self.max_coast_seconds = max_coast_seconds
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.tracks = []
+
+    def update(self, detections, timestamp):
+        """Feeds the detector output for the frame captured at timestamp."""
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        unmatched_tracks = list(range(len(self.tracks)))
+        matched = []
+        # Greedy nearest-neighbour association, most confident detections first
+        for detection in sorted(detections, key=lambda d: d[6], reverse=True):
+            best_index, best_distance = None, self.max_match_distance
+            for i in unmatched_tracks:
+                track = self.tracks[i]
+                distance = np.hypot(track.state[0] - detection[0], track.state[1] - detection[1])
+                if distance <= best_distance:
+                    best_index, best_distance = i, distance
+            if best_index is None:
+                matched.append(_KalmanTrack(detection, timestamp, self.process_noise, self.measurement_noise))
+            else:
+                track = self.tracks[best_index]
+                track.correct(detection, timestamp)
+                unmatched_tracks.remove(best_index)
+                matched.append(track)
+
+        # A ball the detector no longer sees after it ran is gone (e.g. dropped into the hole),
+        # so only tracks confirmed by this detection pass survive.
+        self.tracks = matched
+
+    def predict(self, timestamp):
+        """
+        Returns predicted detections for a frame on which the detector did not run.
+
+        Returns:
+            list: Tuples of (center_x, center_y, x1, y1, x2, y2, confidence). Empty once every
+                track has gone max_coast_seconds without a detection.
+        """
+        alive = []
+        for track in self.tracks:
+            if timestamp - track.last_detection_time > self.max_coast_seconds:
+                continue
+            track.predict(timestamp)
+            alive.append(track)
+        self.tracks = alive
+        return [track.as_detection() for track in alive]
@@ -0,0 +1,108 @@
+"""
+Measures the per-frame cost of PuttClassifier.update_and_classify on a synthetic workload.
+
+Putt trajectories (mat -> ramp -> hole quadrants) and stray detections are generated from a
+calibration file and fed to two classifiers, one using the precomputed ROI label raster and
+one using per-frame cv2.pointPolygonTest calls. The outputs of both are compared frame by
+frame, so the benchmark also checks that the raster does not change any classification.
+"""
+import time
+import logging
+import argparse
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from putt_classifier import PuttClassifier
+from roi_config import load_and_prepare_rois
+
+TRAJECTORY_ROIS = ("PUTTING_MAT_ROI", "RAMP_CENTER_ROI", "HOLE_ROI", "HOLE_LOW_ROI", "CATCH_ROI", "RETURN_TRACK_ROI")
+
+
+def roi_center(rois, name):
+    data = rois.get(name)
+    if isinstance(data, dict) and 'points' in data:
+        data = data['points']
+    points = np.array(data, dtype=np.float64).reshape(-1, 2)
+    return points.mean(axis=0) if len(points) else None
+
+
+def make_detection(x, y, confidence, half_size=12):
+    return (x, y, x - half_size, y - half_size, x + half_size, y + half_size, confidence)
+
+
+def synthetic_frames(rois, num_frames, fps=30.0, seed=0, max_stray_balls=2):
+    """Yields (frame_time, detections) for repeated putts through the ROIs plus random stray balls."""
+    rng = np.random.default_rng(seed)
+    waypoints = [c for c in (roi_center(rois, name) for name in TRAJECTORY_ROIS) if c is not None]
+    all_points = np.concatenate([np.array(d['points'] if isinstance(d, dict) else d, dtype=np.float64).reshape(-1, 2)
+                                 for name, d in rois.items() if name != "camera_index"])
+    low, high = all_points.min(axis=0), all_points.max(axis=0)
+
+    steps_per_leg = 12
+    path = []
+    for start, end in zip(waypoints, waypoints[1:]):
+        for t in np.linspace(0.0, 1.0, steps_per_leg, endpoint=False):
+            path.append(start + (end - start) * t)
+    path.extend([waypoints[-1]] * steps_per_leg)  # Rest before the next putt
+
+    for i in range(num_frames):
+        detections = []
+        x, y = path[i % len(path)] + rng.normal(0.0, 2.0, size=2)
+        detections.append(make_detection(float(x), float(y), float(rng.uniform(0.6, 0.95))))
+        for _ in range(rng.integers(0, max_stray_balls + 1)):
+            x, y = rng.uniform(low, high)
+            detections.append(make_detection(float(x), float(y), float(rng.uniform(0.25, 0.6))))
+        yield i / fps, detections
+
+
+def run(classifier, workload):
+    outputs, timings = [], []
+    for frame_time, detections in workload:
+        t0 = time.perf_counter()
+        result = classifier.update_and_classify(list(detections), frame_time)
+        timings.append((time.perf_counter() - t0) * 1e6)
+        outputs.append(result)
+    return outputs, np.array(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the putt classifier's ROI lookups.")
+    parser.add_argument("--config", default="calibration_output.json", help="Calibration JSON to build the ROIs from.")
+    parser.add_argument("--frames", type=int, default=20000, help="Number of synthetic frames.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic detections.")
+    parser.add_argument("--max_stray_balls", type=int, default=2, help="Maximum extra balls per frame, e.g. 20 for a crowded practice session.")
+    args = parser.parse_args()
+
+    console = Console()
+    logger = logging.getLogger("benchmark_classifier")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    rois = load_and_prepare_rois(args.config, logger)
+    if rois is None:
+        console.print(f"[bold red]Could not load ROIs from {args.config}.[/bold red]")
+        raise SystemExit(1)
+
+    workload = list(synthetic_frames(rois, args.frames, seed=args.seed, max_stray_balls=args.max_stray_balls))
+    build_start = time.perf_counter()
+    raster_classifier = PuttClassifier(None, rois, logger, use_roi_raster=True)
+    build_ms = (time.perf_counter() - build_start) * 1000.0
+    polygon_classifier = PuttClassifier(None, rois, logger, use_roi_raster=False)
+
+    polygon_outputs, polygon_times = run(polygon_classifier, workload)
+    raster_outputs, raster_times = run(raster_classifier, workload)
+    mismatches = sum(a != b for a, b in zip(polygon_outputs, raster_outputs))
+
+    table = Table(title=f"update_and_classify over {len(workload)} synthetic frames (us per frame)")
+    for column in ("ROI lookup", "Mean", "P50", "P99"):
+        table.add_column(column)
+    for label, times in (("pointPolygonTest", polygon_times), ("label raster", raster_times)):
+        table.add_row(label, f"{times.mean():.1f}", f"{np.percentile(times, 50):.1f}", f"{np.percentile(times, 99):.1f}")
+    console.print(table)
+    console.print(f"Raster build time: {build_ms:.1f} ms, speedup: {polygon_times.mean() / raster_times.mean():.2f}x")
+
+    if mismatches:
+        console.print(f"[bold red]{mismatches} frames classified differently with the raster.[/bold red]")
+        raise SystemExit(1)
+    console.print("[bold green]Raster and polygon classifications are identical.[/bold green]")
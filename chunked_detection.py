@@ -0,0 +1,198 @@
+"""
+Parallel detection for long recorded videos.
+
+The video is split into time chunks, and each chunk is decoded and run through the YOLO
+detector in its own worker process. Detections come back in frame order and are classified
+sequentially by run_tracker, exactly as in a single-process run: every frame keeps its own
+video timestamp, and the detector's output for a frame depends on that frame alone, so chunk
+boundaries cannot change a classification.
+
+The classical detector cannot be split this way. Its background model depends on every
+earlier frame, so a chunk started mid-video would see different foreground blobs.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+
+from tracker_pipeline import FramePacket
+from video_processor import VideoProcessor
+from inference_engines import exported_model_path, export_model
+
+_detector = None  # Built once per worker process by _init_worker
+
+
+def plan_chunks(frame_count, fps, chunk_seconds):
+    """
+    Splits a video into consecutive frame ranges of about chunk_seconds each.
+
+    Returns:
+        list: (start, end) frame indices, end exclusive. The last chunk's end is None so it reads
+            to the end of the file, since CAP_PROP_FRAME_COUNT is only an estimate for some containers.
+    """
+    chunk_frames = max(1, int(round(chunk_seconds * (fps if fps and fps > 0 else 30.0))))
+    starts = list(range(0, max(1, frame_count), chunk_frames))
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def _init_worker(model_path, engine, threads, rois, roi_crop_padding, frame_shape):
+    global _detector
+    cv2.setNumThreads(1)  # Parallelism comes from the worker processes
+    _detector = VideoProcessor(model_path=model_path, min_bbox_area=50, engine=engine, threads=threads)
+    if rois is not None:
+        _detector.set_roi_crop(rois, padding=roi_crop_padding)
+    _detector.warmup(frame_shape)
+
+
+def _open_at(video_path, start):
+    """Opens the video positioned so the next read returns frame `start`."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {video_path}")
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+            # Seeking is not frame-accurate for this file; decode up to the chunk instead.
+            cap.release()
+            cap = cv2.VideoCapture(video_path)
+            for _ in range(start):
+                if not cap.grab():
+                    break
+    return cap
+
+
+def detect_chunk(video_path, start, end, batch_size=1):
+    """
+    Runs the worker's detector on frames [start, end) of a video (to the end of the file if end is None).
+
+    Returns:
+        tuple: (start, video_times, detections) with one video time (CAP_PROP_POS_MSEC, as the
+            capture stage reports it) and one detected_balls list per frame read.
+    """
+    cap = _open_at(video_path, start)
+    video_times, detections, batch = [], [], []
+    try:
+        while end is None or start + len(video_times) < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            video_times.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+            batch.append(frame)
+            if len(batch) >= batch_size:
+                detections.extend(_detector.process_batch(batch))
+                batch = []
+        if batch:
+            detections.extend(_detector.process_batch(batch))
+    finally:
+        cap.release()
+    return start, video_times, detections
+
+
+class ChunkedDetectionPipeline:
+    """
+    Stands in for TrackerPipeline when a recorded video is processed with a pool of detector
+    processes.
+
+    All chunks are queued on the pool at start(); results() yields FramePackets in frame order
+    as soon as the chunk holding them is done, so classification overlaps detection of later
+    chunks. Frames stay in the workers, so each packet carries a 1x1 placeholder frame.
+    """
+
+    def __init__(self, video_path, rois, logger, model_path, engine="ultralytics", threads=None, workers=None,
+                 chunk_seconds=60.0, batch_size=1, roi_crop=True, roi_crop_padding=32):
+        """
+        Args:
+            video_path (str): The recorded video.
+            rois (dict): Calibrated ROIs, used for the detector's ROI crop.
+            logger: Logger used for pipeline status and errors.
+            model_path (str): Detector model, as for VideoProcessor.
+            engine (str): Inference backend, one of inference_engines.ENGINES.
+            threads (int): Intra-op threads per worker. Defaults to the CPU count divided by the workers.
+            workers (int): Number of detector processes. Defaults to the CPU count.
+            chunk_seconds (float): Length of video each worker decodes and detects at a time.
+            batch_size (int): Frames handed to the detector at once within a chunk.
+            roi_crop (bool): Restrict inference to the union rectangle of the ROIs, as run_tracker does.
+            roi_crop_padding (int): Pixels of margin added around the ROI crop.
+        """
+        self.video_path = video_path
+        self.rois = rois
+        self.logger = logger
+        self.model_path = model_path
+        self.engine = engine
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.chunk_seconds = chunk_seconds
+        self.batch_size = max(1, batch_size)
+        self.roi_crop = roi_crop
+        self.roi_crop_padding = roi_crop_padding
+        self.placeholder_frame = np.zeros((1, 1, 3), dtype=np.uint8)
+        self.executor = None
+        self.chunks = []
+        self.futures = []
+        self.detected_chunks = 0
+        self.delivered = 0
+        self.start_time = None
+
+    def start(self):
+        cap = cv2.VideoCapture(self.video_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 1080, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1920, 3)
+        cap.release()
+
+        if self.engine != "ultralytics" and self.model_path.endswith(".pt") and \
+                not os.path.exists(exported_model_path(self.model_path, self.engine)):
+            # Export once up front instead of in every worker at the same time.
+            self.logger.info(f"Exporting {self.model_path} for {self.engine}...")
+            with ProcessPoolExecutor(max_workers=1) as exporter:
+                exporter.submit(export_model, self.model_path, self.engine).result()
+
+        self.start_time = time.time()
+        self.chunks = plan_chunks(frame_count, fps, self.chunk_seconds)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(self.model_path, self.engine, self.threads, self.rois if self.roi_crop else None,
+                      self.roi_crop_padding, frame_shape))
+        self.futures = [self.executor.submit(detect_chunk, self.video_path, start, end, self.batch_size)
+                        for start, end in self.chunks]
+        self.logger.info(f"Chunked detection started: {len(self.chunks)} chunks of {self.chunk_seconds:.0f}s "
+                         f"on {self.workers} workers with {self.threads} threads each.")
+
+    def results(self):
+        """Yields FramePackets with detections in frame order until the video is exhausted or stop() is called."""
+        next_index = 0
+        for future in self.futures:
+            try:
+                start, video_times, detections = future.result()
+            except Exception as e:
+                self.logger.error(f"Detection failed for chunk starting at frame {next_index}: {e}", exc_info=True)
+                return
+            self.detected_chunks += 1
+            if not video_times:
+                continue
+            if start != next_index:
+                # An earlier chunk hit the end of the file before its planned end while this one read frames.
+                self.logger.error(f"Chunk starting at frame {start} does not follow frame {next_index - 1}; stopping.")
+                return
+            for video_time, detected_balls in zip(video_times, detections):
+                packet = FramePacket(next_index, time.time(), video_time, self.placeholder_frame)
+                packet.detections = detected_balls
+                next_index += 1
+                self.delivered += 1
+                yield packet
+
+    def set_classifier_state(self, state):
+        """Detection does not depend on the classifier state; kept for TrackerPipeline compatibility."""
+
+    def stop(self):
+        """Cancels chunks not yet started, waits for running ones and logs a throughput summary."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.log_stats()
+
+    def log_stats(self):
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        end_to_end_fps = self.delivered / elapsed if elapsed > 0 else 0.0
+        self.logger.info(f"Chunked detection stats: chunks={self.detected_chunks}/{len(self.chunks)}, "
+                         f"delivered={self.delivered}, end_to_end_fps={end_to_end_fps:.1f}")
@@ -0,0 +1,121 @@
+import math
+import cv2
+import numpy as np
+from video_processor import compute_roi_crop_rect
+
+
+class ClassicalBallDetector:
+    """
+    Golf ball detector for low-end hardware, using background subtraction and blob filtering
+    instead of a neural network.
+
+    Only the union rectangle of the calibrated ROIs is processed, at reduced resolution, and
+    foreground pixels outside the ROI polygons are discarded. A foreground blob is reported
+    as a ball when it is bright (golf balls are white against the green mat), roughly
+    circular and of plausible size. process_frame has the same output contract as
+    VideoProcessor.process_frame, so the classifier does not know which detector is in use.
+    """
+
+    def __init__(self, rois, min_bbox_area=50, max_bbox_area=4000, min_circularity=0.55,
+                 min_brightness=150, downscale=2, history=600, var_threshold=32, padding=32):
+        """
+        Args:
+            rois (dict): Calibrated ROIs, as returned by load_and_prepare_rois.
+            min_bbox_area (int): Minimum full-resolution bounding box area of a ball.
+            max_bbox_area (int): Maximum full-resolution bounding box area of a ball.
+            min_circularity (float): Minimum 4*pi*area/perimeter^2 of a blob (1.0 is a perfect circle).
+            min_brightness (int): Minimum grayscale value for a pixel to belong to a ball.
+            downscale (int): Factor the ROI region is shrunk by before processing.
+            history (int): Frames the background model remembers. A long history keeps a ball
+                resting on the mat from fading into the background between putts.
+            var_threshold (float): MOG2 variance threshold for foreground pixels.
+            padding (int): Margin around the ROI region, as for the YOLO crop.
+        """
+        self.model = None  # No neural network; kept so callers can pass detector.model like VideoProcessor's
+        self.rois = rois
+        self.min_bbox_area = min_bbox_area
+        self.max_bbox_area = max_bbox_area
+        self.min_circularity = min_circularity
+        self.min_brightness = min_brightness
+        self.downscale = max(1, int(downscale))
+        self.crop_rect = compute_roi_crop_rect(rois, padding)
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold, detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.region = None
+        self.mask = None
+
+    def _prepare_region(self, frame_shape):
+        """Clips the ROI rectangle to the frame and builds the downscaled ROI polygon mask."""
+        frame_h, frame_w = frame_shape[:2]
+        if self.crop_rect is None:
+            x1, y1, x2, y2 = 0, 0, frame_w, frame_h
+        else:
+            x1, y1, x2, y2 = self.crop_rect
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(frame_w, x2), min(frame_h, y2)
+        self.region = (x1, y1, x2, y2, frame_shape[:2])
+
+        size = ((x2 - x1) // self.downscale, (y2 - y1) // self.downscale)
+        self.mask = np.zeros((size[1], size[0]), dtype=np.uint8)
+        for name, data in self.rois.items():
+            if name in ("camera_index", "IGNORE_AREA_ROI"):
+                continue
+            if isinstance(data, dict) and 'points' in data:
+                data = data['points']
+            points = np.array(data, dtype=np.int32).reshape(-1, 2)
+            if len(points) >= 3:
+                cv2.fillPoly(self.mask, [(points - [x1, y1]) // self.downscale], 255)
+        if not self.mask.any():
+            self.mask[:] = 255
+
+    def process_frame(self, frame):
+        """
+        Detects golf balls in a frame.
+
+        Returns:
+            A list of (center_x, center_y, x1, y1, x2, y2, confidence) tuples in full-frame
+            coordinates, where confidence is the blob's circularity.
+        """
+        if self.region is None or self.region[4] != frame.shape[:2]:
+            self._prepare_region(frame.shape)
+        x1, y1, x2, y2, _ = self.region
+
+        region = frame[y1:y2, x1:x2]
+        small = cv2.resize(region, (self.mask.shape[1], self.mask.shape[0]), interpolation=cv2.INTER_AREA)
+        foreground = self.subtractor.apply(small)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        _, bright = cv2.threshold(gray, self.min_brightness, 255, cv2.THRESH_BINARY)
+        candidates = cv2.bitwise_and(cv2.bitwise_and(foreground, bright), self.mask)
+        candidates = cv2.morphologyEx(candidates, cv2.MORPH_OPEN, self.kernel)
+
+        contours, _ = cv2.findContours(candidates, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        scale = self.downscale
+        area_scale = scale * scale
+        detected_balls = []
+        for contour in contours:
+            bx, by, bw, bh = cv2.boundingRect(contour)
+            bbox_area = bw * bh * area_scale
+            if bbox_area < self.min_bbox_area or bbox_area > self.max_bbox_area:
+                continue
+            perimeter = cv2.arcLength(contour, True)
+            if perimeter == 0:
+                continue
+            circularity = 4 * math.pi * cv2.contourArea(contour) / (perimeter * perimeter)
+            if circularity < self.min_circularity:
+                continue
+
+            ball_x1, ball_y1 = x1 + bx * scale, y1 + by * scale
+            ball_x2, ball_y2 = ball_x1 + bw * scale, ball_y1 + bh * scale
+            center_x, center_y = (ball_x1 + ball_x2) / 2, (ball_y1 + ball_y2) / 2
+            confidence = min(1.0, circularity)
+            detected_balls.append((center_x, center_y, ball_x1, ball_y1, ball_x2, ball_y2, confidence))
+
+        return detected_balls
+
+    def process_batch(self, frames):
+        """Processes frames one at a time; the background model depends on their order."""
+        return [self.process_frame(frame) for frame in frames]
+
+    def warmup(self, frame_shape=(1080, 1920, 3), runs=2):
+        """Builds the ROI mask up front. The background model learns from real frames only."""
+        self._prepare_region(frame_shape)
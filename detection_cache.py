@@ -0,0 +1,162 @@
+"""
+Columnar on-disk cache of the detector's per-frame output.
+
+run_tracker --save_detections writes one cache per session, and rescore_detections.py feeds
+it back through PuttClassifier without decoding video or running the detector. A cache is a
+compressed .npz file with:
+
+    frame_time    (N,) float64   capture time (live) or video time (files) of each frame, seconds
+    ball_offsets  (N + 1,) int64 frame i's detections are balls[ball_offsets[i]:ball_offsets[i + 1]]
+    balls         (M, 7) float64 center_x, center_y, x1, y1, x2, y2, confidence
+    metadata      JSON string    ROIs, session settings and recorded results
+
+While a session runs, detections are appended in chunks of CHUNK_FRAMES frames to
+<cache>.partial, so a crash keeps everything but the last chunk and memory does not grow with
+the session. close() turns the partial file into the .npz and removes it. A partial file left
+by a crash can be loaded (and re-scored) directly; it has no recorded results.
+
+    partial file  metadata length u32, metadata JSON
+                  then per chunk: frames u32, balls u32, frame_time float64[frames],
+                  ball counts int64[frames], balls float64[balls, 7]
+"""
+import os
+import json
+import struct
+import numpy as np
+
+CACHE_VERSION = 1
+CHUNK_FRAMES = 256  # Frames buffered in memory before a chunk is appended to the partial file
+PARTIAL_SUFFIX = ".partial"
+_PARTIAL_LENGTH = struct.Struct("<I")
+_CHUNK_HEADER = struct.Struct("<II")
+BALL_COLUMNS = ("center_x", "center_y", "x1", "y1", "x2", "y2", "confidence")
+
+
+def _to_json(value):
+    """Lets json.dumps handle the NumPy arrays and scalars in prepared ROIs."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class DetectionCacheWriter:
+    """Appends detections to a partial file chunk by chunk and writes the cache on close()."""
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.metadata = dict(metadata or {})
+        self.metadata["version"] = CACHE_VERSION
+        self.frame_count = 0
+        self._frame_times = []
+        self._ball_counts = []
+        self._balls = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(self.partial_path, "wb")
+        data = json.dumps(self.metadata, default=_to_json).encode("utf-8")
+        self._file.write(_PARTIAL_LENGTH.pack(len(data)) + data)
+        self._file.flush()
+
+    def append(self, frame_time, detected_balls):
+        """Adds one frame. detected_balls is a list of (center_x, center_y, x1, y1, x2, y2, confidence)."""
+        self._frame_times.append(frame_time)
+        self._ball_counts.append(len(detected_balls))
+        self._balls.extend(detected_balls)
+        self.frame_count += 1
+        if len(self._frame_times) >= CHUNK_FRAMES:
+            self._write_chunk()
+
+    def close(self, **extra_metadata):
+        """Writes the cache, adding extra_metadata (e.g. recorded results), removes the partial file and returns the cache path."""
+        self._write_chunk()
+        self._file.close()
+        frame_time, ball_offsets, balls, _ = read_partial(self.partial_path)
+        self.metadata.update(extra_metadata)
+
+        tmp_path = self.path + ".tmp.npz"
+        np.savez_compressed(tmp_path, frame_time=frame_time, ball_offsets=ball_offsets, balls=balls,
+                            metadata=np.array(json.dumps(self.metadata, default=_to_json)))
+        os.replace(tmp_path, self.path)
+        os.remove(self.partial_path)
+        return self.path
+
+    def _write_chunk(self):
+        if not self._frame_times:
+            return
+        balls = np.array(self._balls, dtype=np.float64).reshape(-1, len(BALL_COLUMNS))
+        # One write per chunk, so a crash can only cut the last chunk short.
+        self._file.write(_CHUNK_HEADER.pack(len(self._frame_times), len(balls))
+                         + np.array(self._frame_times, dtype=np.float64).tobytes()
+                         + np.array(self._ball_counts, dtype=np.int64).tobytes()
+                         + balls.tobytes())
+        self._file.flush()
+        self._frame_times, self._ball_counts, self._balls = [], [], []
+
+
+def read_partial(path):
+    """
+    Reads a partial cache file, ignoring a chunk cut short by a crash.
+
+    Returns:
+        tuple: (frame_time, ball_offsets, balls, metadata), as stored in a cache.
+    """
+    with open(path, "rb") as f:
+        head = f.read(_PARTIAL_LENGTH.size)
+        if len(head) < _PARTIAL_LENGTH.size:
+            raise ValueError(f"{path} is not a detection cache.")
+        (length,) = _PARTIAL_LENGTH.unpack(head)
+        metadata = json.loads(f.read(length))
+        frame_times, ball_counts, ball_blocks = [], [], []
+        while True:
+            head = f.read(_CHUNK_HEADER.size)
+            if len(head) < _CHUNK_HEADER.size:
+                break
+            n_frames, n_balls = _CHUNK_HEADER.unpack(head)
+            size = 16 * n_frames + 8 * len(BALL_COLUMNS) * n_balls
+            body = f.read(size)
+            if len(body) < size:
+                break
+            frame_times.append(np.frombuffer(body, np.float64, n_frames))
+            ball_counts.append(np.frombuffer(body, np.int64, n_frames, 8 * n_frames))
+            ball_blocks.append(np.frombuffer(body, np.float64, n_balls * len(BALL_COLUMNS), 16 * n_frames))
+
+    counts = np.concatenate(ball_counts) if ball_counts else np.zeros(0, dtype=np.int64)
+    ball_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=ball_offsets[1:])
+    frame_time = np.concatenate(frame_times) if frame_times else np.zeros(0, dtype=np.float64)
+    balls = (np.concatenate(ball_blocks) if ball_blocks else np.zeros(0, dtype=np.float64)).reshape(-1, len(BALL_COLUMNS))
+    return frame_time, ball_offsets, balls, metadata
+
+
+class DetectionCache:
+    """A loaded detection cache."""
+
+    def __init__(self, frame_time, ball_offsets, balls, metadata):
+        self.frame_time = frame_time
+        self.ball_offsets = ball_offsets
+        self.balls = balls
+        self.metadata = metadata
+
+    @classmethod
+    def load(cls, path):
+        """Loads a cache, or the partial file of a session that did not finish."""
+        if path.endswith(PARTIAL_SUFFIX):
+            frame_time, ball_offsets, balls, metadata = read_partial(path)
+            if metadata.get("version") != CACHE_VERSION:
+                raise ValueError(f"{path}: unsupported detection cache version {metadata.get('version')}")
+            return cls(frame_time, ball_offsets, balls, metadata)
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if metadata.get("version") != CACHE_VERSION:
+                raise ValueError(f"{path}: unsupported detection cache version {metadata.get('version')}")
+            return cls(data["frame_time"], data["ball_offsets"], data["balls"], metadata)
+
+    def __len__(self):
+        return len(self.frame_time)
+
+    def frames(self):
+        """Yields (frame_time, detected_balls) in the format VideoProcessor.process_frame returns."""
+        rows = self.balls.tolist()
+        offsets = self.ball_offsets.tolist()
+        for i, frame_time in enumerate(self.frame_time.tolist()):
+            yield frame_time, [tuple(row) for row in rows[offsets[i]:offsets[i + 1]]]
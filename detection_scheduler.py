@@ -0,0 +1,83 @@
+from putt_classifier import PuttStatus
+
+# Default detector rates (frames per second) per classifier state. None means every frame.
+DEFAULT_STATE_FPS = {
+    PuttStatus.WAITING: 10.0,
+    PuttStatus.PUTT_IN_PROGRESS: None,
+    PuttStatus.AWAITING_RETURN: 10.0,
+}
+
+
+class _StateStats:
+    __slots__ = ("frames", "detections", "seconds")
+
+    def __init__(self):
+        self.frames = 0
+        self.detections = 0
+        self.seconds = 0.0
+
+
+class DetectionScheduler:
+    """
+    Decides which frames the detector runs on, based on the classifier's current state.
+
+    While waiting for a ball on the mat the detector runs at a reduced rate; during a putt it
+    runs on every frame, since those frames decide MAKE vs MISS. The classifier/output stage
+    reports the state with set_state() and the inference stage asks should_detect() per frame.
+    """
+
+    def __init__(self, state_fps=None):
+        """
+        Args:
+            state_fps (dict): PuttStatus value -> maximum detector fps (None for every frame).
+                States that are not listed run on every frame.
+        """
+        self.state_fps = dict(DEFAULT_STATE_FPS if state_fps is None else state_fps)
+        self.state = PuttStatus.WAITING
+        self.last_detection_time = None
+        self.last_frame_time = None
+        self.stats = {}
+
+    def set_state(self, state):
+        """Called with PuttClassifier.current_state after each classified frame."""
+        if state != self.state:
+            self.state = state
+            self.last_detection_time = None  # Run the detector on the next frame after any transition
+
+    def should_detect(self, timestamp):
+        """True if the detector should run on the frame captured at timestamp."""
+        fps = self.state_fps.get(self.state)
+        if not fps or self.last_detection_time is None:
+            return True
+        return (timestamp - self.last_detection_time) >= (1.0 / fps) - 1e-3
+
+    def record(self, timestamp, detected):
+        """Records whether the detector ran on the frame captured at timestamp."""
+        stats = self.stats.get(self.state)
+        if stats is None:
+            stats = self.stats[self.state] = _StateStats()
+        stats.frames += 1
+        if detected:
+            stats.detections += 1
+            self.last_detection_time = timestamp
+        if self.last_frame_time is not None and timestamp > self.last_frame_time:
+            stats.seconds += timestamp - self.last_frame_time
+        self.last_frame_time = timestamp
+
+    def report(self):
+        """
+        Returns the effective rates per state.
+
+        Returns:
+            dict: state -> {"frames", "detections", "seconds", "frame_fps", "detection_fps"}
+        """
+        report = {}
+        for state, stats in self.stats.items():
+            report[state] = {
+                "frames": stats.frames,
+                "detections": stats.detections,
+                "seconds": round(stats.seconds, 2),
+                "frame_fps": round(stats.frames / stats.seconds, 2) if stats.seconds > 0 else 0.0,
+                "detection_fps": round(stats.detections / stats.seconds, 2) if stats.seconds > 0 else 0.0,
+            }
+        return report
@@ -0,0 +1,431 @@
+"""
+Shared-memory frame bus for several local consumers of one camera.
+
+One process owns the camera and publishes every captured frame; the tracker, calibration.py,
+a preview window, a clip recorder or the OBS feed then read the same frames without opening
+the device again.
+
+Frames are written into a ring of fixed-size slots in a multiprocessing.shared_memory block.
+Each slot has a sequence number that works as a seqlock: the publisher makes it odd while
+writing frame n (2n - 1) and even once the frame is complete (2n). A reader accepts a frame
+only if the number was 2n both before and after its read, so it never sees a torn frame and
+never blocks the publisher. A reader that falls a whole ring behind skips to the newest frame,
+like a live camera.
+
+    python frame_bus.py --camera_index 0                      # publish camera 0
+    python frame_bus.py --name proofofputt_camera_0 --preview # watch it from another process
+    python run_tracker.py --frame_bus proofofputt_camera_0 --player_id 1 --session_id 2
+"""
+import os
+import time
+import argparse
+from multiprocessing import shared_memory, resource_tracker
+import cv2
+import numpy as np
+
+BUS_MAGIC = 0x50505442  # "PPTB"
+BUS_VERSION = 1
+ALIGNMENT = 64
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("channels", "<u4"),
+    ("slots", "<u4"),
+    ("fps", "<f8"),
+    ("latest", "<u8"),   # Number of the newest complete frame (frames are numbered from 1)
+    ("closed", "<u4"),
+    ("pid", "<u4"),      # Publisher process, used to recognize segments left by a crashed publisher
+])
+
+SLOT_HEADER_DTYPE = np.dtype([
+    ("seq", "<u8"),           # 2n - 1 while frame n is written, 2n once it is complete
+    ("capture_time", "<f8"),  # Publisher's time.time() when the frame was captured
+])
+
+
+def default_bus_name(camera_index):
+    return f"proofofputt_camera_{camera_index}"
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _BusLayout:
+    """Typed views of a bus segment: the header, the slot headers and the frame slots."""
+
+    HEADER_SIZE = _aligned(HEADER_DTYPE.itemsize)
+    SLOT_HEADER_SIZE = _aligned(SLOT_HEADER_DTYPE.itemsize)
+
+    def __init__(self, buf, frame_shape, slots):
+        frame_size = _aligned(int(np.prod(frame_shape)))
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buf)
+        self.slot_headers = []
+        self.frames = []
+        offset = self.HEADER_SIZE
+        for _ in range(slots):
+            self.slot_headers.append(np.ndarray((), dtype=SLOT_HEADER_DTYPE, buffer=buf, offset=offset))
+            offset += self.SLOT_HEADER_SIZE
+            self.frames.append(np.ndarray(frame_shape, dtype=np.uint8, buffer=buf, offset=offset))
+            offset += frame_size
+
+    @classmethod
+    def size_for(cls, frame_shape, slots):
+        return cls.HEADER_SIZE + slots * (cls.SLOT_HEADER_SIZE + _aligned(int(np.prod(frame_shape))))
+
+
+def _frame_shape(header):
+    channels = int(header["channels"])
+    shape = (int(header["height"]), int(header["width"]))
+    return shape + (channels,) if channels > 1 else shape
+
+
+class FrameBusPublisher:
+    """Creates a frame bus and writes frames into it. Only one publisher may own a bus."""
+
+    def __init__(self, name, frame_shape, slots=8, fps=0.0):
+        """
+        Args:
+            name (str): Shared memory name consumers attach to.
+            frame_shape (tuple): (height, width, channels) of every published frame.
+            slots (int): Frames kept in the ring. Readers more than this many frames behind skip ahead.
+            fps (float): Nominal frame rate, reported to readers through FrameBusCapture.get.
+        """
+        self.name = name
+        self.frame_shape = tuple(frame_shape)
+        self.slots = max(2, int(slots))
+        size = _BusLayout.size_for(self.frame_shape, self.slots)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._remove_stale_segment(name)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.layout = _BusLayout(self.shm.buf, self.frame_shape, self.slots)
+        header = self.layout.header
+        header["height"], header["width"] = self.frame_shape[:2]
+        header["channels"] = self.frame_shape[2] if len(self.frame_shape) > 2 else 1
+        header["slots"] = self.slots
+        header["fps"] = fps or 0.0
+        header["latest"] = 0
+        header["closed"] = 0
+        header["pid"] = os.getpid()
+        header["version"] = BUS_VERSION
+        header["magic"] = BUS_MAGIC  # Written last: readers wait for it
+        self.latest = 0
+
+    @staticmethod
+    def _remove_stale_segment(name):
+        """Unlinks a segment left behind by a publisher that exited without closing it."""
+        shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        pid, closed = int(header["pid"]), bool(header["closed"])
+        del header
+        alive = False
+        if not closed and pid:
+            try:
+                os.kill(pid, 0)
+                alive = True
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                alive = True
+        shm.close()
+        if alive:
+            raise FileExistsError(f"Frame bus '{name}' is already published by process {pid}.")
+        shm.unlink()
+
+    def publish(self, frame, capture_time=None):
+        """Copies a frame into the next slot and returns its frame number."""
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the bus shape {self.frame_shape}.")
+        frame_number = self.latest + 1
+        slot = (frame_number - 1) % self.slots
+        slot_header = self.layout.slot_headers[slot]
+        slot_header["seq"] = 2 * frame_number - 1
+        np.copyto(self.layout.frames[slot], frame)
+        slot_header["capture_time"] = time.time() if capture_time is None else capture_time
+        slot_header["seq"] = 2 * frame_number
+        self.layout.header["latest"] = frame_number
+        self.latest = frame_number
+        return frame_number
+
+    def close(self):
+        """Marks the bus closed so readers see the end of the stream, and removes it."""
+        if self.shm is None:
+            return
+        self.layout.header["closed"] = 1
+        self.layout = None  # Views must be gone before the segment can be closed
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
+
+
+class FrameBusReader:
+    """Attaches to a published frame bus and reads frames from it."""
+
+    def __init__(self, name, timeout=5.0):
+        """
+        Args:
+            name (str): Name the publisher created the bus with.
+            timeout (float): Seconds to wait for the publisher to create the bus.
+
+        Raises:
+            FileNotFoundError: If no bus with this name appears within the timeout.
+        """
+        self.name = name
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name)
+                if self.shm.size >= HEADER_DTYPE.itemsize: # Still 0 while the publisher is sizing it
+                    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+                    if int(header["magic"]) == BUS_MAGIC:
+                        break
+                    del header
+                self.shm.close()
+            except (FileNotFoundError, ValueError):
+                pass
+            if time.time() >= deadline:
+                raise FileNotFoundError(f"No frame bus named '{name}' is being published.")
+            time.sleep(0.05)
+        # Only the publisher may remove the segment; otherwise the resource tracker would unlink it when this reader exits.
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        if int(header["version"]) != BUS_VERSION:
+            raise ValueError(f"Frame bus '{name}' has unsupported version {int(header['version'])}.")
+        self.frame_shape = _frame_shape(header)
+        self.slots = int(header["slots"])
+        self.fps = float(header["fps"])
+        del header
+        self.layout = _BusLayout(self.shm.buf, self.frame_shape, self.slots)
+
+    @property
+    def latest(self):
+        """Number of the newest complete frame, 0 before the first one."""
+        return int(self.layout.header["latest"])
+
+    @property
+    def closed(self):
+        return bool(self.layout.header["closed"])
+
+    def _slot(self, frame_number):
+        return (frame_number - 1) % self.slots
+
+    def still_valid(self, frame_number):
+        """True while frame_number has not been overwritten, e.g. after processing a view()."""
+        return int(self.layout.slot_headers[self._slot(frame_number)]["seq"]) == 2 * frame_number
+
+    def view(self, frame_number):
+        """
+        Returns (capture_time, frame) without copying, or None if the frame is not available.
+
+        The frame is a view into the ring and is overwritten once the publisher wraps around;
+        check still_valid(frame_number) after using it.
+        """
+        if frame_number < 1 or not self.still_valid(frame_number):
+            return None
+        capture_time = float(self.layout.slot_headers[self._slot(frame_number)]["capture_time"])
+        return capture_time, self.layout.frames[self._slot(frame_number)]
+
+    def read(self, frame_number, out=None):
+        """
+        Returns (capture_time, frame) with the frame copied out of the ring (into out if given),
+        or None if the frame is not available or was overwritten while it was copied.
+        """
+        viewed = self.view(frame_number)
+        if viewed is None:
+            return None
+        capture_time, frame = viewed
+        if out is None:
+            out = frame.copy()
+        else:
+            np.copyto(out, frame)
+        return (capture_time, out) if self.still_valid(frame_number) else None
+
+    def wait_next(self, after, timeout=None):
+        """
+        Waits for a frame newer than `after` and returns its number: the next one while this reader
+        keeps up, the newest one once it has fallen a ring behind. Returns None when the bus is
+        closed or the timeout expires.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            latest = self.latest
+            if latest > after:
+                return after + 1 if latest - after < self.slots - 1 else latest
+            if self.closed or (deadline is not None and time.time() >= deadline):
+                return None
+            time.sleep(0.001)
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.layout = None
+        self.shm.close()
+        self.shm = None
+
+
+class FrameBusCapture:
+    """
+    cv2.VideoCapture-compatible reader of a frame bus, so code written for a camera (the tracker
+    pipeline, the calibration confirmation) can consume published frames unchanged.
+    """
+
+    def __init__(self, name, timeout=5.0, read_timeout=5.0):
+        try:
+            self.reader = FrameBusReader(name, timeout)
+        except (FileNotFoundError, ValueError):
+            self.reader = None
+        self.read_timeout = read_timeout
+        self.frame_number = 0
+        self.capture_time = None
+        self.first_capture_time = None
+
+    def isOpened(self):
+        return self.reader is not None
+
+    def read(self, image=None):
+        """Returns (True, frame) with the next frame, or (False, None) when the bus closes or stalls."""
+        if self.reader is None:
+            return False, None
+        while True:
+            frame_number = self.reader.wait_next(self.frame_number, self.read_timeout)
+            if frame_number is None:
+                return False, None
+            result = self.reader.read(frame_number, image)
+            self.frame_number = frame_number
+            if result is not None: # Otherwise overwritten while copying; try the next one
+                self.capture_time, frame = result
+                if self.first_capture_time is None:
+                    self.first_capture_time = self.capture_time
+                return True, frame
+
+    def grab(self):
+        """Moves to the next frame without copying it. Returns False when the bus closes or stalls."""
+        if self.reader is None:
+            return False
+        frame_number = self.reader.wait_next(self.frame_number, self.read_timeout)
+        if frame_number is None:
+            return False
+        self.frame_number = frame_number
+        return True
+
+    def get(self, prop):
+        if self.reader is None:
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.reader.frame_shape[0])
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.reader.frame_shape[1])
+        if prop == cv2.CAP_PROP_FPS:
+            return self.reader.fps
+        if prop == cv2.CAP_PROP_POS_MSEC and self.capture_time is not None:
+            return (self.capture_time - self.first_capture_time) * 1000.0
+        return 0.0
+
+    def set(self, prop, value):
+        return False  # Camera settings belong to the publisher
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class PublishingCapture:
+    """
+    Wraps an opened cv2.VideoCapture and publishes every frame read from it to a frame bus,
+    so the process owning the camera shares it with other consumers. Frames skipped with
+    grab() are never decoded, so they are not published.
+    """
+
+    def __init__(self, cap, name, slots=8):
+        self.cap = cap
+        self.name = name
+        self.slots = slots
+        self.publisher = None  # Created on the first frame, when its size is known
+
+    def read(self, image=None):
+        ret, frame = self.cap.read() if image is None else self.cap.read(image)
+        if ret:
+            if self.publisher is None:
+                self.publisher = FrameBusPublisher(self.name, frame.shape, self.slots, fps=self.cap.get(cv2.CAP_PROP_FPS))
+            self.publisher.publish(frame)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish a camera on a shared-memory frame bus, or consume one.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--camera_index", type=int, help="Publish this camera.")
+    source.add_argument("--video_path", help="Publish a video file at its own frame rate (for testing consumers).")
+    parser.add_argument("--name", help="Bus name. Defaults to proofofputt_camera_<camera_index>.")
+    parser.add_argument("--slots", type=int, default=8, help="Frames kept in the ring buffer.")
+    parser.add_argument("--preview", action="store_true", help="Show the frames of an existing bus in a window.")
+    parser.add_argument("--record", metavar="PATH", help="Record the frames of an existing bus to a video file.")
+    args = parser.parse_args()
+
+    if args.camera_index is not None or args.video_path:
+        name = args.name or default_bus_name(args.camera_index if args.camera_index is not None else 0)
+        cap = PublishingCapture(cv2.VideoCapture(args.camera_index if args.camera_index is not None else args.video_path), name, args.slots)
+        if not cap.isOpened():
+            raise SystemExit(f"Could not open {args.camera_index if args.camera_index is not None else args.video_path}.")
+        frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if args.video_path else 0.0
+        print(f"Publishing on frame bus '{name}'. Press Ctrl+C to stop.")
+        try:
+            while True:
+                t0 = time.time()
+                ret, _ = cap.read()
+                if not ret:
+                    break
+                if frame_interval:
+                    time.sleep(max(0.0, frame_interval - (time.time() - t0)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cap.release()
+    elif args.preview or args.record:
+        name = args.name or default_bus_name(0)
+        cap = FrameBusCapture(name)
+        if not cap.isOpened():
+            raise SystemExit(f"No frame bus named '{name}' is being published.")
+        writer = None
+        received = 0
+        start = time.time()
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            received += 1
+            if args.record:
+                if writer is None:
+                    writer = cv2.VideoWriter(args.record, cv2.VideoWriter_fourcc(*"mp4v"), cap.get(cv2.CAP_PROP_FPS) or 30.0,
+                                             (frame.shape[1], frame.shape[0]))
+                writer.write(frame)
+            if args.preview:
+                cv2.imshow(f"Frame bus: {name}", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        if writer is not None:
+            writer.release()
+        cap.release()
+        cv2.destroyAllWindows()
+        elapsed = time.time() - start
+        print(f"Received {received} frames ({received / elapsed if elapsed > 0 else 0.0:.1f} fps).")
+    else:
+        parser.error("Give --camera_index or --video_path to publish, or --preview/--record to consume.")
@@ -0,0 +1,254 @@
+"""
+Interchangeable CPU inference engines for the golf ball detector.
+
+Every engine takes a list of BGR images and returns, per image, an (N, 6) float32 array of
+[x1, y1, x2, y2, confidence, class] rows in that image's pixel coordinates, so
+VideoProcessor can post-process them identically regardless of the backend:
+
+- ultralytics: the original PyTorch path (YOLO(model_path)).
+- onnxruntime: an ONNX export of the model run with ONNX Runtime's CPU provider.
+- openvino: an OpenVINO IR export of the model run on the OpenVINO CPU plugin.
+
+Exports are created on first use next to the .pt file (the same layout `yolo export` produces)
+and reused afterwards.
+"""
+import os
+import argparse
+import cv2
+import numpy as np
+
+ENGINES = ("ultralytics", "onnxruntime", "openvino")
+
+# Same defaults as ultralytics' predict(), so all engines filter boxes the same way.
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+DEFAULT_IMGSZ = 640
+
+
+def letterbox(image, imgsz, canvas=None):
+    """
+    Resizes an image to fit in an imgsz x imgsz square, padding the remainder with gray.
+
+    A canvas larger than imgsz (the input size of a static model) is filled by padding the
+    bottom and right edges, so the image keeps the scale imgsz gives it instead of being
+    enlarged to the model input.
+
+    Returns:
+        tuple: (padded image, scale ratio, (pad_x, pad_y))
+    """
+    height, width = image.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    if canvas is not None and canvas > imgsz:
+        bottom += canvas - imgsz
+        right += canvas - imgsz
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio, (left, top)
+
+
+def preprocess(images, imgsz, canvas=None):
+    """Letterboxes BGR images into a normalized NCHW float32 RGB batch. See letterbox for canvas."""
+    batch, transforms = [], []
+    for image in images:
+        padded, ratio, pad = letterbox(image, imgsz, canvas)
+        batch.append(padded[:, :, ::-1].transpose(2, 0, 1))
+        transforms.append((ratio, pad, image.shape[:2]))
+    blob = np.ascontiguousarray(np.stack(batch), dtype=np.float32) / 255.0
+    return blob, transforms
+
+
+def postprocess(output, transforms, conf_threshold=CONF_THRESHOLD, iou_threshold=IOU_THRESHOLD):
+    """
+    Decodes raw YOLOv8 output of shape (batch, 4 + num_classes, num_anchors).
+
+    Returns:
+        list: One (N, 6) array of [x1, y1, x2, y2, confidence, class] per image, in original image coordinates.
+    """
+    detections = []
+    for predictions, (ratio, (pad_x, pad_y), (height, width)) in zip(output, transforms):
+        predictions = predictions.T
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        confidences = class_scores[np.arange(len(class_scores)), class_ids]
+        keep = confidences > conf_threshold
+        if not keep.any():
+            detections.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+        boxes, confidences, class_ids = predictions[keep, :4], confidences[keep], class_ids[keep]
+
+        # (cx, cy, w, h) in letterboxed pixels -> (x, y, w, h) for NMS
+        xywh = boxes.copy()
+        xywh[:, 0] -= xywh[:, 2] / 2
+        xywh[:, 1] -= xywh[:, 3] / 2
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          conf_threshold, iou_threshold)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+
+        result = np.zeros((len(indices), 6), dtype=np.float32)
+        result[:, 0] = (xywh[indices, 0] - pad_x) / ratio
+        result[:, 1] = (xywh[indices, 1] - pad_y) / ratio
+        result[:, 2] = (xywh[indices, 0] + xywh[indices, 2] - pad_x) / ratio
+        result[:, 3] = (xywh[indices, 1] + xywh[indices, 3] - pad_y) / ratio
+        result[:, [0, 2]] = result[:, [0, 2]].clip(0, width)
+        result[:, [1, 3]] = result[:, [1, 3]].clip(0, height)
+        result[:, 4] = confidences[indices]
+        result[:, 5] = class_ids[indices]
+        detections.append(result[np.argsort(-result[:, 4])])
+    return detections
+
+
+def letterbox_size(imgsz, fixed_imgsz):
+    """
+    The size to letterbox an image to. A static model still gets the crop at the computed
+    imgsz, padded to its fixed input, so the ball keeps the scale the model was trained on.
+    """
+    imgsz = imgsz or fixed_imgsz or DEFAULT_IMGSZ
+    return min(imgsz, fixed_imgsz) if fixed_imgsz else imgsz
+
+
+class UltralyticsEngine:
+    """The original PyTorch path through ultralytics.YOLO."""
+    name = "ultralytics"
+
+    def __init__(self, model_path, threads=None):
+        from ultralytics import YOLO
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+
+    def predict(self, images, imgsz=None):
+        kwargs = {"verbose": False}
+        if imgsz is not None:
+            kwargs["imgsz"] = imgsz
+        results = self.model(list(images), **kwargs)
+        return [r.boxes.data.cpu().numpy().astype(np.float32) for r in results]
+
+
+class OnnxRuntimeEngine:
+    """An ONNX export of the detector run with ONNX Runtime on the CPU."""
+    name = "onnxruntime"
+
+    def __init__(self, model_path, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.model = self.session
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Static exports fix the input size (and usually the batch); dynamic exports accept any.
+        height = model_input.shape[2]
+        self.fixed_imgsz = height if isinstance(height, int) else None
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def predict(self, images, imgsz=None):
+        blob, transforms = preprocess(images, letterbox_size(imgsz, self.fixed_imgsz), self.fixed_imgsz)
+        if self.fixed_batch == 1 and len(images) > 1:
+            output = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0] for i in range(len(images))])
+        else:
+            output = self.session.run(None, {self.input_name: blob})[0]
+        return postprocess(output, transforms)
+
+
+class OpenVinoEngine:
+    """An OpenVINO IR export of the detector run on the OpenVINO CPU plugin."""
+    name = "openvino"
+
+    def __init__(self, model_path, threads=None):
+        import openvino as ov
+        if os.path.isdir(model_path):
+            xml_files = [f for f in os.listdir(model_path) if f.endswith(".xml")]
+            if not xml_files:
+                raise FileNotFoundError(f"No OpenVINO .xml model found in {model_path}")
+            model_path = os.path.join(model_path, xml_files[0])
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled_model = core.compile_model(core.read_model(model_path), "CPU", config)
+        self.model = self.compiled_model
+        self.request = self.compiled_model.create_infer_request()
+        # Dynamic exports take the crop at its own size; older static exports fix it.
+        shape = self.compiled_model.input(0).get_partial_shape()
+        self.fixed_imgsz = shape[2].get_length() if shape[2].is_static else None
+        self.fixed_batch = shape[0].get_length() if shape[0].is_static else None
+
+    def predict(self, images, imgsz=None):
+        blob, transforms = preprocess(images, letterbox_size(imgsz, self.fixed_imgsz), self.fixed_imgsz)
+        if self.fixed_batch is None:
+            self.request.infer({0: blob})
+            return postprocess(self.request.get_output_tensor(0).data.copy(), transforms)
+        outputs = []
+        for i in range(len(images)):
+            self.request.infer({0: blob[i:i + 1]})
+            outputs.append(self.request.get_output_tensor(0).data.copy())
+        return postprocess(np.concatenate(outputs), transforms)
+
+
+def exported_model_path(model_path, engine):
+    """Where `yolo export` puts the exported model for a .pt file."""
+    base = os.path.splitext(model_path)[0]
+    if engine == "onnxruntime":
+        return base + ".onnx"
+    if engine == "openvino":
+        return base + "_openvino_model"
+    return model_path
+
+
+def export_model(model_path, engine, imgsz=DEFAULT_IMGSZ, **export_kwargs):
+    """
+    Exports a .pt model for the given engine with ultralytics and returns the exported path.
+
+    Both formats are exported with dynamic axes so the ROI crop is run at the size
+    crop_frame computes and several frames can share one call.
+    """
+    from ultralytics import YOLO
+    model = YOLO(model_path)
+    if engine == "onnxruntime":
+        return model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, **export_kwargs)
+    if engine == "openvino":
+        return model.export(format="openvino", imgsz=imgsz, dynamic=True, **export_kwargs)
+    raise ValueError(f"Engine '{engine}' does not use an exported model.")
+
+
+def create_engine(engine, model_path, threads=None, logger=None):
+    """
+    Creates an inference engine by name.
+
+    A .pt model_path is exported for onnxruntime/openvino on first use; later runs reuse
+    the export. An already exported model (.onnx file or OpenVINO directory/.xml) is used as is.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}'. Expected one of {ENGINES}.")
+    if engine == "ultralytics":
+        return UltralyticsEngine(model_path, threads)
+
+    if model_path.endswith(".pt"):
+        exported_path = exported_model_path(model_path, engine)
+        if not os.path.exists(exported_path):
+            if logger:
+                logger.info(f"Exporting {model_path} for {engine} to {exported_path}...")
+            exported_path = export_model(model_path, engine)
+        model_path = exported_path
+
+    if engine == "onnxruntime":
+        return OnnxRuntimeEngine(model_path, threads)
+    return OpenVinoEngine(model_path, threads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the YOLOv8 detector for a CPU inference engine.")
+    parser.add_argument("--model", required=True, help="Path to the .pt model to export.")
+    parser.add_argument("--engine", choices=ENGINES[1:], required=True, help="Engine to export for.")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Export input size.")
+    args = parser.parse_args()
+    print(f"Exported model: {export_model(args.model, args.engine, imgsz=args.imgsz)}")
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing motion detector restricted to the calibrated ROIs.
+
+    Each frame is compared against the frame the detector last ran on (not just the previous
+    frame), so slow drift accumulates until it crosses the threshold instead of being missed.
+    When nothing inside the ROIs has changed, the previous detections are still valid and the
+    detector can be skipped. After a long stretch without motion the gate reports itself idle,
+    which the capture stage uses to drop to a low frame rate.
+    """
+
+    def __init__(self, rois, downscale=4, pixel_threshold=25, min_changed_pixels=12, idle_after_seconds=60.0):
+        """
+        Args:
+            rois (dict): Calibrated ROIs, as returned by load_and_prepare_rois.
+            downscale (int): Factor frames are shrunk by before differencing.
+            pixel_threshold (int): Minimum grayscale difference for a pixel to count as changed.
+            min_changed_pixels (int): Changed pixels (at the downscaled size) needed to report motion.
+            idle_after_seconds (float): Seconds without motion before the gate reports idle.
+        """
+        self.rois = rois
+        self.downscale = max(1, int(downscale))
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self.idle_after_seconds = idle_after_seconds
+
+        self.mask = None
+        self.reference = None
+        self.last_motion_time = None
+        self.frames_checked = 0
+        self.frames_skipped = 0
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, (frame.shape[1] // self.downscale, frame.shape[0] // self.downscale),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _build_mask(self, shape):
+        mask = np.zeros(shape, dtype=np.uint8)
+        for name, data in self.rois.items():
+            if name in ("camera_index", "IGNORE_AREA_ROI"):
+                continue
+            if isinstance(data, dict) and 'points' in data:
+                data = data['points']
+            points = np.array(data, dtype=np.int32).reshape(-1, 2)
+            if len(points) >= 3:
+                cv2.fillPoly(mask, [points // self.downscale], 255)
+        if not mask.any():
+            mask[:] = 255  # No usable ROIs: watch the whole frame
+        return mask
+
+    def check(self, frame, timestamp):
+        """
+        Decides whether the detector needs to run on this frame.
+
+        Returns:
+            bool: True if there is motion inside the ROIs (or no reference yet); the frame then
+            becomes the new reference. False if the previous detections can be reused.
+        """
+        self.frames_checked += 1
+        gray = self._prepare(frame)
+        if self.mask is None or self.mask.shape != gray.shape:
+            self.mask = self._build_mask(gray.shape)
+            self.reference = None
+
+        if self.reference is None:
+            motion = True
+        else:
+            diff = cv2.absdiff(gray, self.reference)
+            _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            changed = cv2.bitwise_and(changed, self.mask)
+            motion = cv2.countNonZero(changed) >= self.min_changed_pixels
+
+        if motion:
+            self.reference = gray
+            self.last_motion_time = timestamp
+        else:
+            self.frames_skipped += 1
+        return motion
+
+    def is_idle(self, now):
+        """True once no motion has been seen for idle_after_seconds."""
+        if self.last_motion_time is None:
+            return False
+        return (now - self.last_motion_time) >= self.idle_after_seconds
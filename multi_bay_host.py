@@ -0,0 +1,389 @@
+"""
+Runs several putting bays from one process that loads the detector once.
+
+Each bay keeps what a run_tracker session has: its own camera, calibration
+(calibration_output_<player_id>.json), PuttClassifier, putt log and OBS text files
+(obs_text_files/bay_<player_id>). Every camera is read on its own capture thread. The host
+thread takes the newest frame from each bay in turn and runs them through the shared model in
+one call, batching frames whose ROI crops share an inference size. Each bay then classifies on
+its own thread, so a slow file write in one bay never holds up detection for the others.
+
+Per-bay frame rate and capture-to-classification latency are logged every --report_seconds
+and summarized when the host stops.
+
+    python multi_bay_host.py --bay player_id=1,session_id=41 --bay player_id=2,session_id=42,camera_index=2
+"""
+import os
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+import numpy as np
+import cv2
+from rich.console import Console
+from rich.table import Table
+
+from video_processor import VideoProcessor, compute_roi_crop_rect
+from roi_config import load_and_prepare_rois
+from putt_classifier import PuttClassifier
+from tracker_pipeline import CaptureStage, StageQueue, END_OF_STREAM, DROP_OLDEST, BLOCK
+from tracker_session import TrackerSession, report_session
+from session_event_log import SessionEventLog, EVENT_LOG_EXTENSION
+from inference_engines import ENGINES
+from frame_bus import FrameBusCapture
+from utils import get_camera_index_from_config
+from tracker_logging import CompressingRotatingFileHandler, start_queued_logging, prune_logs_in_background
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+log_dir = os.path.join(script_dir, "logs")
+
+# --bay keys and their types. A bay without camera_index, video_path or frame_bus uses the
+# camera recorded in its calibration file.
+BAY_KEYS = {
+    "player_id": int, "session_id": int, "camera_index": int, "video_path": str, "frame_bus": str,
+    "config": str, "time_limit_seconds": int, "duel_id": int, "league_round_id": int,
+}
+
+
+def parse_bay(spec):
+    """
+    Parses a --bay value such as "player_id=1,session_id=41,camera_index=0".
+
+    Raises:
+        ValueError: If a key is unknown, a value has the wrong type or player_id is missing.
+    """
+    bay = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        key = key.strip()
+        if not sep or key not in BAY_KEYS:
+            raise ValueError(f"'{item}' is not KEY=VALUE with KEY one of {', '.join(BAY_KEYS)}.")
+        try:
+            bay[key] = BAY_KEYS[key](value.strip())
+        except ValueError:
+            raise ValueError(f"Invalid value for {key}: '{value}'.")
+    if "player_id" not in bay:
+        raise ValueError(f"Bay '{spec}' has no player_id.")
+    if sum(key in bay for key in ("camera_index", "video_path", "frame_bus")) > 1:
+        raise ValueError(f"Bay '{spec}' may have only one of camera_index, video_path and frame_bus.")
+    return bay
+
+
+class _BayLogger(logging.LoggerAdapter):
+    """Prefixes the host logger's messages with the bay they belong to."""
+
+    def process(self, msg, kwargs):
+        return f"[Bay {self.extra['player_id']}] {msg}", kwargs
+
+
+class Bay:
+    """One putting bay: its capture thread, ROI crop, scoring session and throughput statistics."""
+
+    def __init__(self, spec, yolo_model, logger, log_timestamp, queue_size=2, roi_crop=True, roi_crop_padding=32):
+        """
+        Args:
+            spec (dict): Parsed --bay settings, see parse_bay.
+            yolo_model: The shared detector's model, handed to the PuttClassifier as in run_tracker.
+            logger: The host's debug logger.
+            log_timestamp (str): Timestamp used in this run's log file names.
+            queue_size (int): Capacity of the bay's capture and result queues.
+            roi_crop (bool): Restrict inference to the union rectangle of the bay's ROIs.
+            roi_crop_padding (int): Pixels of margin added around the ROI crop.
+
+        Raises:
+            ValueError: If the bay's calibration cannot be loaded.
+            IOError: If the bay's camera, video or frame bus cannot be opened.
+        """
+        self.player_id = spec["player_id"]
+        self.session_id = spec.get("session_id")
+        self.duel_id = spec.get("duel_id")
+        self.league_round_id = spec.get("league_round_id")
+        self.logger = _BayLogger(logger, {"player_id": self.player_id})
+
+        config = spec.get("config") or os.path.join(script_dir, f"calibration_output_{self.player_id}.json")
+        self.rois = load_and_prepare_rois(config, self.logger)
+        if self.rois is None:
+            raise ValueError(f"Could not load the calibration for bay {self.player_id} from {config}.")
+        self.crop_rect = compute_roi_crop_rect(self.rois, roi_crop_padding) if roi_crop else None
+
+        self.is_live_feed = "video_path" not in spec
+        if "frame_bus" in spec:
+            self.source = spec["frame_bus"]
+            self.cap = FrameBusCapture(self.source)
+        else:
+            self.source = spec.get("video_path", spec.get("camera_index"))
+            if self.source is None:
+                self.source = get_camera_index_from_config(self.player_id)
+            self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source {self.source} for bay {self.player_id}.")
+        self.frame_shape = (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 1080, int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1920, 3)
+
+        # Live bays drop stale frames rather than fall behind; recorded videos are processed in full.
+        drop_policy = DROP_OLDEST if self.is_live_feed else BLOCK
+        self.stop_event = threading.Event()
+        self.capture_queue = StageQueue(queue_size, drop_policy)
+        self.result_queue = StageQueue(queue_size, drop_policy)
+        self.capture_stage = CaptureStage(self.cap, self.capture_queue, self.stop_event, self.logger, self.is_live_feed)
+        self.classify_thread = threading.Thread(target=self._classify, name=f"bay-{self.player_id}", daemon=True)
+        self.capture_ended = False
+
+        self.putt_log_filename = os.path.join(log_dir, f"putt_classification_log_{log_timestamp}_bay{self.player_id}{EVENT_LOG_EXTENSION}")
+        self.obs_dir = os.path.join(script_dir, "obs_text_files", f"bay_{self.player_id}")
+        classifier = PuttClassifier(yolo_model=yolo_model, rois=self.rois, logger=self.logger)
+        self.session = TrackerSession(classifier, SessionEventLog(self.putt_log_filename), self.logger, self.obs_dir,
+                                      time_limit_seconds=spec.get("time_limit_seconds"))
+
+        self.classified = 0
+        self.latencies = deque(maxlen=10000)  # Seconds from capture to classification, most recent frames
+        self.reported_classified = 0
+        self.start_time = None
+        self.end_time = None
+        self.reported_at = None
+
+    @property
+    def active(self):
+        """True while the bay still has frames to detect."""
+        return not self.capture_ended and not self.stop_event.is_set()
+
+    def start(self):
+        self.start_time = self.reported_at = time.time()
+        self.capture_stage.start()
+        self.classify_thread.start()
+        self.logger.info(f"Bay started on {self.source} ({self.frame_shape[1]}x{self.frame_shape[0]}), ROI crop {self.crop_rect}.")
+
+    def end_of_capture(self):
+        """Called by the host once the camera or video has no more frames."""
+        self.capture_ended = True
+        self.result_queue.put_end(self.stop_event)
+
+    def _classify(self):
+        try:
+            while True:
+                packet = self.result_queue.get(self.stop_event)
+                if packet is None:
+                    break
+                self.session.process(packet)
+                self.classified += 1
+                self.latencies.append(time.time() - packet.capture_time)
+                if self.session.time_limit_reached:
+                    break
+        except Exception as e:
+            self.logger.error(f"Classification failed: {e}", exc_info=True)
+        finally:
+            self.end_time = time.time()
+            self.stop_event.set() # Stops this bay's capture; the other bays keep running
+
+    def interval_report(self, now):
+        """Returns (fps, latencies) for the frames classified since the previous call."""
+        classified, latencies = self.classified, list(self.latencies)
+        new = min(classified - self.reported_classified, len(latencies))
+        interval_latencies = latencies[len(latencies) - new:] if new > 0 else []
+        elapsed = now - self.reported_at
+        fps = (classified - self.reported_classified) / elapsed if elapsed > 0 else 0.0
+        self.reported_classified = classified
+        self.reported_at = now
+        return fps, interval_latencies
+
+    def summary(self):
+        """Whole-run statistics for the final report."""
+        elapsed = (self.end_time or time.time()) - self.start_time if self.start_time else 0.0
+        latencies = np.array(self.latencies) * 1000.0
+        return {
+            "bay": self.player_id,
+            "session": self.session_id,
+            "frames": self.classified,
+            "fps": self.classified / elapsed if elapsed > 0 else 0.0,
+            "latency_mean_ms": float(latencies.mean()) if len(latencies) else 0.0,
+            "latency_p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "latency_max_ms": float(latencies.max()) if len(latencies) else 0.0,
+            "dropped": self.capture_queue.dropped + self.result_queue.dropped,
+            "makes": self.session.total_makes,
+            "misses": self.session.total_misses,
+        }
+
+    def close(self):
+        """Stops the bay's threads, saves its session and records it in the database."""
+        self.stop_event.set()
+        self.capture_queue.drain()
+        self.result_queue.drain()
+        self.capture_stage.join(timeout=2.0)
+        self.classify_thread.join(timeout=2.0)
+        self.capture_stage.release_capture() # Left open, and logged, while a read is still blocked
+        self.session.close()
+        if self.is_live_feed and self.session_id:
+            try:
+                report_session(self.putt_log_filename, self.player_id, self.session_id, os.path.join(script_dir, "Session.Reports"),
+                               self.logger, duel_id=self.duel_id, league_round_id=self.league_round_id)
+            except Exception as e:
+                self.logger.error(f"Error reporting session {self.session_id}: {e}", exc_info=True)
+
+
+class MultiBayHost:
+    """Feeds the newest frame of every bay through one shared detector, round after round."""
+
+    def __init__(self, bays, detector, logger, report_seconds=30.0):
+        """
+        Args:
+            bays (list): The Bay objects to serve.
+            detector (VideoProcessor): The shared detector. Its own crop is unused; each bay's applies.
+            logger: The host's debug logger.
+            report_seconds (float): Interval between per-bay throughput and latency log lines. 0 disables them.
+        """
+        self.bays = bays
+        self.detector = detector
+        self.logger = logger
+        self.report_seconds = report_seconds
+        self.stop_event = threading.Event()
+        self.detector_calls = 0
+        self.detected_frames = 0
+        self.detector_time = 0.0
+
+    def warmup(self):
+        """Runs the detector on blank frames with every bay's crop so no bay's first frames are slow."""
+        blanks = [np.zeros(bay.frame_shape, dtype=np.uint8) for bay in self.bays]
+        crop_rects = [bay.crop_rect for bay in self.bays]
+        for _ in range(2):
+            self.detector.process_frames_with_crops(blanks, crop_rects)
+
+    def run(self):
+        """Serves the bays until every one has ended (video end, time limit) or stop() is called."""
+        for bay in self.bays:
+            bay.start()
+        next_report = time.time() + self.report_seconds
+        try:
+            while not self.stop_event.is_set() and any(bay.active for bay in self.bays):
+                if not self._detect_round():
+                    self.stop_event.wait(0.002) # No bay had a new frame
+                if self.report_seconds and time.time() >= next_report:
+                    self.log_interval_stats()
+                    next_report = time.time() + self.report_seconds
+        except KeyboardInterrupt:
+            self.logger.info("Interrupted. Stopping all bays...")
+        finally:
+            for bay in self.bays:
+                if not bay.capture_ended:
+                    bay.end_of_capture()
+                bay.classify_thread.join(timeout=5.0) # Lets each bay classify the frames already detected
+                bay.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _detect_round(self):
+        """Detects one queued frame from each bay that has one. Returns False if none had."""
+        round_bays, packets = [], []
+        for bay in self.bays:
+            if not bay.active:
+                continue
+            packet = bay.capture_queue.get_nowait()
+            if packet is END_OF_STREAM:
+                bay.end_of_capture()
+            elif packet is not None:
+                round_bays.append(bay)
+                packets.append(packet)
+        if not packets:
+            return False
+
+        t0 = time.perf_counter()
+        detections = self.detector.process_frames_with_crops([packet.frame for packet in packets],
+                                                             [bay.crop_rect for bay in round_bays])
+        self.detector_time += time.perf_counter() - t0
+        self.detector_calls += 1
+        self.detected_frames += len(packets)
+        for bay, packet, detected_balls in zip(round_bays, packets, detections):
+            packet.detections = detected_balls
+            bay.result_queue.put(packet, bay.stop_event)
+        return True
+
+    def log_interval_stats(self):
+        now = time.time()
+        for bay in self.bays:
+            fps, latencies = bay.interval_report(now)
+            if latencies:
+                latencies_ms = np.array(latencies) * 1000.0
+                bay.logger.info(f"{fps:.1f} fps, latency mean {latencies_ms.mean():.0f} ms, p95 {np.percentile(latencies_ms, 95):.0f} ms, "
+                                f"max {latencies_ms.max():.0f} ms, dropped {bay.capture_queue.dropped + bay.result_queue.dropped}")
+            else:
+                bay.logger.info(f"{fps:.1f} fps, no frames classified in the last {self.report_seconds:.0f}s.")
+        if self.detector_time > 0:
+            self.logger.info(f"Shared detector: {self.detected_frames / self.detector_time:.1f} frames/s of inference, "
+                             f"{self.detected_frames / max(1, self.detector_calls):.1f} frames per call.")
+
+    def summary_table(self):
+        table = Table(title="Multi-bay session summary")
+        for column in ("Bay", "Session", "Frames", "FPS", "Latency ms (mean/p95/max)", "Dropped", "Makes", "Misses"):
+            table.add_column(column)
+        for bay in self.bays:
+            s = bay.summary()
+            table.add_row(str(s["bay"]), str(s["session"] or "-"), str(s["frames"]), f"{s['fps']:.1f}",
+                          f"{s['latency_mean_ms']:.0f} / {s['latency_p95_ms']:.0f} / {s['latency_max_ms']:.0f}",
+                          str(s["dropped"]), str(s["makes"]), str(s["misses"]))
+        return table
+
+
+def setup_logging(log_timestamp):
+    logger = logging.getLogger("multi_bay_host")
+    logger.setLevel(logging.DEBUG)
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    log_path = os.path.join(log_dir, f"multi_bay_{log_timestamp}.log")
+    handlers = (CompressingRotatingFileHandler(log_path), logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    # Every bay logs through this logger, so no bay thread ever waits on the log file.
+    start_queued_logging(logger, handlers)
+    prune_logs_in_background(log_dir, keep=(log_path,), logger=logger)
+    return logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several putting bays in one process with a single shared detector.")
+    parser.add_argument("--bay", dest="bays", action="append", required=True, metavar="KEY=VALUE,...",
+                        help="A bay, e.g. player_id=1,session_id=41[,camera_index=0|video_path=...|frame_bus=...][,config=...]"
+                             "[,time_limit_seconds=...][,duel_id=...][,league_round_id=...]. Repeat for each bay.")
+    parser.add_argument("--model", default=os.path.join(script_dir, "models", "best.pt"), help="Path to the YOLOv8 model file, or an exported model for --engine.")
+    parser.add_argument("--engine", choices=ENGINES, default="ultralytics", help="Inference backend for the shared detector.")
+    parser.add_argument("--threads", type=int, help="Number of intra-op CPU threads for the inference engine.")
+    parser.add_argument("--queue_size", type=int, default=2, help="Capacity of each bay's capture and result queues.")
+    parser.add_argument("--no_roi_crop", action="store_true", help="Run the detector on full frames instead of each bay's ROI crop.")
+    parser.add_argument("--roi_crop_padding", type=int, default=32, help="Pixels of margin added around each bay's ROI crop.")
+    parser.add_argument("--report_seconds", type=float, default=30.0, help="Interval between per-bay fps and latency log lines. 0 disables them.")
+    args = parser.parse_args()
+
+    try:
+        specs = [parse_bay(spec) for spec in args.bays]
+    except ValueError as e:
+        parser.error(str(e))
+    player_ids = [spec["player_id"] for spec in specs]
+    if len(set(player_ids)) != len(player_ids):
+        parser.error("Each bay needs a different player_id.")
+    if any("video_path" not in spec and spec.get("session_id") is None for spec in specs):
+        parser.error("session_id is required for every live bay.")
+
+    log_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    logger = setup_logging(log_timestamp)
+
+    detector = VideoProcessor(model_path=args.model, min_bbox_area=50, engine=args.engine, threads=args.threads, logger=logger)
+    bays = []
+    try:
+        for spec in specs:
+            bays.append(Bay(spec, detector.model, logger, log_timestamp, queue_size=args.queue_size,
+                            roi_crop=not args.no_roi_crop, roi_crop_padding=args.roi_crop_padding))
+    except (ValueError, IOError) as e:
+        logger.error(f"{e} Exiting.")
+        for bay in bays:
+            bay.cap.release()
+        return
+
+    host = MultiBayHost(bays, detector, logger, report_seconds=args.report_seconds)
+    host.warmup()
+    logger.info(f"Detector '{args.engine}' loaded once and warmed up for {len(bays)} bays.")
+    host.run()
+    Console().print(host.summary_table())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Background writer for the OBS text files.
+
+OBS polls one small text file per statistic. Writing them from the classifier thread meant
+opening and truncating seven files per putt, and a slow disk or an antivirus scan stalled
+frame processing. ObsWriter takes the values from the caller without touching the disk. Its
+thread coalesces everything queued since its last pass and writes only the files whose
+values changed. Each file is written to a temporary name and moved into place with
+os.replace, so OBS never reads a half-written file.
+"""
+import os
+import threading
+
+OBS_FILE_DEFAULTS = {
+    "TotalPutts.txt": "0", "MadePutts.txt": "0", "MissedPutts.txt": "0",
+    "CurrentStreak.txt": "0", "Consecutive.txt": "0", "MaxStreak.txt": "0",
+    "DetailedClassification.txt": ""  # Add the new file with an empty default
+}
+
+
+def stats_to_obs_values(total_makes, total_misses, consecutive_makes, max_consecutive_makes):
+    """Maps the session counters to the OBS file each one is shown from."""
+    return {
+        "TotalPutts.txt": total_makes + total_misses,
+        "MadePutts.txt": total_makes,
+        "MissedPutts.txt": total_misses,
+        "CurrentStreak.txt": consecutive_makes,
+        "Consecutive.txt": consecutive_makes,
+        "MaxStreak.txt": max_consecutive_makes,
+    }
+
+
+class ObsWriter:
+    """Writes OBS text files on its own thread, coalescing updates and skipping unchanged values."""
+
+    def __init__(self, obs_dir, logger):
+        """
+        Args:
+            obs_dir (str): Directory of the OBS text files. Created if missing.
+            logger: Logger for write errors.
+        """
+        self.obs_dir = obs_dir
+        self.logger = logger
+        self.writes = 0     # Files actually written
+        self.skipped = 0    # Queued values that matched what was already on disk
+        self._pending = {}
+        self._written = {}  # filename -> text last written successfully
+        self._closed = False
+        self._condition = threading.Condition()
+        os.makedirs(obs_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="obs-writer", daemon=True)
+        self._thread.start()
+
+    def update(self, values):
+        """Queues filename -> value updates. Returns immediately; never touches the disk."""
+        with self._condition:
+            for filename, value in values.items():
+                self._pending[filename] = str(value)
+            self._condition.notify()
+
+    def reset(self):
+        """Queues every file's initial value. They are written even if this writer wrote them before."""
+        with self._condition:
+            self._written.clear() # Files may hold a previous session's values
+            self._pending.update(OBS_FILE_DEFAULTS)
+            self._condition.notify()
+
+    def close(self, timeout=5.0):
+        """Writes what is still queued and stops the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.logger.error(f"OBS writer did not finish within {timeout}s; the OBS files may be out of date.")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                pending, self._pending = self._pending, {}
+            for filename, text in pending.items():
+                if self._written.get(filename) == text:
+                    self.skipped += 1
+                    continue
+                if self._write(filename, text):
+                    self._written[filename] = text
+
+    def _write(self, filename, text):
+        path = os.path.join(self.obs_dir, filename)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Left out of _written, so the next update of this file tries again.
+            self.logger.error(f"Error updating OBS file {filename}: {e}")
+            return False
+        self.writes += 1
+        return True
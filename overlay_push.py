@@ -0,0 +1,208 @@
+"""
+Local push server for live overlay stats, as an alternative to the OBS text files.
+
+OBS polls the text files in obs_text_files/, which adds up to a polling interval of latency
+and only carries the seven counters. StatsPushServer serves the session's stats as JSON over
+Server-Sent Events instead. Each message is pushed the moment TrackerSession scores a putt or
+starts its clock. It also serves a HUD page drawn over data/PuttingHUD.8.3.Green.White.png,
+to be added to OBS as a 1920x1080 browser source.
+
+    GET /         HUD page (browser source)
+    GET /events   text/event-stream of stats snapshots; the current one is sent on connect
+    GET /stats    the current snapshot as JSON
+    GET /hud.png  the HUD background
+
+Publishing never blocks the caller: each client thread sends only the newest snapshot, so a
+slow browser skips intermediate updates instead of queueing them.
+"""
+import os
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+HUD_IMAGE_PATH = os.path.join(script_dir, "data", "PuttingHUD.8.3.Green.White.png")
+DEFAULT_PUSH_PORT = 8766
+KEEPALIVE_SECONDS = 15.0
+
+HUD_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Proof of Putt HUD</title>
+<style>
+  html, body { margin: 0; overflow: hidden; background: transparent; }
+  #hud { position: absolute; left: 0; top: 0; width: 1920px; height: 1080px; transform-origin: 0 0;
+         background: url(/hud.png) no-repeat; font: bold 32px Arial, Helvetica, sans-serif; color: #fff;
+         text-shadow: 2px 2px 2px #000; }
+  #hud span { position: absolute; white-space: nowrap; }
+</style>
+</head>
+<body>
+<div id="hud">
+  <span id="detailed_classification" style="left: 1270px; top: 45px; max-width: 590px; overflow: hidden;"></span>
+  <span id="total_makes" style="left: 160px; top: 957px;">0</span>
+  <span id="total_misses" style="left: 182px; top: 996px;">0</span>
+  <span id="max_consecutive_makes" style="left: 1785px; top: 965px;">0</span>
+  <span id="consecutive_makes" style="left: 1748px; top: 1003px;">0</span>
+  <span id="timer" style="left: 40px; top: 40px;"></span>
+</div>
+<script>
+  const hud = document.getElementById("hud");
+  function fit() { hud.style.transform = "scale(" + Math.min(innerWidth / 1920, innerHeight / 1080) + ")"; }
+  addEventListener("resize", fit); fit();
+
+  // The timer runs locally between pushes from the last session time the tracker reported.
+  let stats = null, receivedAt = 0;
+  function formatTime(seconds) {
+    seconds = Math.max(0, Math.floor(seconds));
+    return Math.floor(seconds / 60) + ":" + String(seconds % 60).padStart(2, "0");
+  }
+  function tick() {
+    let text = "";
+    if (stats && stats.session_time !== null) {
+      let elapsed = stats.session_time + (stats.running ? (performance.now() - receivedAt) / 1000 : 0);
+      if (stats.time_limit_seconds) {
+        elapsed = Math.min(elapsed, stats.time_limit_seconds);
+        text = formatTime(stats.time_limit_seconds - elapsed);
+      } else {
+        text = formatTime(elapsed);
+      }
+    }
+    document.getElementById("timer").textContent = text;
+    requestAnimationFrame(tick);
+  }
+  requestAnimationFrame(tick);
+
+  new EventSource("/events").onmessage = (event) => {
+    stats = JSON.parse(event.data);
+    receivedAt = performance.now();
+    for (const key of ["total_makes", "total_misses", "consecutive_makes", "max_consecutive_makes", "detailed_classification"]) {
+      document.getElementById(key).textContent = stats[key] ?? "";
+    }
+  };
+</script>
+</body>
+</html>
+"""
+
+
+class StatsPushServer:
+    """Serves the newest stats snapshot over SSE, plus the HUD page, on a background thread."""
+
+    def __init__(self, logger, host="127.0.0.1", port=DEFAULT_PUSH_PORT):
+        """
+        Args:
+            logger: Logger for server status and errors.
+            host (str): Address to bind. Keep it on localhost unless the browser source runs elsewhere.
+            port (int): Port to listen on.
+
+        Raises:
+            OSError: If the port cannot be bound.
+        """
+        self.logger = logger
+        self._condition = threading.Condition()
+        self._snapshot = {}
+        self._version = 0
+        self._closed = False
+        self._server = ThreadingHTTPServer((host, port), _PushRequestHandler)
+        self._server.daemon_threads = True
+        self._server.push = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stats-push", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread.start()
+        self.logger.info(f"Overlay stats pushed at {self.url}events; HUD browser source at {self.url}")
+        return self
+
+    def publish(self, snapshot):
+        """Replaces the current snapshot and wakes every connected client. Never blocks on the network."""
+        with self._condition:
+            self._snapshot = dict(snapshot)
+            self._version += 1
+            self._condition.notify_all()
+
+    def current(self):
+        with self._condition:
+            return self._version, self._snapshot
+
+    def wait_for_update(self, seen_version, timeout):
+        """Returns (version, snapshot) once a snapshot newer than seen_version exists, or None on timeout or close."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._version != seen_version or self._closed, timeout)
+            if self._closed or self._version == seen_version:
+                return None
+            return self._version, self._snapshot
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _PushRequestHandler(BaseHTTPRequestHandler):
+    """Serves the HUD page, its image, the current stats and the SSE stream of self.server.push."""
+
+    def do_GET(self):
+        push = self.server.push
+        path = self.path.split("?", 1)[0]
+        if path == "/events":
+            self._stream(push)
+        elif path == "/stats":
+            self._send(200, "application/json", json.dumps(push.current()[1]).encode("utf-8"))
+        elif path == "/":
+            self._send(200, "text/html; charset=utf-8", HUD_PAGE.encode("utf-8"))
+        elif path == "/hud.png":
+            try:
+                with open(HUD_IMAGE_PATH, "rb") as f:
+                    self._send(200, "image/png", f.read())
+            except OSError as e:
+                push.logger.error(f"Error reading HUD image: {e}")
+                self._send(404, "text/plain", b"HUD image not found.")
+        else:
+            self._send(404, "text/plain", b"Not found.")
+
+    def _stream(self, push):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        version, snapshot = push.current()
+        try:
+            self._send_event(snapshot)
+            while not push.closed:
+                update = push.wait_for_update(version, KEEPALIVE_SECONDS)
+                if update is None:
+                    self.wfile.write(b": keepalive\n\n") # Also detects clients that went away
+                    self.wfile.flush()
+                    continue
+                version, snapshot = update
+                self._send_event(snapshot)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The browser source was closed or reloaded
+
+    def _send_event(self, snapshot):
+        self.wfile.write(f"data: {json.dumps(snapshot)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # One line per request would flood the debug log while the HUD is open
@@ -0,0 +1,233 @@
+"""
+Optional on-screen overlay for run_tracker.
+
+PuttClassifier works on detections only; everything that draws on frames lives here, so a
+headless tracker (run_tracker --headless) never touches pixels after detection.
+
+The ROIs never change during a session, so their outlines are drawn once into a static layer
+and each frame only copies the layer's pixels back in. Text is grouped into panels that are rendered into a
+patch when their lines change; every other frame just blends the cached patch back in.
+"""
+import cv2
+import numpy as np
+
+ROI_COLORS = {
+    "PUTTING_MAT_ROI": (0, 0, 255), "RAMP_ROI": (0, 255, 255), "HOLE_ROI": (255, 0, 0),
+    "LEFT_OF_MAT_ROI": (255, 255, 0), "CATCH_ROI": (0, 165, 255), "RETURN_TRACK_ROI": (255, 0, 255),
+    "RAMP_LEFT_ROI": (128, 0, 128), "RAMP_CENTER_ROI": (0, 128, 128), "RAMP_RIGHT_ROI": (128, 128, 0),
+    "HOLE_TOP_ROI": (0, 128, 0), "HOLE_RIGHT_ROI": (128, 0, 0), "HOLE_LOW_ROI": (0, 0, 128),
+    "HOLE_LEFT_ROI": (128, 128, 128), "IGNORE_AREA_ROI": (50, 50, 50)
+}
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def _roi_points(roi_points_data):
+    # Handle HOLE_ROI which might be a dict with 'points'
+    if isinstance(roi_points_data, dict) and 'points' in roi_points_data:
+        roi_points_data = roi_points_data['points']
+    return np.array(roi_points_data, dtype=np.int32).reshape(-1, 2)
+
+
+class _StaticLayer:
+    """
+    Opaque drawings rendered once; blit() copies just the drawn pixels onto a frame with a
+    single np.put, which is cheaper than drawing them again.
+    """
+
+    def __init__(self, frame_shape, draw):
+        """draw(image, color_override) draws with its own colors, or with color_override on the coverage mask."""
+        image = np.zeros(frame_shape, dtype=np.uint8)
+        coverage = np.zeros(frame_shape[:2], dtype=np.uint8)
+        draw(image, None)
+        draw(coverage, 255)
+        self.frame_shape = frame_shape
+        self.indices = np.flatnonzero(coverage)
+        # One 3-byte item per BGR pixel, so each pixel is a single element of the put
+        self.pixels = np.ascontiguousarray(image.reshape(-1, 3)[self.indices]).view("V3").ravel()
+        self.draw = draw
+
+    def blit(self, frame):
+        if frame.shape == self.frame_shape and frame.flags.c_contiguous:
+            np.put(frame.view("V3").reshape(-1), self.indices, self.pixels)
+        else:
+            self.draw(frame, None)
+
+
+class _TextPanel:
+    """
+    A group of text lines rendered into a patch that is blended onto each frame, and
+    re-rendered only for line combinations not seen recently. cv2.putText anti-aliases, so
+    the patch keeps per-pixel coverage.
+    """
+    MAX_CACHED = 32  # Recently drawn line combinations kept (e.g. each ROI status the ball passes through)
+
+    def __init__(self):
+        self.cache = {} # lines -> (rect, premultiplied, inverse_alpha), oldest first
+        self.renders = 0
+
+    def draw(self, frame, lines):
+        """
+        Draws lines as cv2.putText calls in order would.
+
+        Args:
+            frame: Frame to draw on, modified in place.
+            lines (tuple): (text, origin, font_scale, color, thickness) tuples.
+        """
+        patch = self.cache.get(lines)
+        if patch is None:
+            if len(self.cache) >= self.MAX_CACHED:
+                del self.cache[next(iter(self.cache))]
+            patch = self.cache[lines] = self._render(lines, frame.shape)
+        rect, premultiplied, inverse_alpha = patch
+        if rect is None:
+            return
+        x, y, w, h = rect
+        view = frame[y:y + h, x:x + w]
+        cv2.multiply(view, inverse_alpha, dst=view, scale=1 / 255)
+        cv2.add(view, premultiplied, dst=view)
+
+    def _render(self, lines, frame_shape):
+        """Returns ((x, y, w, h), text colors times coverage, 255 - coverage), or (None, None, None) if nothing is visible."""
+        self.renders += 1
+        boxes = []
+        for text, (x, y), font_scale, color, thickness in lines:
+            (width, height), baseline = cv2.getTextSize(text, FONT, font_scale, thickness)
+            pad = thickness + 2  # Hershey strokes can reach slightly past the reported size
+            boxes.append((max(0, x - pad), max(0, y - height - pad),
+                          min(frame_shape[1], x + width + pad), min(frame_shape[0], y + baseline + pad)))
+        boxes_visible = [b for b in boxes if b[2] > b[0] and b[3] > b[1]]
+        if not boxes_visible:
+            return None, None, None
+        x1, y1 = min(b[0] for b in boxes_visible), min(b[1] for b in boxes_visible)
+        x2, y2 = max(b[2] for b in boxes_visible), max(b[3] for b in boxes_visible)
+
+        # Each line is blended over the patch within its own box, like consecutive putText calls
+        premultiplied = np.zeros((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+        inverse_alpha = np.full((y2 - y1, x2 - x1, 3), 255, dtype=np.uint8)
+        for (text, (x, y), font_scale, color, thickness), (bx1, by1, bx2, by2) in zip(lines, boxes):
+            if bx2 <= bx1 or by2 <= by1:
+                continue
+            coverage = np.zeros((by2 - by1, bx2 - bx1), dtype=np.uint8)
+            cv2.putText(coverage, text, (x - bx1, y - by1), FONT, font_scale, 255, thickness)
+            alpha = cv2.merge((coverage, coverage, coverage))
+            box = (slice(by1 - y1, by2 - y1), slice(bx1 - x1, bx2 - x1))
+            cv2.multiply(premultiplied[box], cv2.bitwise_not(alpha), dst=premultiplied[box], scale=1 / 255)
+            cv2.add(premultiplied[box], cv2.multiply(alpha, tuple(color) + (0,), scale=1 / 255), dst=premultiplied[box])
+            cv2.multiply(inverse_alpha[box], cv2.bitwise_not(alpha), dst=inverse_alpha[box], scale=1 / 255)
+        return (x1, y1, x2 - x1, y2 - y1), premultiplied, inverse_alpha
+
+
+class OverlayRenderer:
+    """Draws the ROIs, the primary ball and the session statistics onto frames and shows them."""
+
+    def __init__(self, calibrated_rois, roi_colors=ROI_COLORS, scale_factors=(1.0, 1.0), window_name="Putt Tracker"):
+        """
+        Args:
+            calibrated_rois (dict): ROIs as returned by load_and_prepare_rois.
+            roi_colors (dict): ROI name -> BGR outline color.
+            scale_factors (tuple): (x, y) scale from frame coordinates to display coordinates.
+            window_name (str): Title of the display window.
+        """
+        self.calibrated_rois = calibrated_rois
+        self.roi_colors = roi_colors
+        self.scale_factors = scale_factors
+        self.window_name = window_name
+
+        # Scaled and colored once, in drawing order; the ROIs do not change during a session.
+        scale = np.array(scale_factors)
+        self.roi_outlines = []
+        for name, roi_points_data in calibrated_rois.items():
+            if name == "camera_index": # Skip camera_index
+                continue
+            roi_points = _roi_points(roi_points_data)
+            if len(roi_points) > 0:
+                self.roi_outlines.append(((roi_points * scale).astype(np.int32), roi_colors.get(name, (255, 255, 255))))
+        self.scaled_hole_roi = (_roi_points(calibrated_rois["HOLE_ROI"]) * scale).astype(np.int32)
+        self.roi_layer = None
+        self.hole_layer = None
+
+        self.stats_panel = _TextPanel()
+        self.status_panel = _TextPanel()
+
+    def open(self):
+        cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+    def _draw_outlines(self, image, color):
+        for scaled_roi, roi_color in self.roi_outlines:
+            cv2.polylines(image, [scaled_roi], isClosed=True, color=roi_color if color is None else color, thickness=2)
+
+    def _draw_hole_highlight(self, image, color):
+        if len(self.scaled_hole_roi) > 0:
+            cv2.polylines(image, [self.scaled_hole_roi], isClosed=True, color=(0, 255, 255) if color is None else color, thickness=3) # Yellow highlight
+
+    def render(self, display_frame, result, stats, current_video_time):
+        """
+        Draws all visual elements onto the display frame and shows it.
+
+        Args:
+            display_frame: Frame to draw on, modified in place.
+            result (FrameResult): The classifier's output for this frame.
+            stats (tuple): (total_makes, total_misses, consecutive_makes, max_consecutive_makes).
+            current_video_time (float): Session-relative time, in seconds.
+        """
+        self.draw(display_frame, result, stats, current_video_time)
+        cv2.imshow(self.window_name, display_frame)
+
+    def draw(self, display_frame, result, stats, current_video_time):
+        """Draws the overlay onto display_frame without showing it."""
+        scale_x_display, scale_y_display = self.scale_factors
+        total_makes, total_misses, consecutive_makes, max_consecutive_makes = stats
+        overall_detected_ball_center, roi_flags, classification = result.ball_center, result.roi_flags, result.classification
+
+        if self.roi_layer is None or self.roi_layer.frame_shape != display_frame.shape:
+            self.roi_layer = _StaticLayer(display_frame.shape, self._draw_outlines)
+            self.hole_layer = _StaticLayer(display_frame.shape, self._draw_hole_highlight)
+
+        # Static ROI outlines
+        self.roi_layer.blit(display_frame)
+
+        # Bounding box and center of the primary ball
+        if result.ball_bbox:
+            x1, y1, x2, y2 = result.ball_bbox
+            cv2.rectangle(display_frame, (int(x1 * scale_x_display), int(y1 * scale_y_display)),
+                          (int(x2 * scale_x_display), int(y2 * scale_y_display)), (0, 255, 0), 2)
+
+        # Draw a circle at the ball's position on the display frame (scaled)
+        if overall_detected_ball_center:
+            cv2.circle(display_frame, (int(overall_detected_ball_center[0] * scale_x_display), int(overall_detected_ball_center[1] * scale_y_display)), 10, (0, 255, 255), -1)
+
+        # Highlight HOLE_ROI if ball is detected within it
+        if roi_flags.hole:
+            self.hole_layer.blit(display_frame)
+
+        # Overall statistics, session timer (minutes:seconds) and putt result; re-rendered only when one changes
+        stats_lines = [
+            (f"Makes: {total_makes}", (10, 30), 0.7, (255, 255, 0), 2),
+            (f"Misses: {total_misses}", (10, 60), 0.7, (255, 255, 0), 2),
+            (f"Consecutive Makes: {consecutive_makes}", (10, 90), 0.7, (255, 255, 0), 2),
+            (f"Max Consecutive Makes: {max_consecutive_makes}", (10, 120), 0.7, (255, 255, 0), 2),
+        ]
+        if current_video_time > 0: # Only display if timer has started
+            minutes = int(current_video_time // 60)
+            seconds = int(current_video_time % 60)
+            stats_lines.append((f"Time: {minutes:02d}:{seconds:02d}", (10, 150), 0.7, (0, 255, 255), 2))
+        if classification:
+            stats_lines.append((f"Putt: {classification}", (10, 150), 0.7, (0, 255, 0), 2))
+        self.stats_panel.draw(display_frame, tuple(stats_lines))
+
+        # Ball coordinates change every frame, so they are drawn directly
+        y_offset_roi = 180 # Adjusted starting y-offset to avoid overlap with putt result
+        if overall_detected_ball_center:
+            cv2.putText(display_frame, f"Ball: ({overall_detected_ball_center[0] * scale_x_display:.0f}, {overall_detected_ball_center[1] * scale_y_display:.0f})", (10, y_offset_roi), FONT, 0.7, (255, 255, 255), 2)
+            y_offset_roi += 30
+
+        # ROI status, re-rendered only when a flag flips or the ball appears or disappears
+        status_lines = []
+        for k, v in roi_flags.display_items():
+            status_lines.append((f"{k}: {v}", (10, y_offset_roi), 0.5, (255, 255, 255), 1))
+            y_offset_roi += 20
+        self.status_panel.draw(display_frame, tuple(status_lines))
@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 import time
+from trace_recorder import (EVENT_STATE, EVENT_ROI_ENTER, EVENT_ROI_EXIT, EVENT_CLASSIFICATION,
+                            EVENT_BALLS_IGNORED, EVENT_PUTT_START)
 
 class PuttStatus:
     WAITING = "Waiting for Putt"
@@ -9,6 +11,91 @@ class PuttStatus:
     BALL_IN_CATCH = "Ball in Catch Area"
     BALL_IN_HOLE = "Ball in Hole"
 
+# Bit assigned to each ROI in the classifier's label raster. A raster pixel holds the OR of
+# the bits of every ROI that contains it, so one lookup answers all membership questions.
+ROI_BITS = {name: 1 << i for i, name in enumerate([
+    "PUTTING_MAT_ROI", "RAMP_ROI", "HOLE_ROI", "LEFT_OF_MAT_ROI", "CATCH_ROI", "RETURN_TRACK_ROI",
+    "RAMP_LEFT_ROI", "RAMP_CENTER_ROI", "RAMP_RIGHT_ROI",
+    "HOLE_TOP_ROI", "HOLE_RIGHT_ROI", "HOLE_LOW_ROI", "HOLE_LEFT_ROI",
+    "IGNORE_AREA_ROI",
+])}
+
+HOLE_QUADRANT_BITS = (ROI_BITS["HOLE_TOP_ROI"] | ROI_BITS["HOLE_RIGHT_ROI"] |
+                      ROI_BITS["HOLE_LOW_ROI"] | ROI_BITS["HOLE_LEFT_ROI"])
+# ROIs reported in RoiFlags. HOLE_ROI is excluded here because it is set from the hole quadrants.
+TRACKED_ROI_BITS = sum(bit for name, bit in ROI_BITS.items() if name not in ("HOLE_ROI", "IGNORE_AREA_ROI"))
+
+def _roi_flag(roi_name):
+    bit = ROI_BITS[roi_name]
+    return property(lambda self: bool(self & bit), doc=f"True if the primary ball is in {roi_name}.")
+
+class RoiFlags(int):
+    """
+    ROI membership of the primary ball as one integer bitmask of ROI_BITS.
+
+    Being an int, flags are compared, stored and XORed like plain integers; the properties
+    give named access to single ROIs. The hole flag is set when the ball is in any hole quadrant.
+    """
+    __slots__ = ()
+
+    putting_mat = _roi_flag("PUTTING_MAT_ROI")
+    ramp = _roi_flag("RAMP_ROI")
+    hole = _roi_flag("HOLE_ROI")
+    left_of_mat = _roi_flag("LEFT_OF_MAT_ROI")
+    catch = _roi_flag("CATCH_ROI")
+    return_track = _roi_flag("RETURN_TRACK_ROI")
+    ramp_left = _roi_flag("RAMP_LEFT_ROI")
+    ramp_center = _roi_flag("RAMP_CENTER_ROI")
+    ramp_right = _roi_flag("RAMP_RIGHT_ROI")
+    hole_top = _roi_flag("HOLE_TOP_ROI")
+    hole_right = _roi_flag("HOLE_RIGHT_ROI")
+    hole_low = _roi_flag("HOLE_LOW_ROI")
+    hole_left = _roi_flag("HOLE_LEFT_ROI")
+
+    # Order of the ROI status lines in the tracker window
+    DISPLAY_ORDER = (
+        ("ball_in_putting_mat", "PUTTING_MAT_ROI"), ("ball_in_ramp", "RAMP_ROI"),
+        ("ball_in_hole", "HOLE_ROI"), ("ball_in_left_of_mat", "LEFT_OF_MAT_ROI"),
+        ("ball_in_catch", "CATCH_ROI"), ("ball_in_return_track", "RETURN_TRACK_ROI"),
+        ("ball_in_ramp_left", "RAMP_LEFT_ROI"), ("ball_in_ramp_center", "RAMP_CENTER_ROI"),
+        ("ball_in_ramp_right", "RAMP_RIGHT_ROI"), ("ball_in_hole_top", "HOLE_TOP_ROI"),
+        ("ball_in_hole_right", "HOLE_RIGHT_ROI"), ("ball_in_hole_low", "HOLE_LOW_ROI"),
+        ("ball_in_hole_left", "HOLE_LEFT_ROI"),
+    )
+
+    def __contains__(self, roi_name):
+        return bool(self & ROI_BITS[roi_name])
+
+    def display_items(self):
+        """Yields (label, bool) pairs for the tracker window's ROI status lines."""
+        for label, roi_name in self.DISPLAY_ORDER:
+            yield label, bool(self & ROI_BITS[roi_name])
+
+    def __repr__(self):
+        return f"RoiFlags({'|'.join(name for name, bit in ROI_BITS.items() if self & bit) or 0})"
+
+class FrameResult:
+    """What PuttClassifier.update_and_classify reports for one frame."""
+    __slots__ = ("state", "classification", "detailed_classification", "ball_center", "ball_bbox", "roi_flags",
+                 "transition_history")
+
+    def __init__(self, state, classification, detailed_classification, ball_center, ball_bbox, roi_flags, transition_history):
+        self.state = state
+        self.classification = classification
+        self.detailed_classification = detailed_classification
+        self.ball_center = ball_center  # (x, y) of the primary ball, or None
+        self.ball_bbox = ball_bbox      # (x1, y1, x2, y2) of the primary ball, or None
+        self.roi_flags = roi_flags
+        self.transition_history = transition_history
+
+    def __eq__(self, other):
+        if not isinstance(other, FrameResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"FrameResult({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
 class PuttClassifier:
     # Time constants for refined classification
     SHORT_MAKE_THRESHOLD = 0.5  # seconds for quick direct makes
@@ -16,8 +103,17 @@ class PuttClassifier:
     MAKE_TIME_WINDOW = 0.5      # seconds for catch -> ramp -> hole sequence
     CATCH_TO_RETURN_THRESHOLD = 1.2  # seconds for catch to return track
 
-    def __init__(self, yolo_model, rois, logger, ramp_exit_timeout=3.0):
+    # Ball count from which the primary ball is selected with NumPy instead of a Python loop
+    VECTORIZED_MIN_BALLS = 24
+
+    def __init__(self, yolo_model, rois, logger, ramp_exit_timeout=3.0, use_roi_raster=True, tracer=None):
         self.logger = logger
+        # Optional TraceRecorder. Per-frame activity is recorded there as numeric events
+        # instead of being formatted into debug log lines.
+        self.tracer = tracer
+        self.frame_index = 0
+        self.ignored_ball_count = 0
+        self.prev_ignored_ball_count = 0
         self.model = yolo_model
         self.rois = {}
         for name, data in rois.items():
@@ -29,6 +125,14 @@ class PuttClassifier:
                 self.rois[name] = np.array(data, dtype=np.int32)
         self.RAMP_EXIT_TIMEOUT = ramp_exit_timeout
 
+        # Per-pixel ROI bitmask, built once so ROI membership is an array lookup instead of
+        # a cv2.pointPolygonTest call per ROI per frame.
+        self.roi_raster = None
+        self.roi_raster_origin = (0, 0)
+        self._candidate_rank_tables = {}  # Candidate ROI tuple -> table from _candidate_ranks
+        if use_roi_raster:
+            self._build_roi_raster()
+
         self.current_state = PuttStatus.WAITING
         self.putt_start_time = 0
         self.ramp_entry_time = 0
@@ -48,19 +152,8 @@ class PuttClassifier:
         self.left_of_mat_entry_count = 0
 
         # Previous frame ROI states
-        self.prev_ball_in_hole = False
-        self.prev_ball_in_ramp = False
-        self.prev_ball_in_putting_mat = False
-        self.prev_ball_in_catch = False
-        self.prev_ball_in_left_of_mat = False
-        self.prev_ball_in_hole_top = False
-        self.prev_ball_in_hole_right = False
-        self.prev_ball_in_hole_low = False
-        self.prev_ball_in_hole_left = False
-        self.prev_ball_in_ramp_left = False
-        self.prev_ball_in_ramp_center = False
-        self.prev_ball_in_ramp_right = False
-        self.prev_ball_in_return_track = False
+        self.prev_roi_flags = RoiFlags(0)
+        self.ball_in_return_track = False
         self.previous_putt_classified_as_returned = False # New state variable
 
         # Metrics for consecutive makes
@@ -83,6 +176,59 @@ class PuttClassifier:
         self.last_mat_time = 0
         self.is_classified_and_logged = False
 
+    def _build_roi_raster(self):
+        """
+        Rasterizes the calibrated polygons into self.roi_raster, a uint16 image of ROI_BITS.
+
+        cv2.fillPoly and cv2.pointPolygonTest can disagree on pixels right at a polygon edge,
+        so pixels in a thin band around each edge are decided with cv2.pointPolygonTest itself.
+        That keeps every lookup identical to the per-frame polygon test it replaces.
+        """
+        polygons = {name: self.rois[name] for name in ROI_BITS if name in self.rois and len(self.rois[name]) > 0}
+        if not polygons:
+            self.roi_raster = np.zeros((1, 1), dtype=np.uint16)
+            self._raster_origin_xy = self._raster_max_xy = np.zeros(2, dtype=np.int64)
+            return
+
+        all_points = np.concatenate([p.reshape(-1, 2) for p in polygons.values()])
+        # A one-pixel empty border lets vectorized lookups clip out-of-range points onto it.
+        origin_x, origin_y = min(0, int(all_points[:, 0].min())) - 1, min(0, int(all_points[:, 1].min())) - 1
+        width = int(all_points[:, 0].max()) - origin_x + 2
+        height = int(all_points[:, 1].max()) - origin_y + 2
+        raster = np.zeros((height, width), dtype=np.uint16)
+
+        for name, polygon in polygons.items():
+            polygon = polygon.reshape(-1, 2)
+            shifted = polygon - [origin_x, origin_y]
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, [shifted], 1)
+            band = np.zeros((height, width), dtype=np.uint8)
+            cv2.polylines(band, [shifted], isClosed=True, color=1, thickness=5)
+            for y, x in zip(*np.nonzero(band)):
+                inside = cv2.pointPolygonTest(polygon, (int(x) + origin_x, int(y) + origin_y), False) >= 0
+                mask[y, x] = 1 if inside else 0
+            raster[mask.astype(bool)] |= ROI_BITS[name]
+
+        self.roi_raster = raster
+        self.roi_raster_origin = (origin_x, origin_y)
+        self._raster_origin_xy = np.array(self.roi_raster_origin, dtype=np.int64)
+        self._raster_max_xy = np.array([width - 1, height - 1], dtype=np.int64)
+
+    def _roi_flags(self, point):
+        """Returns the OR of ROI_BITS for every ROI containing the point."""
+        x, y = int(point[0]), int(point[1])
+        if self.roi_raster is None:
+            flags = 0
+            for name, bit in ROI_BITS.items():
+                if name in self.rois and self._check_point_in_roi((x, y), self.rois[name]):
+                    flags |= bit
+            return flags
+        x -= self.roi_raster_origin[0]
+        y -= self.roi_raster_origin[1]
+        if 0 <= y < self.roi_raster.shape[0] and 0 <= x < self.roi_raster.shape[1]:
+            return int(self.roi_raster[y, x])
+        return 0
+
     def _check_bbox_intersection_roi(self, bbox, roi):
         # bbox is (x1, y1, x2, y2)
         # roi is a list of points forming a polygon
@@ -116,31 +262,128 @@ class PuttClassifier:
 
         return False
 
+    def _roi_flags_many(self, points):
+        """
+        Vectorized _roi_flags for an (N, 2) integer array of points.
+
+        Returns:
+            np.ndarray: (N,) integer array with the OR of ROI_BITS for each point.
+        """
+        if self.roi_raster is None:
+            return np.array([self._roi_flags(point) for point in points], dtype=np.int64)
+        # Points outside the raster land on its empty border
+        local = points - self._raster_origin_xy
+        np.maximum(local, 0, out=local)
+        np.minimum(local, self._raster_max_xy, out=local)
+        return self.roi_raster[local[:, 1], local[:, 0]]
+
+    def _candidate_ranks(self, candidate_rois):
+        """
+        Lookup table from a ball's ROI flags to the index of its candidate ROI.
+
+        The membership matrix of every possible flags value x candidate ROI is evaluated once
+        per candidate list, so ranking a ball is a single table lookup. Balls in no candidate
+        ROI, or in IGNORE_AREA_ROI, rank len(candidate_rois).
+        """
+        ranks = self._candidate_rank_tables.get(candidate_rois)
+        if ranks is None:
+            all_flags = np.arange(1 << len(ROI_BITS), dtype=np.int64)
+            roi_bits = np.array([ROI_BITS[name] for name in candidate_rois], dtype=np.int64)
+            membership = (all_flags[:, None] & roi_bits[None, :]) != 0
+            membership[(all_flags & ROI_BITS["IGNORE_AREA_ROI"]) != 0] = False
+            ranks = np.where(membership.any(axis=1), membership.argmax(axis=1), len(candidate_rois)).astype(np.uint8)
+            self._candidate_rank_tables[candidate_rois] = ranks
+        return ranks
+
+    def _select_primary_ball(self, detected_balls, candidate_rois):
+        """
+        Picks the primary ball: the one whose first containing ROI in candidate_rois has the
+        highest priority, then the most confident one. Balls in IGNORE_AREA_ROI are never picked.
+
+        With many balls on screen the ROI flags and candidate ranks of all balls are computed
+        in a few NumPy operations; for a handful of balls a plain loop is cheaper than the NumPy
+        call overhead. Both give the same result.
+
+        Args:
+            detected_balls (list): Detections sorted by confidence, most confident first.
+            candidate_rois (tuple): ROI names in priority order.
+
+        Returns:
+            tuple: (index into detected_balls, ROI name, ROI flags of every ball), where the
+                index and ROI name are None if no ball is in a candidate ROI.
+        """
+        ranks = self._candidate_ranks(candidate_rois)
+        no_candidate = len(candidate_rois)
+
+        if len(detected_balls) >= self.VECTORIZED_MIN_BALLS:
+            balls = np.array(detected_balls, dtype=np.float64)
+            centers = balls[:, :2].astype(np.int64)  # Truncates like int(), matching the per-ball centers
+            flags = self._roi_flags_many(centers)
+            self.ignored_ball_count = int(np.count_nonzero(flags & ROI_BITS["IGNORE_AREA_ROI"]))
+
+            ball_ranks = ranks[flags]
+            best_rank = int(ball_ranks.min())
+            if best_rank == no_candidate:
+                return None, None, flags
+            # argmax returns the first maximum, so equal confidences keep the detection order
+            tied = np.flatnonzero(ball_ranks == best_rank)
+            return int(tied[balls[tied, 6].argmax()]), candidate_rois[best_rank], flags
+
+        flags = []
+        best, best_key = None, None
+        for i, ball_data in enumerate(detected_balls):
+            detected_center = (int(ball_data[0]), int(ball_data[1]))
+            ball_flags = self._roi_flags(detected_center)
+            flags.append(ball_flags)
+            if ball_flags & ROI_BITS["IGNORE_AREA_ROI"]:
+                self.ignored_ball_count += 1
+                continue
+            key = (ranks[ball_flags], -ball_data[6])
+            if key[0] != no_candidate and (best_key is None or key < best_key):
+                best, best_key = i, key
+        if best is None:
+            return None, None, flags
+        return best, candidate_rois[best_key[0]], flags
+
+    def _bbox_intersects_roi(self, bbox, roi_name):
+        """Raster-backed equivalent of _check_bbox_intersection_roi for a named ROI."""
+        roi = self.rois[roi_name]
+        if self.roi_raster is None:
+            return self._check_bbox_intersection_roi(bbox, roi)
+        if len(roi) == 0:
+            return False
+        bit = ROI_BITS[roi_name]
+        # Same test points as _check_bbox_intersection_roi: the four corners, then the center
+        test_points = ((bbox[0], bbox[1]), (bbox[2], bbox[1]), (bbox[2], bbox[3]), (bbox[0], bbox[3]),
+                       ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2))
+        for point in test_points:
+            if self._roi_flags(point) & bit:
+                return True
+        for p in roi:
+            if bbox[0] <= p[0] <= bbox[2] and bbox[1] <= p[1] <= bbox[3]:
+                return True
+        return False
+
     def _check_point_in_roi(self, point, roi):
         if len(roi) == 0:
             return False
         return cv2.pointPolygonTest(roi, (int(point[0]), int(point[1])), False) >= 0
 
-    def update_and_classify(self, frame, detected_balls, current_frame_time):
-        self.logger.debug(f"--- Frame {current_frame_time:.2f}s ---")
+    def update_and_classify(self, detected_balls, current_frame_time):
+        """
+        Classifies one frame's detections. Works on detections only; drawing the primary ball
+        is left to the caller (see overlay_renderer.OverlayRenderer).
+        """
+        self.frame_index += 1
+        state_at_frame_start = self.current_state
+        self.ignored_ball_count = 0
 
         # --- Process Detected Balls ---
 
         # Initialize ROI states and ball center
-        self.ball_in_return_track = False
-        ball_in_ramp = False
-        ball_in_putting_mat = False
-        ball_in_left_of_mat = False
-        ball_in_catch = False
-        ball_in_hole = False
-        ball_in_hole_top = False
-        ball_in_hole_right = False
-        ball_in_hole_low = False
-        ball_in_hole_left = False
-        ball_in_ramp_left = False
-        ball_in_ramp_center = False
-        ball_in_ramp_right = False
+        roi_mask = 0 # ROI_BITS of the primary ball, becomes this frame's RoiFlags
         overall_detected_ball_center = None
+        detected_bbox = None
         transition_history = [] # Initialize transition_history
 
         # Define ROI processing order based on state
@@ -181,56 +424,28 @@ class PuttClassifier:
 
         # Process detected balls
         primary_ball = None
+        primary_flags = 0 # ROI_BITS of the primary ball's center
         highest_priority_roi_for_frame = None # Initialize here
         if detected_balls:
             # Sort by confidence to prioritize more confident detections
             detected_balls.sort(key=lambda x: x[6], reverse=True) 
             
             # Find the primary ball for classification
-            primary_ball_candidates = []
-            for ball_data in detected_balls:
-                scaled_center_x, scaled_center_y, scaled_x1, scaled_y1, scaled_x2, scaled_y2, confidence = ball_data
-                detected_center = (int(scaled_center_x), int(scaled_center_y))
-
-                # Check if the detected ball is in the ignore ROI
-                if self._check_point_in_roi(detected_center, self.rois["IGNORE_AREA_ROI"]):
-                    self.logger.debug(f"Ignoring ball in IGNORE_AREA_ROI at {detected_center}")
-                    continue # Skip this detected ball
-
+            if self.current_state == PuttStatus.WAITING:
                 # Prioritize balls in PUTTING_MAT_ROI or RAMP_ROI when WAITING
-                if self.current_state == PuttStatus.WAITING:
-                    if self._check_point_in_roi(detected_center, self.rois["PUTTING_MAT_ROI"]):
-                        primary_ball_candidates.append((ball_data, "PUTTING_MAT_ROI"))
-                    elif self._check_point_in_roi(detected_center, self.rois["RAMP_ROI"]):
-                        primary_ball_candidates.append((ball_data, "RAMP_ROI"))
-                else:
-                    # When in progress, any ROI is a candidate, sorted by priority
-                    for roi_name, flag_name in roi_priority:
-                        is_in_roi = self._check_point_in_roi(detected_center, self.rois[roi_name])
-                        if is_in_roi:
-                            primary_ball_candidates.append((ball_data, roi_name))
-                            break # Found a primary ball in a prioritized ROI
-            
-            # Create a priority map for faster, cleaner sorting
-            roi_priority_map = {roi_name: i for i, (roi_name, _) in enumerate(roi_priority)}
-
-            if primary_ball_candidates:
-                # Sort candidates: first by state priority, then by confidence
-                if self.current_state == PuttStatus.WAITING:
-                    # For WAITING, prioritize PUTTING_MAT_ROI then RAMP_ROI
-                    primary_ball_candidates.sort(key=lambda x: (x[1] != "PUTTING_MAT_ROI", x[1] != "RAMP_ROI", -x[0][6]))
-                else:
-                    primary_ball_candidates.sort(key=lambda x: (roi_priority_map.get(x[1], len(roi_priority)), -x[0][6]))
-                
-                primary_ball = primary_ball_candidates[0][0] # Get the ball_data tuple
-                highest_priority_roi_for_frame = primary_ball_candidates[0][1] # Get the ROI name
+                candidate_rois = ("PUTTING_MAT_ROI", "RAMP_ROI")
             else:
-                primary_ball = None
-                highest_priority_roi_for_frame = None
+                # When in progress, any ROI is a candidate, sorted by priority
+                candidate_rois = tuple(roi_name for roi_name, _ in roi_priority)
+            primary_index, highest_priority_roi_for_frame, ball_flags = self._select_primary_ball(detected_balls, candidate_rois)
+            if primary_index is not None:
+                primary_ball = detected_balls[primary_index]
+                primary_flags = int(ball_flags[primary_index])
 
             # If no ball found in any prioritized ROI, pick the most confident one overall (if any)
             if not primary_ball and detected_balls:
                 primary_ball = detected_balls[0] # Already sorted by confidence
+                primary_flags = int(ball_flags[0])
                 highest_priority_roi_for_frame = "UNKNOWN_ROI" # Indicate it's not in a specific prioritized ROI
 
             if primary_ball:
@@ -238,64 +453,27 @@ class PuttClassifier:
                 overall_detected_ball_center = (int(scaled_center_x), int(scaled_center_y))
                 detected_bbox = (int(scaled_x1), int(scaled_y1), int(scaled_x2), int(scaled_y2))
 
-                # Draw bounding box and center for the primary ball
-                cv2.rectangle(frame, (int(scaled_x1), int(scaled_y1)), (int(scaled_x2), int(scaled_y2)), (0, 255, 0), 2)
-                cv2.circle(frame, overall_detected_ball_center, 5, (0, 0, 255), -1)
-
-                # Update ROI flags for the primary ball
-                # Check all relevant ROIs for the primary ball
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_TOP_ROI"]):
-                    ball_in_hole_top = True
-                    if self.first_hole_entry_roi is None:
-                        self.first_hole_entry_roi = "HOLE_TOP_ROI"
-                        self.transition_history.append(f"Entered HOLE_TOP_ROI at {current_frame_time:.2f}s")
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_RIGHT_ROI"]):
-                    ball_in_hole_right = True
-                    if self.first_hole_entry_roi is None:
-                        self.first_hole_entry_roi = "HOLE_RIGHT_ROI"
-                        self.transition_history.append(f"Entered HOLE_RIGHT_ROI at {current_frame_time:.2f}s")
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_LOW_ROI"]):
-                    ball_in_hole_low = True
-                    if self.first_hole_entry_roi is None:
-                        self.first_hole_entry_roi = "HOLE_LOW_ROI"
-                        self.transition_history.append(f"Entered HOLE_LOW_ROI at {current_frame_time:.2f}s")
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_LEFT_ROI"]):
-                    ball_in_hole_left = True
-                    if self.first_hole_entry_roi is None:
-                        self.first_hole_entry_roi = "HOLE_LEFT_ROI"
-                        self.transition_history.append(f"Entered HOLE_LEFT_ROI at {current_frame_time:.2f}s")
-                if self._check_bbox_intersection_roi(detected_bbox, self.rois["HOLE_ROI"]):
-                    ball_in_hole = True
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["RETURN_TRACK_ROI"]):
-                    self.ball_in_return_track = True
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["CATCH_ROI"]):
-                    ball_in_catch = True
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_LEFT_ROI"]):
-                    ball_in_ramp_left = True
-                    self.last_ramp_sub_roi = "RAMP_LEFT_ROI"
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_CENTER_ROI"]):
-                    ball_in_ramp_center = True
-                    self.last_ramp_sub_roi = "RAMP_CENTER_ROI"
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_RIGHT_ROI"]):
-                    ball_in_ramp_right = True
-                    self.last_ramp_sub_roi = "RAMP_RIGHT_ROI"
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_ROI"]):
-                    ball_in_ramp = True
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["PUTTING_MAT_ROI"]):
-                    ball_in_putting_mat = True
+                # Update ROI flags for the primary ball, using the flags computed during selection
+                roi_mask = primary_flags & TRACKED_ROI_BITS
+                for quadrant in ("HOLE_TOP_ROI", "HOLE_RIGHT_ROI", "HOLE_LOW_ROI", "HOLE_LEFT_ROI"):
+                    if roi_mask & ROI_BITS[quadrant] and self.first_hole_entry_roi is None:
+                        self.first_hole_entry_roi = quadrant
+                        self.transition_history.append(f"Entered {quadrant} at {current_frame_time:.2f}s")
+                for ramp_sub_roi in ("RAMP_LEFT_ROI", "RAMP_CENTER_ROI", "RAMP_RIGHT_ROI"):
+                    if roi_mask & ROI_BITS[ramp_sub_roi]:
+                        self.last_ramp_sub_roi = ramp_sub_roi
+                if roi_mask & ROI_BITS["PUTTING_MAT_ROI"]:
                     self.ball_was_on_mat = True
                     self.last_mat_time = current_frame_time
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["LEFT_OF_MAT_ROI"]):
-                    ball_in_left_of_mat = True
 
                 # Update transition history for ramp ROIs
                 if self.current_state == PuttStatus.PUTT_IN_PROGRESS:
                     current_ramp_sub_roi = None
-                    if ball_in_ramp_left:
+                    if roi_mask & ROI_BITS["RAMP_LEFT_ROI"]:
                         current_ramp_sub_roi = "RAMP_LEFT_ROI"
-                    elif ball_in_ramp_center:
+                    elif roi_mask & ROI_BITS["RAMP_CENTER_ROI"]:
                         current_ramp_sub_roi = "RAMP_CENTER_ROI"
-                    elif ball_in_ramp_right:
+                    elif roi_mask & ROI_BITS["RAMP_RIGHT_ROI"]:
                         current_ramp_sub_roi = "RAMP_RIGHT_ROI"
 
                     if current_ramp_sub_roi and self.first_ramp_entry_roi is None:
@@ -308,31 +486,43 @@ class PuttClassifier:
                     
                     if current_ramp_sub_roi:
                         self.previous_roi = current_ramp_sub_roi
-                    elif ball_in_putting_mat:
+                    elif roi_mask & ROI_BITS["PUTTING_MAT_ROI"]:
                         self.previous_roi = "PUTTING_MAT_ROI"
-                    elif ball_in_left_of_mat:
+                    elif roi_mask & ROI_BITS["LEFT_OF_MAT_ROI"]:
                         self.previous_roi = "LEFT_OF_MAT_ROI"
-                    elif ball_in_hole:
+                    elif self._bbox_intersects_roi(detected_bbox, "HOLE_ROI"): # Whole bounding box against the hole outline
                         self.previous_roi = "HOLE_ROI"
-                    elif self.ball_in_return_track:
+                    elif roi_mask & ROI_BITS["RETURN_TRACK_ROI"]:
                         self.previous_roi = "RETURN_TRACK_ROI"
-                    elif ball_in_catch:
+                    elif roi_mask & ROI_BITS["CATCH_ROI"]:
                         self.previous_roi = "CATCH_ROI"
                     else:
                         self.previous_roi = None # Ball is not in any tracked ROI
 
-                self.logger.debug(f"Primary ball detected at {overall_detected_ball_center}. ROI states: PUTTING_MAT_ROI={ball_in_putting_mat}, RAMP_ROI={ball_in_ramp}, LEFT_OF_MAT_ROI={ball_in_left_of_mat}, HOLE_ROI={ball_in_hole}, CATCH_ROI={ball_in_catch}, RETURN_TRACK_ROI={self.ball_in_return_track}")
-            else:
-                self.logger.debug("No primary ball detected in this frame.")
-
-        ball_in_hole = ball_in_hole_top or ball_in_hole_right or ball_in_hole_low or ball_in_hole_left
+        # The ball is in the hole when it is in any of the hole quadrants
+        if roi_mask & HOLE_QUADRANT_BITS:
+            roi_mask |= ROI_BITS["HOLE_ROI"]
+        roi_flags = RoiFlags(roi_mask)
+        self.ball_in_return_track = roi_flags.return_track
+        # Entries and exits relative to the previous frame, for all ROIs at once
+        changed = roi_mask ^ self.prev_roi_flags
+        entered = changed & roi_mask
+        exited = changed & self.prev_roi_flags
+        if self.tracer is not None:
+            if entered:
+                self._trace(EVENT_ROI_ENTER, current_frame_time, entered, point=overall_detected_ball_center)
+            if exited:
+                self._trace(EVENT_ROI_EXIT, current_frame_time, exited, point=overall_detected_ball_center)
+            if self.ignored_ball_count != self.prev_ignored_ball_count:
+                self._trace(EVENT_BALLS_IGNORED, current_frame_time, self.ignored_ball_count)
+        self.prev_ignored_ball_count = self.ignored_ball_count
 
         # --- Quick Putt Detection ---
         # A "Quick Putt" occurs if a new putt starts (ball enters ramp from mat)
         # while the previous putt has not yet returned to the return track.
-        if self.current_state == PuttStatus.WAITING and ball_in_ramp and \
+        if self.current_state == PuttStatus.WAITING and roi_flags.ramp and \
            not self.previous_putt_classified_as_returned and not self.ball_in_return_track and \
-           ball_in_left_of_mat: # New putt entered left of mat
+           roi_flags.left_of_mat: # New putt entered left of mat
             
             classification = "MISS"
             detailed_classification = "MISS - QUICK PUTT"
@@ -344,40 +534,38 @@ class PuttClassifier:
             self.is_classified_and_logged = True # Mark as classified for logging
             
             # Return immediately as this putt is classified
-            return self.current_state, classification, detailed_classification, overall_detected_ball_center, \
-                   ball_in_putting_mat, ball_in_ramp, self.ball_in_return_track, ball_in_left_of_mat, \
-                   ball_in_catch, ball_in_hole, ball_in_hole_top, ball_in_hole_right, \
-                   ball_in_hole_low, ball_in_hole_left, ball_in_ramp_left, ball_in_ramp_center, \
-                   ball_in_ramp_right, transition_history
+            self._trace_frame_end(state_at_frame_start, current_frame_time, detailed_classification, overall_detected_ball_center)
+            return FrameResult(self.current_state, classification, detailed_classification,
+                               overall_detected_ball_center, detected_bbox, roi_flags, transition_history)
 
         # Update ROI entry counts
         if self.current_state == PuttStatus.PUTT_IN_PROGRESS:
-            if ball_in_hole and not self.prev_ball_in_hole:
+            if entered & ROI_BITS["HOLE_ROI"]:
                 self.hole_entry_count += 1
                 self.logger.debug(f"Ball entered HOLE_ROI #{self.hole_entry_count} at {current_frame_time:.2f}s")
                 if overall_detected_ball_center:
-                    if self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_TOP_ROI"]):
+                    if primary_flags & ROI_BITS["HOLE_TOP_ROI"]:
                         self.first_hole_entry_roi = "HOLE_TOP_ROI"
-                    elif self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_RIGHT_ROI"]):
+                    elif primary_flags & ROI_BITS["HOLE_RIGHT_ROI"]:
                         self.first_hole_entry_roi = "HOLE_RIGHT_ROI"
-                    elif self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_LOW_ROI"]):
+                    elif primary_flags & ROI_BITS["HOLE_LOW_ROI"]:
                         self.first_hole_entry_roi = "HOLE_LOW_ROI"
-                    elif self._check_point_in_roi(overall_detected_ball_center, self.rois["HOLE_LEFT_ROI"]):
+                    elif primary_flags & ROI_BITS["HOLE_LEFT_ROI"]:
                         self.first_hole_entry_roi = "HOLE_LEFT_ROI"
                     else:
                         self.first_hole_entry_roi = "UNKNOWN_HOLE_QUADRANT" # Fallback
                     self.transition_history.append(f"Entered {self.first_hole_entry_roi} at {current_frame_time:.2f}s")
 
-            if ball_in_ramp and not self.prev_ball_in_ramp:
+            if entered & ROI_BITS["RAMP_ROI"]:
                 self.ramp_entry_count += 1
                 self.logger.debug(f"Ball entered RAMP_ROI #{self.ramp_entry_count} at {current_frame_time:.2f}s")
-            if ball_in_putting_mat and not self.prev_ball_in_putting_mat:
+            if entered & ROI_BITS["PUTTING_MAT_ROI"]:
                 self.putting_mat_entry_count += 1
                 self.logger.debug(f"Ball entered PUTTING_MAT_ROI #{self.putting_mat_entry_count} at {current_frame_time:.2f}s")
-            if ball_in_catch and not self.prev_ball_in_catch:
+            if entered & ROI_BITS["CATCH_ROI"]:
                 self.catch_entry_count += 1
                 self.logger.debug(f"Ball entered CATCH_ROI #{self.catch_entry_count} at {current_frame_time:.2f}s")
-            if ball_in_left_of_mat and not self.prev_ball_in_left_of_mat:
+            if entered & ROI_BITS["LEFT_OF_MAT_ROI"]:
                 self.left_of_mat_entry_count += 1
                 self.logger.debug(f"Ball entered LEFT_OF_MAT_ROI #{self.left_of_mat_entry_count} at {current_frame_time:.2f}s")
 
@@ -390,7 +578,7 @@ class PuttClassifier:
             if self.ball_was_on_mat and (current_frame_time - self.last_mat_time) > 1.0: # 1 second timeout
                 self.ball_was_on_mat = False
 
-            if self.ball_was_on_mat and ball_in_ramp:
+            if self.ball_was_on_mat and roi_flags.ramp:
                 # Ball was on mat and is now on the ramp, initiate putt
                 self.current_state = PuttStatus.PUTT_IN_PROGRESS
                 self.logger.debug(f"New Putt Started at {current_frame_time:.2f}s (Mat to Ramp)")
@@ -398,45 +586,44 @@ class PuttClassifier:
                 self.ramp_entry_time = current_frame_time # Record ramp entry time
                 
                 # Determine the specific ramp entry ROI name for classification output
-                if self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_LEFT_ROI"]):
+                if primary_flags & ROI_BITS["RAMP_LEFT_ROI"]:
                     self.first_ramp_entry_roi = "RAMP_LEFT_ROI"
-                elif self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_CENTER_ROI"]):
+                elif primary_flags & ROI_BITS["RAMP_CENTER_ROI"]:
                     self.first_ramp_entry_roi = "RAMP_CENTER_ROI"
-                elif self._check_point_in_roi(overall_detected_ball_center, self.rois["RAMP_RIGHT_ROI"]):
+                elif primary_flags & ROI_BITS["RAMP_RIGHT_ROI"]:
                     self.first_ramp_entry_roi = "RAMP_RIGHT_ROI"
                 else:
                     self.first_ramp_entry_roi = "RAMP_ROI" # Fallback if not in a specific sub-ROI
 
                 self.logger.debug(f"First ramp entry ROI: {self.first_ramp_entry_roi}")
+                if self.tracer is not None:
+                    self._trace(EVENT_PUTT_START, current_frame_time, self.tracer.intern(self.first_ramp_entry_roi),
+                                point=overall_detected_ball_center)
 
         elif self.current_state == PuttStatus.AWAITING_RETURN:
-            self.logger.debug(f"Current State: {self.current_state}")
             # If the returning ball is no longer in the return track, transition back to WAITING
-            if not self.ball_in_return_track and self.prev_ball_in_return_track:
+            if exited & ROI_BITS["RETURN_TRACK_ROI"]:
                 self.logger.debug(f"Ball exited return track at {current_frame_time:.2f}s. Transitioning to WAITING.")
                 self.current_state = PuttStatus.WAITING
 
         elif self.current_state == PuttStatus.PUTT_IN_PROGRESS:
-            self.logger.debug(f"Current State: {self.current_state}")
-            self.logger.debug(f"has_entered_hole: {self.has_entered_hole}, ball_in_return_track: {self.ball_in_return_track}, has_crossed_catch_roi: {self.has_crossed_catch_roi}")
-            self.logger.debug(f"ramp_exit_time: {self.ramp_exit_time}, catch_entry_time: {self.catch_entry_time}, ramp_entry_time: {self.ramp_entry_time}")
             # Update entry times for ROIs
-            if overall_detected_ball_center and ball_in_ramp and self.ramp_entry_time == 0:
+            if overall_detected_ball_center and roi_flags.ramp and self.ramp_entry_time == 0:
                 self.ramp_entry_time = current_frame_time
                 self.logger.debug(f"Ball entered RAMP_ROI at {self.ramp_entry_time:.2f}s")
 
-            if overall_detected_ball_center and ball_in_catch and self.catch_entry_time == 0:
+            if overall_detected_ball_center and roi_flags.catch and self.catch_entry_time == 0:
                 self.catch_entry_time = current_frame_time
                 self.has_crossed_catch_roi = True # Set the flag here
                 self.logger.debug(f"Ball entered CATCH_ROI at {self.catch_entry_time:.2f}s")
 
-            if overall_detected_ball_center and ball_in_hole and self.hole_entry_time == 0:
+            if overall_detected_ball_center and roi_flags.hole and self.hole_entry_time == 0:
                 self.hole_entry_time = current_frame_time
                 self.has_entered_hole = True
                 self.logger.debug(f"Ball entered HOLE_ROI at {self.hole_entry_time:.2f}s")
 
             # Track ramp exit time
-            if self.prev_ball_in_ramp and not ball_in_ramp:
+            if exited & ROI_BITS["RAMP_ROI"]:
                 self.ramp_exit_time = current_frame_time
                 self.logger.debug(f"Ball exited RAMP_ROI at {self.ramp_exit_time:.2f}s")
 
@@ -455,7 +642,7 @@ class PuttClassifier:
             # MISS - RETURN: Ball has returned to the mat after the putt was initiated.
             # This is a high-priority check to terminate the current putt attempt.
             # A small delay is used to prevent false triggers at the very start of the putt.
-            if (ball_in_putting_mat or ball_in_left_of_mat) and (current_frame_time - self.putt_start_time > 0.25):
+            if (roi_flags.putting_mat or roi_flags.left_of_mat) and (current_frame_time - self.putt_start_time > 0.25):
                 temp_classification = "MISS"
                 temp_detailed_classification = f"MISS - RETURN: {entry_roi_str} - {exit_roi_str}"
                 self.logger.debug(f"MISS (Return) triggered at {current_frame_time:.2f}s. Ball re-entered mat from ramp.")
@@ -516,26 +703,25 @@ class PuttClassifier:
         
 
         # Update previous frame ROI states at the very end of the function
-        self.prev_ball_in_hole = ball_in_hole
-        self.prev_ball_in_ramp = ball_in_ramp
-        self.prev_ball_in_putting_mat = ball_in_putting_mat
-        self.prev_ball_in_catch = ball_in_catch
-        self.prev_ball_in_left_of_mat = ball_in_left_of_mat
-        self.prev_ball_in_hole_top = ball_in_hole_top
-        self.prev_ball_in_hole_right = ball_in_hole_right
-        self.prev_ball_in_hole_low = ball_in_hole_low
-        self.prev_ball_in_hole_left = ball_in_hole_left
-        self.prev_ball_in_ramp_left = ball_in_ramp_left
-        self.prev_ball_in_ramp_center = ball_in_ramp_center
-        self.prev_ball_in_ramp_right = ball_in_ramp_right
-        self.prev_ball_in_return_track = self.ball_in_return_track # Update new prev state
-
-        self.logger.debug(f"Returning classification: '{classification}', detailed: '{detailed_classification}'")
-        return self.current_state, classification, detailed_classification, overall_detected_ball_center, \
-               ball_in_putting_mat, ball_in_ramp, self.ball_in_return_track, ball_in_left_of_mat, \
-               ball_in_catch, ball_in_hole, ball_in_hole_top, ball_in_hole_right, \
-               ball_in_hole_low, ball_in_hole_left, ball_in_ramp_left, ball_in_ramp_center, \
-               ball_in_ramp_right, transition_history
+        self.prev_roi_flags = roi_flags
+
+        self._trace_frame_end(state_at_frame_start, current_frame_time, detailed_classification, overall_detected_ball_center)
+        return FrameResult(self.current_state, classification, detailed_classification,
+                           overall_detected_ball_center, detected_bbox, roi_flags, transition_history)
+
+    def _trace(self, event, current_frame_time, value=0, aux=0, point=None):
+        self.tracer.record(event, self.frame_index, current_frame_time, self.tracer.intern(self.current_state),
+                           value, aux, point)
+
+    def _trace_frame_end(self, state_at_frame_start, current_frame_time, detailed_classification, ball_center):
+        """Records the frame's classification and state change, if any."""
+        if self.tracer is None:
+            return
+        if detailed_classification:
+            self._trace(EVENT_CLASSIFICATION, current_frame_time, self.tracer.intern(detailed_classification), point=ball_center)
+        if self.current_state != state_at_frame_start:
+            self._trace(EVENT_STATE, current_frame_time, self.tracer.intern(self.current_state),
+                        self.tracer.intern(state_at_frame_start))
 
     def prepare_for_new_putt(self):
         self.logger.debug("Preparing for new putt...")
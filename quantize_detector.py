@@ -0,0 +1,270 @@
+"""
+INT8 quantization workflow for the golf ball detector.
+
+  quantize   Export models/best.pt and produce an INT8 model for onnxruntime or openvino,
+             calibrated on frames from recorded session clips.
+  benchmark  Run the FP32 and INT8 models through VideoProcessor on recorded clips and report
+             per-frame latency next to how well the INT8 detections agree with FP32.
+
+The INT8 model is an ordinary exported model, so run_tracker loads it with
+--engine onnxruntime --model models/best_int8.onnx (or --engine openvino --model
+models/best_int8_openvino_model), with the usual min_bbox_area filter and class-0 selection.
+"""
+import os
+import time
+import logging
+import argparse
+import cv2
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from inference_engines import exported_model_path, export_model, preprocess, letterbox_size
+from video_processor import VideoProcessor, compute_roi_crop_rect, crop_frame
+from roi_config import load_and_prepare_rois
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(SCRIPT_DIR, "models", "best.pt")
+
+logger = logging.getLogger("quantize_detector")
+
+
+def read_clip_frames(clip_paths, max_frames, stride=1):
+    """Yields up to max_frames frames from the clips, taking every stride-th frame."""
+    count = 0
+    for clip_path in clip_paths:
+        cap = cv2.VideoCapture(clip_path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open clip {clip_path}")
+        index = 0
+        try:
+            while count < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if index % stride == 0:
+                    count += 1
+                    yield frame
+                index += 1
+        finally:
+            cap.release()
+        if count >= max_frames:
+            return
+
+
+def calibration_inputs(clip_paths, num_frames, crop_rect, fixed_imgsz=None):
+    """
+    Preprocessed (NCHW float32) detector inputs for calibration, cropped like production frames.
+    Models with a static input size get every crop padded to fixed_imgsz, as the engines do.
+    """
+    inputs = []
+    for frame in read_clip_frames(clip_paths, num_frames, stride=5):
+        crop, _, imgsz = crop_frame(frame, crop_rect)
+        blob, _ = preprocess([crop], letterbox_size(imgsz, fixed_imgsz), fixed_imgsz)
+        inputs.append(blob)
+    if not inputs:
+        raise ValueError("No calibration frames could be read from the clips.")
+    return inputs
+
+
+def fp32_export(model_path, engine):
+    """Returns the FP32 export of model_path for the engine, exporting a .pt model if needed."""
+    if not model_path.endswith(".pt"):
+        return model_path
+    exported_path = exported_model_path(model_path, engine)
+    if not os.path.exists(exported_path):
+        exported_path = export_model(model_path, engine)
+    return exported_path
+
+
+def quantize_onnx(model_path, clip_paths, num_frames, crop_rect, output_path):
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static, quant_pre_process)
+
+    fp32_path = fp32_export(model_path, "onnxruntime")
+    model_input = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0]
+    input_name = model_input.name
+    height = model_input.shape[2]
+    fixed_imgsz = height if isinstance(height, int) else None # Static exports fix the input size
+    inputs = calibration_inputs(clip_paths, num_frames, crop_rect, fixed_imgsz=fixed_imgsz)
+    logger.info(f"Calibrating on {len(inputs)} frames...")
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.iterator = iter([{input_name: blob} for blob in inputs])
+
+        def get_next(self):
+            return next(self.iterator, None)
+
+    preprocessed_path = output_path + ".prep.onnx"
+    quant_pre_process(fp32_path, preprocessed_path)
+    try:
+        quantize_static(preprocessed_path, output_path, FrameReader(),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(preprocessed_path)
+    return output_path
+
+
+def quantize_openvino(model_path, clip_paths, num_frames, crop_rect, output_path):
+    import nncf
+    import openvino as ov
+
+    fp32_path = fp32_export(model_path, "openvino")
+    if os.path.isdir(fp32_path):
+        fp32_path = os.path.join(fp32_path, next(f for f in os.listdir(fp32_path) if f.endswith(".xml")))
+    model = ov.Core().read_model(fp32_path)
+    height = model.input(0).get_partial_shape()[2]
+    fixed_imgsz = height.get_length() if height.is_static else None
+    inputs = calibration_inputs(clip_paths, num_frames, crop_rect, fixed_imgsz=fixed_imgsz)
+    logger.info(f"Calibrating on {len(inputs)} frames...")
+
+    quantized = nncf.quantize(model, nncf.Dataset(inputs), preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(inputs))
+    os.makedirs(output_path, exist_ok=True)
+    ov.save_model(quantized, os.path.join(output_path, "model.xml"))
+    return output_path
+
+
+def default_int8_path(model_path, engine):
+    base = os.path.splitext(model_path)[0]
+    return base + "_int8.onnx" if engine == "onnxruntime" else base + "_int8_openvino_model"
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[2], b[2]), max(a[3], b[3])
+    x2, y2 = min(a[4], b[4]), min(a[5], b[5])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[4] - a[2]) * (a[5] - a[3]) + (b[4] - b[2]) * (b[5] - b[3]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def match_detections(reference, candidate, iou_threshold):
+    """Greedily matches candidate detections to reference ones. Returns [(ref, cand)] pairs."""
+    pairs, used = [], set()
+    for ref in sorted(reference, key=lambda d: d[6], reverse=True):
+        best, best_iou = None, iou_threshold
+        for j, cand in enumerate(candidate):
+            if j in used:
+                continue
+            iou = box_iou(ref, cand)
+            if iou >= best_iou:
+                best, best_iou = j, iou
+        if best is not None:
+            used.add(best)
+            pairs.append((ref, candidate[best]))
+    return pairs
+
+
+def benchmark(args):
+    console = Console()
+    crop_rect = None
+    if args.config:
+        rois = load_and_prepare_rois(args.config, logger)
+        crop_rect = compute_roi_crop_rect(rois) if rois is not None else None
+
+    int8_model = args.int8_model or default_int8_path(args.model, args.engine)
+    models = [("FP32", args.fp32_engine, args.model), ("INT8", args.engine, int8_model)]
+    processors = []
+    for label, engine, path in models:
+        processor = VideoProcessor(model_path=path, min_bbox_area=50, crop_rect=crop_rect,
+                                   engine=engine, threads=args.threads)
+        processors.append((label, processor))
+
+    latencies = {label: [] for label, _ in processors}
+    reference_count = candidate_count = matched = frames = same_count_frames = 0
+    center_errors, confidence_deltas = [], []
+
+    for frame in read_clip_frames(args.clips, args.max_frames):
+        outputs = {}
+        for label, processor in processors:
+            if frames == 0:
+                processor.warmup(frame.shape)
+            t0 = time.perf_counter()
+            outputs[label] = processor.process_frame(frame)
+            latencies[label].append((time.perf_counter() - t0) * 1000.0)
+
+        reference, candidate = outputs["FP32"], outputs["INT8"]
+        pairs = match_detections(reference, candidate, args.iou)
+        frames += 1
+        reference_count += len(reference)
+        candidate_count += len(candidate)
+        matched += len(pairs)
+        same_count_frames += len(reference) == len(candidate)
+        for ref, cand in pairs:
+            center_errors.append(float(np.hypot(ref[0] - cand[0], ref[1] - cand[1])))
+            confidence_deltas.append(float(cand[6] - ref[6]))
+
+    if frames == 0:
+        console.print("[bold red]No frames could be read from the clips.[/bold red]")
+        return
+
+    latency_table = Table(title=f"Per-frame detector latency over {frames} frames (ms)")
+    for column in ("Model", "Engine", "Mean", "P50", "P95", "FPS"):
+        latency_table.add_column(column)
+    for label, engine, path in models:
+        values = np.array(latencies[label])
+        latency_table.add_row(f"{label} ({os.path.basename(path)})", engine, f"{values.mean():.1f}",
+                              f"{np.percentile(values, 50):.1f}", f"{np.percentile(values, 95):.1f}",
+                              f"{1000.0 / values.mean():.1f}")
+    console.print(latency_table)
+
+    agreement_table = Table(title=f"INT8 agreement with FP32 (IoU >= {args.iou})")
+    agreement_table.add_column("Metric")
+    agreement_table.add_column("Value")
+    agreement_table.add_row("FP32 detections", str(reference_count))
+    agreement_table.add_row("INT8 detections", str(candidate_count))
+    agreement_table.add_row("Recall vs FP32", f"{matched / reference_count:.3f}" if reference_count else "N/A")
+    agreement_table.add_row("Precision vs FP32", f"{matched / candidate_count:.3f}" if candidate_count else "N/A")
+    agreement_table.add_row("Frames with same ball count", f"{same_count_frames / frames:.3f}")
+    agreement_table.add_row("Mean center error (px)", f"{np.mean(center_errors):.2f}" if center_errors else "N/A")
+    agreement_table.add_row("Mean confidence delta", f"{np.mean(confidence_deltas):+.3f}" if confidence_deltas else "N/A")
+    agreement_table.add_row("Speedup", f"{np.mean(latencies['FP32']) / np.mean(latencies['INT8']):.2f}x")
+    console.print(agreement_table)
+
+
+def quantize(args):
+    crop_rect = None
+    if args.config:
+        rois = load_and_prepare_rois(args.config, logger)
+        crop_rect = compute_roi_crop_rect(rois) if rois is not None else None
+
+    output_path = args.output or default_int8_path(args.model, args.engine)
+    if args.engine == "onnxruntime":
+        quantize_onnx(args.model, args.clips, args.calibration_frames, crop_rect, output_path)
+    else:
+        quantize_openvino(args.model, args.clips, args.calibration_frames, crop_rect, output_path)
+    Console().print(f"[bold green]INT8 model written to {output_path}[/bold green]")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Produce and benchmark an INT8-quantized golf ball detector.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quantize_parser = subparsers.add_parser("quantize", help="Create an INT8 model calibrated on recorded clips.")
+    quantize_parser.add_argument("--model", default=DEFAULT_MODEL, help="FP32 .pt model (or its FP32 export).")
+    quantize_parser.add_argument("--engine", choices=("onnxruntime", "openvino"), default="onnxruntime", help="Engine to quantize for.")
+    quantize_parser.add_argument("--clips", nargs="+", required=True, help="Recorded session videos to draw calibration frames from.")
+    quantize_parser.add_argument("--config", help="Calibration JSON; if given, frames are cropped to the ROIs as in run_tracker.")
+    quantize_parser.add_argument("--calibration_frames", type=int, default=300, help="Number of calibration frames.")
+    quantize_parser.add_argument("--output", help="Output path. Defaults to <model>_int8.onnx or <model>_int8_openvino_model.")
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Compare INT8 latency and detections against FP32.")
+    benchmark_parser.add_argument("--model", default=DEFAULT_MODEL, help="FP32 model.")
+    benchmark_parser.add_argument("--fp32_engine", choices=("ultralytics", "onnxruntime", "openvino"), default="ultralytics", help="Engine for the FP32 model.")
+    benchmark_parser.add_argument("--int8_model", help="INT8 model. Defaults to the quantize output path.")
+    benchmark_parser.add_argument("--engine", choices=("onnxruntime", "openvino"), default="onnxruntime", help="Engine for the INT8 model.")
+    benchmark_parser.add_argument("--clips", nargs="+", required=True, help="Recorded session videos to benchmark on.")
+    benchmark_parser.add_argument("--config", help="Calibration JSON; if given, inference is cropped to the ROIs as in run_tracker.")
+    benchmark_parser.add_argument("--max_frames", type=int, default=1000, help="Maximum number of frames to benchmark.")
+    benchmark_parser.add_argument("--threads", type=int, help="Intra-op threads for both engines.")
+    benchmark_parser.add_argument("--iou", type=float, default=0.5, help="IoU needed for an INT8 box to match an FP32 box.")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    if args.command == "quantize":
+        quantize(args)
+    else:
+        benchmark(args)
@@ -0,0 +1,182 @@
+"""
+Re-scores archived sessions from their detection caches (run_tracker --save_detections).
+
+The cached detections are fed through PuttClassifier and TrackerSession exactly as run_tracker
+scores them, but with no video decode and no detector, so re-scoring a session after tuning
+classifier thresholds takes seconds instead of hours of inference. Sessions are processed in
+parallel.
+
+    python rescore_detections.py logs/detections_*.npz --set RAMP_EXIT_TIMEOUT=2.5
+"""
+import os
+import glob
+import logging
+import tempfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from putt_classifier import PuttClassifier
+from tracker_pipeline import FramePacket
+from tracker_session import TrackerSession
+from detection_cache import DetectionCache, PARTIAL_SUFFIX
+from roi_config import load_and_prepare_rois
+from session_reporter import SessionReporter
+from session_event_log import SessionEventLog, EVENT_LOG_EXTENSION
+
+
+# PuttClassifier thresholds that change how putts are classified. Its other upper-case
+# attributes are either never read (SHORT_MAKE_THRESHOLD, MISS_CATCH_THRESHOLD, MAKE_TIME_WINDOW,
+# CATCH_TO_RETURN_THRESHOLD) or only switch implementations (VECTORIZED_MIN_BALLS), so
+# overriding them would re-score every session unchanged.
+TUNABLE_THRESHOLDS = ("RAMP_EXIT_TIMEOUT",)
+
+
+def parse_overrides(assignments):
+    """
+    Parses NAME=VALUE strings into a dict of classifier threshold overrides.
+
+    Raises:
+        ValueError: If an assignment is malformed or NAME is not in TUNABLE_THRESHOLDS.
+    """
+    overrides = {}
+    for assignment in assignments:
+        name, sep, value = assignment.partition("=")
+        name = name.strip()
+        if not sep:
+            raise ValueError(f"'{assignment}' is not NAME=VALUE.")
+        if name not in TUNABLE_THRESHOLDS:
+            raise ValueError(f"'{name}' is not a threshold the classifier uses; overriding it would not change any result. "
+                             f"Tunable thresholds: {', '.join(TUNABLE_THRESHOLDS)}.")
+        try:
+            overrides[name] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value!r}.")
+    return overrides
+
+
+def replay(cache, rois, overrides, logger, event_log):
+    """
+    Runs the cached detections through a fresh PuttClassifier and TrackerSession, exactly as
+    a recorded session is scored, with the cached frame times as the session's video times
+    and without OBS output.
+
+    Every classified putt is appended to event_log, which is closed afterwards.
+
+    Returns:
+        int: Number of classified putts.
+    """
+    classifier = PuttClassifier(None, rois, logger)
+    for name, value in overrides.items():
+        setattr(classifier, name, value)
+
+    session = TrackerSession(classifier, event_log, logger, obs_dir=None,
+                             time_limit_seconds=cache.metadata.get("time_limit_seconds"), offline_mode=True)
+    try:
+        for index, (frame_time, detected_balls) in enumerate(cache.frames()):
+            packet = FramePacket(index, frame_time, frame_time, None)
+            packet.detections = detected_balls
+            session.process(packet)
+            if session.time_limit_reached:
+                break
+    finally:
+        session.close()
+    return event_log.count
+
+
+def rescore_file(cache_path, config_path, overrides, output_dir):
+    """Re-scores one cache and returns a summary dict. Runs in a worker process."""
+    logger = logging.getLogger("rescore_detections")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    cache = DetectionCache.load(cache_path)
+    if config_path:
+        rois = load_and_prepare_rois(config_path, logger)
+    else:
+        rois = {name: np.array(points, dtype=np.int32) if isinstance(points, list) else points
+                for name, points in cache.metadata["rois"].items()}
+    if rois is None:
+        raise ValueError(f"Could not load ROIs from {config_path}")
+    base = os.path.basename(cache_path)
+    if base.endswith(PARTIAL_SUFFIX):
+        base = base[:-len(PARTIAL_SUFFIX)]
+    name = os.path.splitext(base)[0].replace("detections_", "")
+    if output_dir:
+        log_path = os.path.join(output_dir, f"putt_classification_log_rescored_{name}{EVENT_LOG_EXTENSION}")
+        temporary = False
+    else:
+        fd, log_path = tempfile.mkstemp(suffix=EVENT_LOG_EXTENSION)
+        os.close(fd)
+        temporary = True
+    try:
+        with SessionEventLog(log_path, sync="close") as event_log:
+            replay(cache, rois, overrides, logger, event_log)
+        reporter = SessionReporter(log_path)
+        reporter.load_and_process_data()
+    finally:
+        if temporary:
+            os.remove(log_path)
+
+    return {
+        "session": name,
+        "frames": len(cache),
+        "makes": reporter.total_makes,
+        "misses": reporter.total_misses,
+        "max_streak": reporter.max_consecutive_makes,
+        "recorded_makes": cache.metadata.get("total_makes"),
+        "recorded_misses": cache.metadata.get("total_misses"),
+        "putt_log": None if temporary else log_path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score archived sessions from saved detections with adjusted classifier thresholds.")
+    parser.add_argument("caches", nargs="+", help="Detection cache files (globs allowed), e.g. logs/detections_*.npz. The .npz.partial file of a session that did not finish can be given too.")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help=f"Override a PuttClassifier threshold ({', '.join(TUNABLE_THRESHOLDS)}), e.g. RAMP_EXIT_TIMEOUT=2.5. Repeatable.")
+    parser.add_argument("--config", help="Calibration JSON to use instead of the ROIs stored in each cache.")
+    parser.add_argument("--output_dir", help="Write each re-scored putt log here (same event log format as run_tracker's).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of sessions re-scored in parallel.")
+    args = parser.parse_args()
+
+    console = Console()
+    try:
+        overrides = parse_overrides(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    cache_paths = sorted({path for pattern in args.caches for path in (glob.glob(pattern) or [pattern])})
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    table = Table(title="Re-scored sessions" + (f" ({', '.join(f'{k}={v}' for k, v in overrides.items())})" if overrides else ""))
+    for column in ("Session", "Frames", "Makes", "Misses", "Max Streak", "Recorded Makes", "Recorded Misses"):
+        table.add_column(column)
+
+    totals = {"makes": 0, "misses": 0, "changed": 0}
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(rescore_file, path, args.config, overrides, args.output_dir) for path in cache_paths]
+        for path, future in zip(cache_paths, futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                table.add_row(os.path.basename(path), "-", "-", "-", "-", "-", f"[bold red]Error: {e}[/bold red]")
+                continue
+            changed = (summary["makes"], summary["misses"]) != (summary["recorded_makes"], summary["recorded_misses"])
+            style = "[bold yellow]" if changed else ""
+            totals["makes"] += summary["makes"]
+            totals["misses"] += summary["misses"]
+            totals["changed"] += changed
+            table.add_row(summary["session"], str(summary["frames"]), f"{style}{summary['makes']}", f"{style}{summary['misses']}",
+                          str(summary["max_streak"]), str(summary["recorded_makes"]), str(summary["recorded_misses"]))
+
+    console.print(table)
+    console.print(f"[bold]{len(cache_paths)} sessions: {totals['makes']} makes, {totals['misses']} misses; "
+                  f"{totals['changed']} differ from the recorded results.[/bold]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import cv2
+import json
+import math
+import numpy as np
+
+def validate_and_correct_rois(roi_data, debug_logger):
+    """
+    Validates the loaded ROI data, specifically checking for outdated hole quadrant definitions.
+    If old definitions are found, it re-infers them using the modern icosagon method.
+    """
+    # Check if a representative hole quadrant has the old, incorrect 4-point format.
+    # The new format has 7 points (1 center + 6 on the arc).
+    if "HOLE_TOP_ROI" in roi_data and len(roi_data.get("HOLE_TOP_ROI", [])) != 7:
+        debug_logger.warning("Outdated hole quadrant format detected in calibration_output.json.")
+        debug_logger.warning("Attempting to auto-correct by re-inferring hole quadrants.")
+
+        if "HOLE_ROI" not in roi_data or len(roi_data["HOLE_ROI"]) < 3:
+            debug_logger.error("Cannot correct ROIs: HOLE_ROI is missing or invalid.")
+            return roi_data # Return original data
+
+        hole_points = np.array(roi_data["HOLE_ROI"], dtype=np.int32)
+
+        # --- Re-inference logic (copied from calibration script) ---
+        M = cv2.moments(hole_points)
+        if M["m00"] == 0:
+            debug_logger.error("Cannot correct ROIs: Centroid of HOLE_ROI could not be calculated.")
+            return roi_data
+        
+        center_x = int(M["m10"] / M["m00"])
+        center_y = int(M["m01"] / M["m00"])
+        center_point = (center_x, center_y)
+
+        distances = [np.linalg.norm(np.array(center_point) - point) for point in hole_points]
+        average_radius = np.mean(distances)
+
+        num_vertices = 20
+        icosagon_vertices = []
+        start_angle_offset = -9 # degrees, fine-tuned for visual alignment
+        for i in range(num_vertices):
+            angle = math.radians((360 / num_vertices) * i + start_angle_offset)
+            x = center_x + average_radius * math.cos(angle)
+            y = center_y + average_radius * math.sin(angle)
+            icosagon_vertices.append([int(x), int(y)])
+
+        # Define New Quadrant ROIs with Shared Vertices
+        roi_data["HOLE_TOP_ROI"] = [list(center_point)] + [icosagon_vertices[i % 20] for i in range(18, 24)]
+        roi_data["HOLE_RIGHT_ROI"] = [list(center_point)] + [icosagon_vertices[i] for i in range(3, 9)]
+        roi_data["HOLE_LOW_ROI"] = [list(center_point)] + [icosagon_vertices[i] for i in range(8, 14)]
+        roi_data["HOLE_LEFT_ROI"] = [list(center_point)] + [icosagon_vertices[i] for i in range(13, 19)]
+        
+        debug_logger.info("Successfully re-inferred and corrected hole quadrants in memory.")
+    
+    return roi_data
+
+def load_and_prepare_rois(config_path, debug_logger):
+    """Loads, validates, and prepares ROI data from the configuration file."""
+    try:
+        with open(config_path, 'r') as f:
+            calibrated_rois = json.load(f)
+        debug_logger.info(f"Loaded ROI configuration from {config_path}")
+    except FileNotFoundError:
+        debug_logger.error(f"Error: Calibration file not found at {config_path}. Please run calibration first.")
+        return None
+    except json.JSONDecodeError as e:
+        debug_logger.error(f"Error decoding JSON from {config_path}: {e}")
+        return None
+
+    # --- Auto-Correction for Outdated Calibration ---
+    # This step checks if the loaded ROI file uses an old format for hole quadrants
+    # and automatically updates it in memory to the modern, more accurate format.
+    calibrated_rois = validate_and_correct_rois(calibrated_rois, debug_logger)
+
+    # Ensure all expected ROIs are present in calibrated_rois
+    expected_rois = [
+        "PUTTING_MAT_ROI", "RAMP_ROI", "HOLE_ROI",
+        "LEFT_OF_MAT_ROI", "CATCH_ROI", "RETURN_TRACK_ROI",
+        "RAMP_LEFT_ROI", "RAMP_CENTER_ROI", "RAMP_RIGHT_ROI",
+        "HOLE_TOP_ROI", "HOLE_RIGHT_ROI", "HOLE_LOW_ROI", "HOLE_LEFT_ROI",
+        "IGNORE_AREA_ROI"
+    ]
+
+    for roi_name in expected_rois:
+        if roi_name not in calibrated_rois:
+            calibrated_rois[roi_name] = []
+            debug_logger.warning(f"{roi_name} not found in calibration_output.json. Added as an empty ROI.")
+        # Ensure all ROI lists are converted to NumPy arrays
+        if isinstance(calibrated_rois[roi_name], list):
+            calibrated_rois[roi_name] = np.array(calibrated_rois[roi_name], dtype=np.int32)
+            
+    return calibrated_rois
@@ -1,24 +1,32 @@
 # Main application entry point.
+import time
+_STARTUP_T0 = time.perf_counter() # Start of the startup-time report, so module imports count too
 import cv2
 import logging
 import numpy as np
 from datetime import datetime
-import json
-import time
 import os
 import glob
 import argparse
 import sys # Added
 import subprocess # Added
+import signal
+import threading
+from tracker_logging import (CompressingRotatingFileHandler, LevelSampler, start_queued_logging,
+                             dropped_records, prune_logs_in_background, LOG_DIR_BUDGET_BYTES)
 
-# Configure logging for the tracker script
+# Configure logging for the tracker script. Records are written by a listener thread, never by
+# the thread that logs them (see tracker_logging.py).
 debug_logger = logging.getLogger("tracker_debug")
 debug_logger.setLevel(logging.DEBUG)
 
 # Create handlers
 log_dir = os.path.join(os.path.dirname(__file__), "logs")
 os.makedirs(log_dir, exist_ok=True)
-file_handler = logging.FileHandler(os.path.join(log_dir, "tracker_debug.log"))
+tracker_debug_filename = os.path.join(log_dir, "tracker_debug.log")
+# Every run_tracker process (one per bay) appends to this file, so it is never rotated:
+# a rotation by one process would rename it out from under the others.
+file_handler = logging.FileHandler(tracker_debug_filename)
 console_handler = logging.StreamHandler()
 
 # Create formatters and add it to handlers
@@ -27,244 +35,85 @@ file_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
 
 # Add handlers to the logger
-debug_logger.addHandler(file_handler)
-debug_logger.addHandler(console_handler)
+start_queued_logging(debug_logger, [file_handler, console_handler])
 
 # Suppress matplotlib font manager debug messages
 logging.getLogger('matplotlib.font_manager').setLevel(logging.WARNING)
 
-import math
-from video_processor import VideoProcessor
-from putt_classifier import PuttClassifier
-from session_reporter import SessionReporter
-import data_manager
+from concurrent.futures import ThreadPoolExecutor
+from roi_config import load_and_prepare_rois
+from putt_classifier import PuttClassifier, PuttStatus, ROI_BITS
+from tracker_pipeline import TrackerPipeline, DROP_POLICIES, BLOCK
+from overlay_renderer import OverlayRenderer, ROI_COLORS
+from inference_engines import ENGINES
+from trace_recorder import TraceRecorder
+from tracker_session import TrackerSession, report_session
+from session_event_log import SessionEventLog, SYNC_POLICIES, EVENT_LOG_EXTENSION
+from startup import open_camera, StartupTimer
+from overlay_push import StatsPushServer, DEFAULT_PUSH_PORT
+# The detectors, the optional pipeline features and the frame bus are imported where they are
+# first needed, so a session only pays for what it uses.
 
 # --- Configuration Flags ---
-DISPLAY_VIDEO = True  # Set to True to display video output, False to run headless
-
-# --- OBS Text File Functions ---
-def reset_obs_files(debug_logger):
-    """Resets all OBS text files to their initial states at the start of a session."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    obs_dir = os.path.join(script_dir, "obs_text_files")
-    os.makedirs(obs_dir, exist_ok=True)
-    files_to_reset = {
-        "TotalPutts.txt": "0", "MadePutts.txt": "0", "MissedPutts.txt": "0",
-        "CurrentStreak.txt": "0", "Consecutive.txt": "0", "MaxStreak.txt": "0",
-        "DetailedClassification.txt": ""  # Add the new file with an empty default
-    }
-    for filename, value in files_to_reset.items():
-        try:
-            with open(os.path.join(obs_dir, filename), "w") as f:
-                f.write(value)
-        except IOError as e:
-            debug_logger.error(f"Error resetting OBS file {filename}: {e}")
-    debug_logger.info("OBS text files have been reset.")
-
+DISPLAY_VIDEO = True  # Set to True to display video output, False to run headless (same as --headless)
 
 # Get the absolute path of the directory where the script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Set up logging for putt classification results (CSV format)
+# Putt classification results go to a session event log (see session_event_log.py)
 log_dir = os.path.join(script_dir, "logs")
 os.makedirs(log_dir, exist_ok=True) # Ensure the directory exists
-putt_log_filename = os.path.join(log_dir, f"putt_classification_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-putt_logger = logging.getLogger('putt_logger')
-putt_logger.setLevel(logging.INFO)
-putt_handler = logging.FileHandler(putt_log_filename)
-putt_handler.setFormatter(logging.Formatter('%(message)s')) # Only message, no timestamp or level
-putt_logger.addHandler(putt_handler)
-putt_logger.info("current_frame_time,classification,detailed_classification,ball_x,ball_y,transition_history") # CSV header
+log_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S') # Shared by all of this session's log files
+putt_log_filename = os.path.join(log_dir, f"putt_classification_log_{log_timestamp}{EVENT_LOG_EXTENSION}")
+obs_dir = os.path.join(script_dir, "obs_text_files")
 
 # Set up a separate debug logger
-debug_log_filename = os.path.join(log_dir, f"debug_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+debug_log_filename = os.path.join(log_dir, f"debug_log_{log_timestamp}.txt")
+trace_filename = os.path.join(log_dir, f"trace_{log_timestamp}.npz")
 debug_logger = logging.getLogger('debug_logger')
 debug_logger.setLevel(logging.DEBUG)
-debug_handler = logging.FileHandler(debug_log_filename)
+debug_handler = CompressingRotatingFileHandler(debug_log_filename)
 debug_handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
-debug_logger.addHandler(debug_handler)
-
-def update_obs_files(total_makes, total_misses, consecutive_makes, max_consecutive_makes, debug_logger):
-    """Updates the text files used by OBS."""
-    obs_dir = os.path.join(script_dir, "obs_text_files")
-    total_putts = total_makes + total_misses
-    
-    files_to_update = {
-        "TotalPutts.txt": total_putts,
-        "MadePutts.txt": total_makes,
-        "MissedPutts.txt": total_misses,
-        "CurrentStreak.txt": consecutive_makes,
-        "Consecutive.txt": consecutive_makes,
-        "MaxStreak.txt": max_consecutive_makes
-    }
-    
-    for filename, value in files_to_update.items():
-        try:
-            with open(os.path.join(obs_dir, filename), "w") as f:
-                f.write(str(value))
-        except IOError as e:
-            debug_logger.error(f"Error updating OBS file {filename}: {e}")
+debug_sampler = LevelSampler() # Rates are set from --debug_log_sample in main()
+start_queued_logging(debug_logger, [debug_handler], sampler=debug_sampler)
 
-def validate_and_correct_rois(roi_data, debug_logger):
-    """
-    Validates the loaded ROI data, specifically checking for outdated hole quadrant definitions.
-    If old definitions are found, it re-infers them using the modern icosagon method.
-    """
-    # Check if a representative hole quadrant has the old, incorrect 4-point format.
-    # The new format has 7 points (1 center + 6 on the arc).
-    if "HOLE_TOP_ROI" in roi_data and len(roi_data.get("HOLE_TOP_ROI", [])) != 7:
-        debug_logger.warning("Outdated hole quadrant format detected in calibration_output.json.")
-        debug_logger.warning("Attempting to auto-correct by re-inferring hole quadrants.")
-
-        if "HOLE_ROI" not in roi_data or len(roi_data["HOLE_ROI"]) < 3:
-            debug_logger.error("Cannot correct ROIs: HOLE_ROI is missing or invalid.")
-            return roi_data # Return original data
-
-        hole_points = np.array(roi_data["HOLE_ROI"], dtype=np.int32)
-
-        # --- Re-inference logic (copied from calibration script) ---
-        M = cv2.moments(hole_points)
-        if M["m00"] == 0:
-            debug_logger.error("Cannot correct ROIs: Centroid of HOLE_ROI could not be calculated.")
-            return roi_data
-        
-        center_x = int(M["m10"] / M["m00"])
-        center_y = int(M["m01"] / M["m00"])
-        center_point = (center_x, center_y)
-
-        distances = [np.linalg.norm(np.array(center_point) - point) for point in hole_points]
-        average_radius = np.mean(distances)
-
-        num_vertices = 20
-        icosagon_vertices = []
-        start_angle_offset = -9 # degrees, fine-tuned for visual alignment
-        for i in range(num_vertices):
-            angle = math.radians((360 / num_vertices) * i + start_angle_offset)
-            x = center_x + average_radius * math.cos(angle)
-            y = center_y + average_radius * math.sin(angle)
-            icosagon_vertices.append([int(x), int(y)])
-
-        # Define New Quadrant ROIs with Shared Vertices
-        roi_data["HOLE_TOP_ROI"] = [list(center_point)] + [icosagon_vertices[i % 20] for i in range(18, 24)]
-        roi_data["HOLE_RIGHT_ROI"] = [list(center_point)] + [icosagon_vertices[i] for i in range(3, 9)]
-        roi_data["HOLE_LOW_ROI"] = [list(center_point)] + [icosagon_vertices[i] for i in range(8, 14)]
-        roi_data["HOLE_LEFT_ROI"] = [list(center_point)] + [icosagon_vertices[i] for i in range(13, 19)]
-        
-        debug_logger.info("Successfully re-inferred and corrected hole quadrants in memory.")
-    
-    return roi_data
-
-def load_and_prepare_rois(config_path, debug_logger):
-    """Loads, validates, and prepares ROI data from the configuration file."""
+def dump_trace(tracer, debug_logger):
+    """Writes the classifier's trace ring buffer to this session's trace file."""
     try:
-        with open(config_path, 'r') as f:
-            calibrated_rois = json.load(f)
-        debug_logger.info(f"Loaded ROI configuration from {config_path}")
-    except FileNotFoundError:
-        debug_logger.error(f"Error: Calibration file not found at {config_path}. Please run calibration first.")
-        return None
-    except json.JSONDecodeError as e:
-        debug_logger.error(f"Error decoding JSON from {config_path}: {e}")
-        return None
-
-    # --- Auto-Correction for Outdated Calibration ---
-    # This step checks if the loaded ROI file uses an old format for hole quadrants
-    # and automatically updates it in memory to the modern, more accurate format.
-    calibrated_rois = validate_and_correct_rois(calibrated_rois, debug_logger)
-
-    # Ensure all expected ROIs are present in calibrated_rois
-    expected_rois = [
-        "PUTTING_MAT_ROI", "RAMP_ROI", "HOLE_ROI",
-        "LEFT_OF_MAT_ROI", "CATCH_ROI", "RETURN_TRACK_ROI",
-        "RAMP_LEFT_ROI", "RAMP_CENTER_ROI", "RAMP_RIGHT_ROI",
-        "HOLE_TOP_ROI", "HOLE_RIGHT_ROI", "HOLE_LOW_ROI", "HOLE_LEFT_ROI",
-        "IGNORE_AREA_ROI"
-    ]
-
-    for roi_name in expected_rois:
-        if roi_name not in calibrated_rois:
-            calibrated_rois[roi_name] = []
-            debug_logger.warning(f"{roi_name} not found in calibration_output.json. Added as an empty ROI.")
-        # Ensure all ROI lists are converted to NumPy arrays
-        if isinstance(calibrated_rois[roi_name], list):
-            calibrated_rois[roi_name] = np.array(calibrated_rois[roi_name], dtype=np.int32)
-            
-    return calibrated_rois
-
-def update_display_window(display_frame, calibrated_rois, roi_colors, scale_factors, stats, ball_data, current_video_time):
-    """Draws all visual elements onto the display frame."""
-    scale_x_display, scale_y_display = scale_factors
-    total_makes, total_misses, consecutive_makes, max_consecutive_makes = stats
-    (overall_detected_ball_center, detailed_classification_results_display, 
-     ball_in_hole, classification) = ball_data
-
-    # Draw polygon ROIs on the display frame (scaled)
-    for name, roi_points_data in calibrated_rois.items():
-        if name == "camera_index": # Skip camera_index
-            continue
-        
-        # Handle HOLE_ROI which might be a dict with 'points'
-        if isinstance(roi_points_data, dict) and 'points' in roi_points_data:
-            roi_points = np.array(roi_points_data['points'], dtype=np.int32)
-        else:
-            roi_points = np.array(roi_points_data, dtype=np.int32)
-
-        if len(roi_points) > 0:
-            scaled_roi = (roi_points * np.array([scale_x_display, scale_y_display])).astype(np.int32)
-            cv2.polylines(display_frame, [scaled_roi], isClosed=True, color=roi_colors.get(name, (255, 255, 255)), thickness=2)
-
-    # Draw a circle at the ball's position on the display frame (scaled)
-    if overall_detected_ball_center:
-        cv2.circle(display_frame, (int(overall_detected_ball_center[0] * scale_x_display), int(overall_detected_ball_center[1] * scale_y_display)), 10, (0, 255, 255), -1)
-    
-    # Highlight HOLE_ROI if ball is detected within it
-    if ball_in_hole:
-        # Use the loaded HOLE_ROI points
-        hole_roi_points = calibrated_rois["HOLE_ROI"]
-        if isinstance(hole_roi_points, dict) and 'points' in hole_roi_points:
-            hole_roi_points = hole_roi_points['points']
-        
-        scaled_hole_roi = (np.array(hole_roi_points, dtype=np.int32) * np.array([scale_x_display, scale_y_display])).astype(np.int32)
-        cv2.polylines(display_frame, [scaled_hole_roi], isClosed=True, color=(0, 255, 255), thickness=3) # Yellow highlight
-
-    # Display overall statistics (persistent)
-    cv2.putText(display_frame, f"Makes: {total_makes}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-    cv2.putText(display_frame, f"Misses: {total_misses}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-    cv2.putText(display_frame, f"Consecutive Makes: {consecutive_makes}", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-    cv2.putText(display_frame, f"Max Consecutive Makes: {max_consecutive_makes}", (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-
-    # Display session timer (minutes:seconds)
-    if current_video_time > 0: # Only display if timer has started
-        minutes = int(current_video_time // 60)
-        seconds = int(current_video_time % 60)
-        cv2.putText(display_frame, f"Time: {minutes:02d}:{seconds:02d}", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-    if classification:
-        cv2.putText(display_frame, f"Putt: {classification}", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-    # Display ball coordinates and ROI status on screen (persistent)
-    y_offset_roi = 180 # Adjusted starting y-offset to avoid overlap with putt result
-    if overall_detected_ball_center:
-        cv2.putText(display_frame, f"Ball: ({overall_detected_ball_center[0] * scale_x_display:.0f}, {overall_detected_ball_center[1] * scale_y_display:.0f})", (10, y_offset_roi), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        y_offset_roi += 30
-    
-    for k, v in detailed_classification_results_display.items():
-        cv2.putText(display_frame, f"{k}: {v}", (10, y_offset_roi), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        y_offset_roi += 20
-
-    cv2.imshow("Putt Tracker", display_frame)
-
-def get_available_cameras():
+        tracer.dump(trace_filename)
+        debug_logger.info(f"Classifier trace ({min(tracer.count, tracer.capacity)} events) written to {trace_filename}. Decode with: python trace_recorder.py {trace_filename}")
+    except (IOError, OSError) as e:
+        debug_logger.error(f"Error writing classifier trace: {e}")
+
+def open_capture(video_source, from_frame_bus=False):
+    """Opens a video file, or attaches to the frame bus named video_source."""
+    if from_frame_bus:
+        from frame_bus import FrameBusCapture
+        return FrameBusCapture(video_source)
+    return cv2.VideoCapture(video_source)
+
+def load_detector(args, calibrated_rois):
     """
-    Detects and returns a list of available camera indices.
+    Builds the ball detector chosen by args. Runs on a background thread during startup.
+
+    Returns:
+        tuple: (detector, seconds it took to build).
     """
-    available_cameras = []
-    for i in range(10): # Check indices from 0 to 9
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            available_cameras.append(i)
-            cap.release()
-    return available_cameras
+    t0 = time.perf_counter()
+    if args.detector == "classical":
+        from classical_detector import ClassicalBallDetector
+        # Always limited to the calibrated ROIs; needs no model file.
+        video_processor = ClassicalBallDetector(calibrated_rois, min_bbox_area=50, padding=args.roi_crop_padding)
+        debug_logger.info("Using the classical background-subtraction ball detector.")
+    else:
+        from video_processor import VideoProcessor
+        video_processor = VideoProcessor(model_path=args.model, min_bbox_area=50, engine=args.engine,
+                                         threads=args.threads, logger=debug_logger)
+        # Only the calibrated ROIs matter to the classifier, so skip inference on the floor and wall around them.
+        if not args.no_roi_crop:
+            crop_rect = video_processor.set_roi_crop(calibrated_rois, padding=args.roi_crop_padding)
+            debug_logger.info(f"Detector restricted to ROI crop {crop_rect}.")
+    return video_processor, time.perf_counter() - t0
 
 def confirm_calibration_interactively(cap, calibrated_rois, roi_colors, scale_x_display, scale_y_display, debug_logger, player_id):
     """
@@ -331,227 +180,261 @@ def main():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("--video_path", help="Path to the input video file.")
     group.add_argument("--camera_index", type=int, help="Index of the camera for live feed.")
-    parser.add_argument("--model", default=os.path.join(script_dir, "models", "best.pt"), help="Path to the YOLOv8 model file.")
+    group.add_argument("--frame_bus", metavar="NAME", help="Live feed from a shared-memory frame bus (frame_bus.py, or another tracker's --publish_frame_bus) instead of opening a camera.")
+    parser.add_argument("--model", default=os.path.join(script_dir, "models", "best.pt"), help="Path to the YOLOv8 model file, or an exported/INT8 model for --engine (see quantize_detector.py).")
     parser.add_argument("--config", default=os.path.join(script_dir, "calibration_output.json"), help="Path to the ROI configuration JSON file.")
     parser.add_argument("--player_id", type=int, help="The ID of the player for this session (used with --camera_index).")
     parser.add_argument("--session_id", type=int, help="The ID of the session to update (used with --camera_index).")
     parser.add_argument("--duel_id", type=int, help="The ID of the duel this session is part of.")
     parser.add_argument("--league_round_id", type=int, help="The ID of the league round this session is part of.")
     parser.add_argument("--time_limit_seconds", type=int, help="Optional session duration limit in seconds.")
+    parser.add_argument("--queue_size", type=int, default=2, help="Capacity of the queues between the capture, inference and classification stages.")
+    parser.add_argument("--drop_policy", choices=DROP_POLICIES, help="What to do when a stage queue is full. Defaults to 'drop_oldest' for cameras and 'block' for video files.")
+    parser.add_argument("--detector", choices=("yolo", "classical"), default="yolo", help="Ball detector: the YOLO model, or background subtraction and blob filtering for low-end hardware.")
+    parser.add_argument("--engine", choices=ENGINES, default="ultralytics", help="Inference backend for the detector. ONNX Runtime and OpenVINO exports are created from --model on first use.")
+    parser.add_argument("--threads", type=int, help="Number of intra-op CPU threads for the inference engine.")
+    parser.add_argument("--batch_size", type=int, default=1, help="Offline mode for --video_path: decode ahead and run the detector on batches of this many frames.")
+    parser.add_argument("--headless", action="store_true", help="Run without a window: no calibration confirmation, no overlay drawing and no key handling. Use SIGUSR1 for trace dumps.")
+    parser.add_argument("--workers", type=int, default=1, help="Offline mode for --video_path: split the video into time chunks and run the YOLO detector on this many processes.")
+    parser.add_argument("--chunk_seconds", type=float, default=60.0, help="With --workers, length of each video chunk in seconds.")
+    parser.add_argument("--no_roi_crop", action="store_true", help="Run the detector on the full frame instead of the union rectangle of the calibrated ROIs.")
+    parser.add_argument("--roi_crop_padding", type=int, default=32, help="Pixels of margin added around the ROI crop.")
+    parser.add_argument("--motion_gate", action="store_true", help="Skip the detector on frames with no motion inside the calibrated ROIs.")
+    parser.add_argument("--idle_after_seconds", type=float, default=60.0, help="With --motion_gate, seconds without motion before capture drops to the idle frame rate.")
+    parser.add_argument("--idle_fps", type=float, default=2.0, help="With --motion_gate, camera frame rate while idle.")
+    parser.add_argument("--adaptive_rate", action="store_true", help="Run the detector at a reduced rate while no putt is in progress.")
+    parser.add_argument("--waiting_detect_fps", type=float, default=10.0, help="With --adaptive_rate, detector fps while waiting for a putt.")
+    parser.add_argument("--awaiting_return_detect_fps", type=float, default=10.0, help="With --adaptive_rate, detector fps while awaiting the ball's return.")
+    parser.add_argument("--putt_detect_fps", type=float, help="With --adaptive_rate, detector fps during a putt. Defaults to every frame; lower it only with the ball tracker enabled.")
+    parser.add_argument("--no_ball_tracker", action="store_true", help="With --adaptive_rate, repeat the last detections on skipped frames instead of predicting the ball's position.")
+    parser.add_argument("--trace_capacity", type=int, default=65536, help="Number of classifier events kept in the trace ring buffer, dumped at session end, on 't' or on SIGUSR1. 0 disables tracing.")
+    parser.add_argument("--publish_frame_bus", nargs="?", const="", metavar="NAME", help="Share the camera's frames with other local consumers on a shared-memory frame bus. Defaults to proofofputt_camera_<index>.")
+    parser.add_argument("--save_detections", nargs="?", const="", metavar="PATH", help="Save every frame's detections for re-scoring with rescore_detections.py. Defaults to logs/detections_<timestamp>.npz.")
+    parser.add_argument("--event_log_sync", choices=SYNC_POLICIES, default="record", help="When putts in the session event log reach the disk: at session end, after every putt (survives a tracker crash) or fsynced after every putt (survives a power loss).")
+    parser.add_argument("--debug_log_sample", type=int, default=1, metavar="N", help="Keep 1 in N DEBUG records in the session debug log. INFO and above are always kept.")
+    parser.add_argument("--log_budget_mb", type=int, default=LOG_DIR_BUDGET_BYTES // (1024 * 1024), help="Delete the oldest finished debug logs and traces once together they take more than this many MB. Putt logs and detection caches are never deleted and do not count.")
+    parser.add_argument("--push_port", type=int, nargs="?", const=DEFAULT_PUSH_PORT, metavar="PORT", help=f"Push live stats over Server-Sent Events and serve a HUD browser source on localhost:PORT (default {DEFAULT_PUSH_PORT}), alongside the OBS text files.")
     args = parser.parse_args()
 
-    is_live_feed = args.camera_index is not None
+    is_live_feed = args.camera_index is not None or args.frame_bus is not None
     if is_live_feed and (args.player_id is None or args.session_id is None):
-        parser.error("--player_id and --session_id are required when using --camera_index.")
+        parser.error("--player_id and --session_id are required when using --camera_index or --frame_bus.")
+    if args.publish_frame_bus is not None and (args.video_path or args.frame_bus):
+        parser.error("--publish_frame_bus is only supported for a camera.")
+    if args.batch_size < 1:
+        parser.error("--batch_size must be at least 1.")
+    if args.batch_size > 1 and is_live_feed:
+        parser.error("--batch_size is only supported with --video_path.")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    if args.workers > 1 and (is_live_feed or not args.video_path):
+        parser.error("--workers is only supported with --video_path.")
+    if args.workers > 1 and args.detector != "yolo":
+        parser.error("--workers requires the YOLO detector; the classical detector's background model depends on every earlier frame.")
+
+    # Offline mode replays a recording as fast as the detector allows, so every frame must be
+    # processed and the classifier is driven by the video's own clock instead of wall-clock time.
+    offline_mode = args.batch_size > 1 or args.workers > 1
+    # With several workers, frames are decoded and detected in the worker processes only.
+    chunked_detection = args.workers > 1
+    show_video = DISPLAY_VIDEO and not args.headless and not chunked_detection
+    if offline_mode and args.drop_policy not in (None, BLOCK):
+        parser.error("Offline batch mode processes every frame; --drop_policy must be 'block'.")
+    if offline_mode and (args.motion_gate or args.adaptive_rate):
+        parser.error("--motion_gate and --adaptive_rate cannot be combined with offline batch mode.")
+
+    debug_sampler.rates[logging.DEBUG] = args.debug_log_sample
+    prune_logs_in_background(log_dir, keep=(debug_log_filename, tracker_debug_filename),
+                             budget_bytes=args.log_budget_mb * 1024 * 1024, logger=debug_logger)
+
+    timer = StartupTimer(_STARTUP_T0)
+    timer.lap("imports and arguments")
 
-    video_source = None # Initialize video_source
-
-    available_cameras = get_available_cameras()
-    if not available_cameras:
-        debug_logger.error("No cameras found. Please ensure a camera is connected and not in use.")
+    calibrated_rois = load_and_prepare_rois(args.config, debug_logger)
+    if calibrated_rois is None:
         return
 
-    current_camera_list_index = 0 # Index into available_cameras list
-
-    # Determine initial camera index
-    if args.camera_index is not None:
-        if args.camera_index in available_cameras:
-            selected_camera_index = args.camera_index
-            current_camera_list_index = available_cameras.index(selected_camera_index)
-        else:
-            debug_logger.warning(f"Provided camera index {args.camera_index} not found. Using first available camera.")
-            selected_camera_index = available_cameras[0]
+    # The model loads on a background thread while the camera opens and the calibration is confirmed.
+    detector_loader = None
+    if not chunked_detection: # Each worker process builds its own detector
+        detector_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detector-load")
+        detector_future = detector_loader.submit(load_detector, args, calibrated_rois)
+    timer.lap("calibration file")
+
+    if args.frame_bus:
+        # The camera belongs to the publishing process, so there is nothing to probe here.
+        video_source = args.frame_bus
+        cap = open_capture(video_source, from_frame_bus=True)
     elif args.video_path:
-        # Static image mode, no live camera needed
         video_source = args.video_path
-        is_live_feed = False
+        cap = open_capture(video_source)
     else:
-        # No camera index or video path provided, use first available camera
-        selected_camera_index = available_cameras[0]
-
-    # --- Live Camera Mode ---
-    if video_source is None: # Only proceed if a camera index is valid
-        video_source = selected_camera_index
-        is_live_feed = True
-        cap = cv2.VideoCapture(video_source)
-        if not cap.isOpened():
-            debug_logger.error(f"Error: Could not open camera with index {video_source}. Exiting.")
-            return
-    else: # Video path was provided
-        cap = cv2.VideoCapture(video_source)
-        if not cap.isOpened():
-            debug_logger.error(f"Error: Could not open video source: {video_source}. Exiting.")
+        # --- Live Camera Mode ---
+        # Opens the requested camera, else the one cached for this calibration, else probes for one.
+        cap, video_source = open_camera(args.camera_index, args.config, debug_logger)
+        if cap is None:
+            debug_logger.error("No cameras found. Please ensure a camera is connected and not in use.")
             return
+    if not cap.isOpened():
+        debug_logger.error(f"Error: Could not open video source: {video_source}. Exiting.")
+        return
+    if args.publish_frame_bus is not None:
+        from frame_bus import PublishingCapture, default_bus_name
+        cap = PublishingCapture(cap, args.publish_frame_bus or default_bus_name(video_source))
+        debug_logger.info(f"Publishing camera frames on frame bus '{cap.name}'.")
+    debug_logger.info(f"Video source opened successfully: {video_source}")
+    timer.lap("video source")
 
-    video_processor = VideoProcessor(model_path=args.model, min_bbox_area=50)
     scale_x_display = 1.0 # No scaling for display
     scale_y_display = 1.0 # No scaling for display
 
-    roi_colors = {
-        "PUTTING_MAT_ROI": (0, 0, 255), "RAMP_ROI": (0, 255, 255), "HOLE_ROI": (255, 0, 0),
-        "LEFT_OF_MAT_ROI": (255, 255, 0), "CATCH_ROI": (0, 165, 255), "RETURN_TRACK_ROI": (255, 0, 255),
-        "RAMP_LEFT_ROI": (128, 0, 128), "RAMP_CENTER_ROI": (0, 128, 128), "RAMP_RIGHT_ROI": (128, 128, 0),
-        "HOLE_TOP_ROI": (0, 128, 0), "HOLE_RIGHT_ROI": (128, 0, 0), "HOLE_LOW_ROI": (0, 0, 128),
-        "HOLE_LEFT_ROI": (128, 128, 128), "IGNORE_AREA_ROI": (50, 50, 50)
-    }
-
-    calibrated_rois = load_and_prepare_rois(args.config, debug_logger)
-    if calibrated_rois is None:
-        return
-
-    putt_classifier = PuttClassifier(yolo_model=video_processor.model, rois=calibrated_rois, logger=debug_logger)
-    cap = cv2.VideoCapture(video_source)
-    reset_obs_files(debug_logger)
+    roi_colors = ROI_COLORS
 
-    if not cap.isOpened():
-        debug_logger.error(f"Error: Could not open video source: {video_source}")
-        return
-    debug_logger.info(f"Video source opened successfully: {video_source}")
-
-    if DISPLAY_VIDEO:
-        cv2.namedWindow("Putt Tracker", cv2.WINDOW_NORMAL)
-    
     # --- Calibration Confirmation Stage ---
+    # Offline re-scoring and headless bays run unattended, so the interactive confirmation is skipped.
     # Pass player_id to the confirmation function
-    if not confirm_calibration_interactively(cap, calibrated_rois, roi_colors, scale_x_display, scale_y_display, debug_logger, args.player_id):
+    if not offline_mode and not args.headless and not confirm_calibration_interactively(cap, calibrated_rois, roi_colors, scale_x_display, scale_y_display, debug_logger, args.player_id):
         debug_logger.info("Calibration not confirmed or recalibration requested. Exiting session.")
         cap.release()
         cv2.destroyAllWindows()
+        if detector_loader is not None:
+            detector_loader.shutdown(wait=False)
         return # Exit if calibration is not confirmed or recalibration is launched
-
-    frame_count = 0
-    start_time = time.time() # This will be the video start time
-    session_start_time = None # This will be the time of the first putt in ramp
-    total_makes = 0
-    total_misses = 0
-    consecutive_makes = 0
-    max_consecutive_makes = 0
-    scoring_active = False
-    classification = None
-    overall_detected_ball_center = None
-    ball_in_hole = False
-    ball_in_ramp = False # Initialize ball_in_ramp here
-    
-    session_duration_limit = args.time_limit_seconds
-    if session_duration_limit:
-        debug_logger.info(f"Session time limit is active: {session_duration_limit} seconds ({session_duration_limit / 60:.2f} minutes).")
+    if not offline_mode and not args.headless:
+        timer.lap("calibration confirmation")
+        if not is_live_feed:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0) # The confirmation read frames; score the video from its start
+
+    video_processor = None
+    if detector_loader is not None:
+        video_processor, load_seconds = detector_future.result()
+        detector_loader.shutdown()
+        timer.add("detector load (background)", load_seconds)
+        timer.lap("waiting for detector")
+
+    # Warm the detector up at the real frame size so the first live frames are not slow.
+    if video_processor is not None:
+        frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 1080, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1920, 3)
+        video_processor.warmup(frame_shape)
+        debug_logger.info(f"Detector '{args.detector}' warmed up for {frame_shape[1]}x{frame_shape[0]} frames.")
+        timer.lap("detector warmup")
+
+    motion_gate = None
+    if args.motion_gate:
+        from motion_gate import MotionGate
+        motion_gate = MotionGate(calibrated_rois, idle_after_seconds=args.idle_after_seconds)
+        debug_logger.info(f"Motion gating enabled (idle after {args.idle_after_seconds}s at {args.idle_fps} fps).")
+
+    detection_scheduler = None
+    if args.adaptive_rate:
+        from detection_scheduler import DetectionScheduler
+        # Full rate during a putt by default, where the frames decide MAKE vs MISS.
+        detection_scheduler = DetectionScheduler({
+            PuttStatus.WAITING: args.waiting_detect_fps,
+            PuttStatus.PUTT_IN_PROGRESS: args.putt_detect_fps,
+            PuttStatus.AWAITING_RETURN: args.awaiting_return_detect_fps,
+        })
+        debug_logger.info(f"Adaptive detection rate enabled: {detection_scheduler.state_fps}")
+
+    # Fills the frames between detector runs with predicted ball positions.
+    ball_tracker = None
+    if detection_scheduler is not None and not args.no_ball_tracker:
+        from ball_tracker import BallTracker
+        ball_tracker = BallTracker()
+
+    tracer = TraceRecorder(args.trace_capacity, bit_names=ROI_BITS) if args.trace_capacity > 0 else None
+    putt_classifier = PuttClassifier(yolo_model=video_processor.model if video_processor is not None else None, rois=calibrated_rois, logger=debug_logger, tracer=tracer)
+    trace_dump_requested = threading.Event()
+    if tracer is not None and hasattr(signal, "SIGUSR1"): # Not available on Windows
+        signal.signal(signal.SIGUSR1, lambda signum, stack: trace_dump_requested.set())
+    detection_writer = None
+    if args.save_detections is not None:
+        from detection_cache import DetectionCacheWriter
+        detection_writer = DetectionCacheWriter(args.save_detections or os.path.join(log_dir, f"detections_{log_timestamp}.npz"), {
+            "source": str(video_source), "player_id": args.player_id, "session_id": args.session_id,
+            "is_live_feed": is_live_feed, "offline_mode": offline_mode, "detector": args.detector,
+            "model": args.model if args.detector == "yolo" else None,
+            "time_limit_seconds": args.time_limit_seconds, "rois": calibrated_rois,
+        })
+
+    overlay = None
+    if show_video:
+        overlay = OverlayRenderer(calibrated_rois, roi_colors, (scale_x_display, scale_y_display))
+        overlay.open()
+
+    push_server = None
+    if args.push_port is not None:
+        try:
+            push_server = StatsPushServer(debug_logger, port=args.push_port).start()
+        except OSError as e:
+            debug_logger.error(f"Could not start the overlay push server on port {args.push_port}: {e}")
+
+    event_log = SessionEventLog(putt_log_filename, sync=args.event_log_sync)
+    session = TrackerSession(putt_classifier, event_log, debug_logger, obs_dir,
+                             time_limit_seconds=args.time_limit_seconds, offline_mode=offline_mode,
+                             detection_writer=detection_writer, stats_publisher=push_server)
+
+    # Capture and inference run on their own threads; this thread is the classifier/output stage.
+    if chunked_detection:
+        from chunked_detection import ChunkedDetectionPipeline
+        pipeline = ChunkedDetectionPipeline(video_source, calibrated_rois, debug_logger, args.model, engine=args.engine,
+                                            threads=args.threads, workers=args.workers, chunk_seconds=args.chunk_seconds,
+                                            batch_size=args.batch_size, roi_crop=not args.no_roi_crop,
+                                            roi_crop_padding=args.roi_crop_padding)
+    else:
+        pipeline = TrackerPipeline(cap, video_processor.process_frame, debug_logger, is_live_feed,
+                                   queue_size=args.queue_size, drop_policy=args.drop_policy,
+                                   detect_batch=video_processor.process_batch, batch_size=args.batch_size,
+                                   motion_gate=motion_gate, idle_fps=args.idle_fps, scheduler=detection_scheduler,
+                                   tracker=ball_tracker)
+    pipeline.start()
 
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                debug_logger.info("End of video or cannot read frame.")
-                break
-
-            frame_count += 1
-            video_current_time_raw = (time.time() - start_time) if is_live_feed else (cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
-            
-            # Detect first putt in ramp to start session timer
-            if session_start_time is None and ball_in_ramp:
-                session_start_time = time.time()
-                debug_logger.info(f"First putt detected in ramp. Session timer started at {session_start_time}.")
-
-            current_video_time = (time.time() - session_start_time) if session_start_time is not None else 0.0 # Calculate session-relative time
-
-            display_frame = frame.copy() # Use original frame for display
-            detected_balls_original_scale = video_processor.process_frame(frame)
-
-            # Update and classify first, to get ball_in_ramp
-            (current_state, classification, detailed_classification_str, overall_detected_ball_center, 
-             ball_in_putting_mat, ball_in_ramp, ball_in_return_track, ball_in_left_of_mat, 
-             ball_in_catch, ball_in_hole, ball_in_hole_top, ball_in_hole_right, 
-             ball_in_hole_low, ball_in_hole_left, ball_in_ramp_left, ball_in_ramp_center, 
-             ball_in_ramp_right, transition_history) = putt_classifier.update_and_classify(frame, detected_balls_original_scale, current_video_time) # Pass session-relative time
-            
-            # Check for session time limit
-            if session_duration_limit is not None and current_video_time >= session_duration_limit:
-                debug_logger.info(f"Session time limit of {session_duration_limit} seconds reached. Ending session.")
+        for packet in pipeline.results():
+            if timer is not None:
+                timer.lap("first frame")
+                debug_logger.info(timer.report())
+                timer = None
+            result = session.process(packet)
+            pipeline.set_classifier_state(result.state)
+            if session.time_limit_reached:
                 break # Exit the main loop
 
-            if classification:
-                putt_logger.info(f'{current_video_time:.2f},{classification},{detailed_classification_str},{overall_detected_ball_center[0] if overall_detected_ball_center else ""},{overall_detected_ball_center[1] if overall_detected_ball_center else ""},{json.dumps(transition_history)}')
-                
-                if not scoring_active:
-                    scoring_active = True
-                    debug_logger.info("Scoring activated: First putt detected.")
-
-                if classification.startswith("MAKE"):
-                    total_makes += 1
-                    consecutive_makes += 1
-                    if consecutive_makes > max_consecutive_makes:
-                        max_consecutive_makes = consecutive_makes
-                elif classification.startswith("MISS"):
-                    total_misses += 1
-                    consecutive_makes = 0
-
-                update_obs_files(total_makes, total_misses, consecutive_makes, max_consecutive_makes, debug_logger)
-                
-                try:
-                    filepath = os.path.join(script_dir, "obs_text_files", "DetailedClassification.txt")
-                    with open(filepath, "w") as f:
-                        f.write(detailed_classification_str)
-                except IOError as e:
-                    debug_logger.error(f"Error writing to DetailedClassification.txt: {e}")
-
-            if DISPLAY_VIDEO:
-                detailed_classification_results_display = {
-                    "ball_in_putting_mat": ball_in_putting_mat, "ball_in_ramp": ball_in_ramp,
-                    "ball_in_hole": ball_in_hole, "ball_in_left_of_mat": ball_in_left_of_mat,
-                    "ball_in_catch": ball_in_catch, "ball_in_return_track": ball_in_return_track,
-                    "ball_in_ramp_left": ball_in_ramp_left, "ball_in_ramp_center": ball_in_ramp_center,
-                    "ball_in_ramp_right": ball_in_ramp_right, "ball_in_hole_top": ball_in_hole_top,
-                    "ball_in_hole_right": ball_in_hole_right, "ball_in_hole_low": ball_in_hole_low,
-                    "ball_in_hole_left": ball_in_hole_left
-                }
-                stats = (total_makes, total_misses, consecutive_makes, max_consecutive_makes)
-                ball_data = (overall_detected_ball_center, detailed_classification_results_display, ball_in_hole, classification)
-                scale_factors = (scale_x_display, scale_y_display)
-                update_display_window(display_frame, calibrated_rois, roi_colors, scale_factors, stats, ball_data, current_video_time)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                debug_logger.info("'q' pressed. Exiting...")
-                break
+            if overlay is not None:
+                # Nothing reads the frame after classification, so the overlay is drawn on it directly.
+                overlay.render(packet.frame, result, session.stats, session.current_video_time())
+
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    debug_logger.info("'q' pressed. Exiting...")
+                    break
+                if key == ord('t'):
+                    trace_dump_requested.set()
+            if trace_dump_requested.is_set() and tracer is not None:
+                trace_dump_requested.clear()
+                dump_trace(tracer, debug_logger)
     finally:
-        end_time = time.time()
-        # Calculate session_duration based on session_start_time if it was set
-        if session_start_time is not None:
-            session_duration = round(end_time - session_start_time)
-            debug_logger.info(f"Session ended. Actual playing duration: {session_duration} seconds.")
+        pipeline.stop()
+        if tracer is not None:
+            dump_trace(tracer, debug_logger)
+        session.close()
+        if push_server is not None:
+            push_server.close()
+
+        if is_live_feed and args.session_id:
+            report_session(putt_log_filename, args.player_id, args.session_id, os.path.join(script_dir, "Session.Reports"),
+                           debug_logger, duel_id=args.duel_id, league_round_id=args.league_round_id)
+
+        if chunked_detection:
+            cap.release() # Never read by the chunk workers, which open their own captures
+            released = True
         else:
-            session_duration = 0
-            debug_logger.info("Session ended. No putts detected in ramp, so playing duration is 0.")
-        
-        putt_log_file = putt_logger.handlers[0].baseFilename if putt_logger.handlers else None
-
-        if is_live_feed and args.session_id and putt_log_file:
-            # Get player info for the report
-            player_info = data_manager.get_player_info(args.player_id)
-            
-            reporter = SessionReporter(putt_log_file) # Initialize with only input_csv_path # Initialize with only input_csv_path
-            reporter.load_and_process_data() # Load and process data from the CSV
-            
-            # Generate report and get the report data
-            session_report_data = reporter.generate_report(os.path.join(script_dir, "Session.Reports"), player_info) # Pass output_dir and player_info
-            
-            debug_logger.info(f"Session report generated for session {args.session_id}")
-            
-            # Update session stats in the database using data from the reporter
-            data_manager.update_session(args.session_id, reporter)
-            debug_logger.info(f"Updated session {args.session_id} in the database.")
-
-            # Recalculate all-time player stats
-            data_manager.recalculate_player_stats(args.player_id)
-
-            if args.duel_id:
-                data_manager.submit_duel_session(args.duel_id, args.session_id, args.player_id)
-
-            if args.league_round_id:
-                data_manager.submit_league_session(args.league_round_id, args.player_id, args.session_id, reporter.total_makes)
-
-        cap.release()
-        if DISPLAY_VIDEO:
-            cv2.destroyAllWindows()
-        debug_logger.info("Video capture released and windows closed.")
+            released = pipeline.release_capture() # Left open, and logged, while a read is still blocked
+        if overlay is not None:
+            overlay.close()
+        debug_logger.info("Video capture released and windows closed." if released else "Windows closed.")
+        if dropped_records(debug_logger) or debug_sampler.dropped:
+            debug_logger.info(f"Debug log: {debug_sampler.dropped} DEBUG records sampled out, {dropped_records(debug_logger)} dropped on a full queue.")
 
 
 if __name__ == "__main__":
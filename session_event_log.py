@@ -0,0 +1,297 @@
+"""
+Compact, typed, append-only log of a session's classified putts.
+
+It replaces the putt classification CSV. Before, every putt went through Python logging as a
+CSV row with the transition history embedded as a JSON string, and SessionReporter re-parsed
+the whole file with csv.DictReader. An event log (putt_classification_log_<ts>.pel) is a
+sequence of fixed-layout binary records written with struct:
+
+    file header   b"PPEL", version u16, reserved u16
+    STRING        type u8 = 1, id u16, length u16, UTF-8 bytes
+    PUTT          type u8 = 2, time f64 (seconds, rounded to 0.01), classification id u16, detailed classification id u16,
+                  ball_x i32, ball_y i32 (both NO_BALL without a ball), transition count u16,
+                  then per transition: kind u8, ROI or text id u16, time i32 (centiseconds)
+
+Classifications, detailed classifications and ROI names repeat all session long, so each one
+is written once as a STRING record and referenced by id afterwards. Transitions such as
+"Entered HOLE_TOP_ROI at 12.34s" are stored as (kind, ROI id, centiseconds). Anything else is
+stored as a whole interned string. Ball centers are the classifier's integer pixels. Rows the
+tracker used to write to the CSV are rebuilt byte for byte by to_legacy_csv; check_round_trip
+(python session_event_log.py --check) verifies that against rows in the old format.
+
+Records are only ever appended. A record cut short by a crash is ignored by the reader, so a
+log is readable up to its last complete putt at any time. The sync policy decides how often
+records reach the disk:
+
+    close    buffered in the process until close(); cheapest, loses the session on a crash
+    record   flushed to the OS after every putt; survives a tracker crash (default)
+    fsync    flushed and fsynced after every putt; survives a power loss
+
+    python session_event_log.py logs/putt_classification_log_20260101_120000.pel       # to CSV on stdout
+    python session_event_log.py logs/putt_classification_log_20260101_120000.pel -o out.csv
+    python session_event_log.py --check
+"""
+import io
+import re
+import os
+import sys
+import json
+import struct
+import tempfile
+import argparse
+
+MAGIC = b"PPEL"
+VERSION = 2
+FILE_HEADER = struct.Struct("<4sHH")
+
+RECORD_STRING = 1
+RECORD_PUTT = 2
+_TYPE = struct.Struct("<B")
+_STRING = struct.Struct("<HH")
+_PUTT = struct.Struct("<dHHiiH")
+NO_BALL = -0x80000000  # ball_x and ball_y of a putt without a ball
+_TRANSITION = struct.Struct("<BHi")
+
+# Transition kinds. TRANSITION_TEXT stores the whole entry as an interned string.
+TRANSITION_TEXT = 0
+TRANSITION_KINDS = {1: "Entered", 2: "Exited"}
+_KIND_IDS = {name: kind for kind, name in TRANSITION_KINDS.items()}
+_TRANSITION_RE = re.compile(r"^(Entered|Exited) (\S+) at (-?\d+\.\d{2})s$")
+
+SYNC_POLICIES = ("close", "record", "fsync")
+EVENT_LOG_EXTENSION = ".pel"
+LEGACY_CSV_HEADER = "current_frame_time,classification,detailed_classification,ball_x,ball_y,transition_history"
+
+
+class PuttEvent:
+    """One classified putt read back from an event log."""
+    __slots__ = ("time", "classification", "detailed_classification", "ball_center", "transition_history")
+
+    def __init__(self, time, classification, detailed_classification, ball_center, transition_history):
+        self.time = time                                        # Session-relative time, seconds
+        self.classification = classification
+        self.detailed_classification = detailed_classification
+        self.ball_center = ball_center                          # (x, y) in integer pixels, or None without a ball
+        self.transition_history = transition_history            # List of strings, as the classifier made them
+
+
+def is_event_log(path):
+    """True if path starts with the event log header."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SessionEventLog:
+    """Appends classified putts to an event log."""
+
+    def __init__(self, path, sync="record"):
+        """
+        Args:
+            path (str): Log file to create. An existing file is replaced.
+            sync (str): One of SYNC_POLICIES.
+        """
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"Unknown sync policy '{sync}'. Expected one of {SYNC_POLICIES}.")
+        self.path = path
+        self.sync = sync
+        self.count = 0
+        self._ids = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "wb", buffering=io.DEFAULT_BUFFER_SIZE)
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self._sync()
+
+    def append(self, time, classification, detailed_classification, ball_center, transition_history):
+        """
+        Appends one putt. time is rounded to centiseconds; ball_center is (x, y) in integer pixels
+        or None; transition_history a list of strings.
+        """
+        parts = []
+        classification_id = self._intern(classification, parts)
+        detailed_id = self._intern(detailed_classification, parts)
+        x, y = (int(ball_center[0]), int(ball_center[1])) if ball_center else (NO_BALL, NO_BALL)
+        transitions = []
+        for entry in transition_history:
+            match = _TRANSITION_RE.match(entry)
+            if match:
+                transitions.append(_TRANSITION.pack(_KIND_IDS[match.group(1)], self._intern(match.group(2), parts),
+                                                    round(float(match.group(3)) * 100)))
+            else:
+                transitions.append(_TRANSITION.pack(TRANSITION_TEXT, self._intern(entry, parts), 0))
+        parts.append(_TYPE.pack(RECORD_PUTT))
+        # Rounded as the CSV wrote it, so SessionReporter's durations and windows match the old logs.
+        parts.append(_PUTT.pack(round(time, 2), classification_id, detailed_id, x, y, len(transitions)))
+        parts.extend(transitions)
+        # One write per putt, so a crash can only cut the last record short.
+        self._file.write(b"".join(parts))
+        self.count += 1
+        if self.sync != "close":
+            self._sync()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def _intern(self, text, parts):
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = len(self._ids)
+            if string_id > 0xFFFF:
+                raise ValueError(f"{self.path}: more than {0xFFFF + 1} distinct strings in one session.")
+            data = text.encode("utf-8")
+            parts.append(_TYPE.pack(RECORD_STRING))
+            parts.append(_STRING.pack(string_id, len(data)))
+            parts.append(data)
+            self._ids[text] = string_id
+        return string_id
+
+    def _sync(self):
+        self._file.flush()
+        if self.sync == "fsync":
+            os.fsync(self._file.fileno())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_events(path, transitions=True):
+    """
+    Yields the PuttEvents of an event log in order, streaming from disk.
+
+    Args:
+        path (str): The event log.
+        transitions (bool): Decode each putt's transition history. Without it, transition_history
+            is None and the transitions are skipped unread, which is what score-only readers want.
+
+    Raises:
+        ValueError: If path is not an event log of a supported version.
+    """
+    with open(path, "rb") as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a session event log.")
+        _, version, _ = FILE_HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported event log version {version}.")
+
+        strings = []
+        while True:
+            record_type = f.read(1)
+            if not record_type:
+                return
+            if record_type[0] == RECORD_STRING:
+                head = f.read(_STRING.size)
+                if len(head) < _STRING.size:
+                    return # Record cut short by a crash
+                _, length = _STRING.unpack(head)
+                data = f.read(length)
+                if len(data) < length:
+                    return
+                strings.append(data.decode("utf-8"))
+            elif record_type[0] == RECORD_PUTT:
+                head = f.read(_PUTT.size)
+                if len(head) < _PUTT.size:
+                    return
+                time, classification_id, detailed_id, x, y, n_transitions = _PUTT.unpack(head)
+                body = f.read(n_transitions * _TRANSITION.size)
+                if len(body) < n_transitions * _TRANSITION.size:
+                    return
+                history = None
+                if transitions:
+                    history = []
+                    for kind, string_id, centiseconds in _TRANSITION.iter_unpack(body):
+                        if kind == TRANSITION_TEXT:
+                            history.append(strings[string_id])
+                        else:
+                            history.append(f"{TRANSITION_KINDS[kind]} {strings[string_id]} at {centiseconds / 100:.2f}s")
+                ball_center = None if x == NO_BALL else (x, y)
+                yield PuttEvent(time, strings[classification_id], strings[detailed_id], ball_center, history)
+            else:
+                raise ValueError(f"{path}: unknown record type {record_type[0]} at offset {f.tell() - 1}.")
+
+
+def legacy_csv_line(event):
+    """Formats an event as the row run_tracker used to write to the putt classification CSV."""
+    center = event.ball_center
+    return (f'{event.time:.2f},{event.classification},{event.detailed_classification},'
+            f'{center[0] if center else ""},{center[1] if center else ""},{json.dumps(event.transition_history)}')
+
+
+def to_legacy_csv(path, out):
+    """Writes an event log as the legacy putt classification CSV to the text stream out. Returns the number of putts."""
+    out.write(LEGACY_CSV_HEADER + "\n")
+    count = 0
+    for event in read_events(path):
+        out.write(legacy_csv_line(event) + "\n")
+        count += 1
+    return count
+
+
+# Rows in the format run_tracker wrote to the putt classification CSV, for check_round_trip.
+_BASELINE_ROWS = (
+    '12.34,MAKE,MAKE - TOP,512,300,["Entered HOLE_TOP_ROI at 12.10s", "Exited RAMP_ROI at 12.20s"]',
+    '20.50,MISS,MISS - RETURN TO MAT,,,[]',
+    '31.07,MISS,MISS - CATCH,1919,1079,["Entered CATCH_ROI at 30.95s", "Ball lost"]',
+)
+
+
+def check_round_trip():
+    """
+    Parses each row in _BASELINE_ROWS, writes it to an event log and rebuilds it with to_legacy_csv.
+
+    Returns:
+        list: (expected, rebuilt) for every row that was not reproduced exactly; empty on success.
+    """
+    events = []
+    for row in _BASELINE_ROWS:
+        time, classification, detailed, x, y, history = row.split(",", 5)
+        events.append((float(time), classification, detailed, (int(x), int(y)) if x else None, json.loads(history)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "check" + EVENT_LOG_EXTENSION)
+        with SessionEventLog(path, sync="close") as event_log:
+            for event in events:
+                event_log.append(*event)
+        out = io.StringIO()
+        to_legacy_csv(path, out)
+    rebuilt = out.getvalue().splitlines()
+    expected = [LEGACY_CSV_HEADER, *_BASELINE_ROWS]
+    mismatches = [(e, r) for e, r in zip(expected, rebuilt) if e != r]
+    if len(rebuilt) != len(expected):
+        mismatches.append((f"{len(expected)} lines", f"{len(rebuilt)} lines"))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a session event log to the legacy putt classification CSV.")
+    parser.add_argument("event_log", nargs="?", help="A putt_classification_log_<timestamp>.pel file.")
+    parser.add_argument("-o", "--output", help="CSV file to write. Defaults to stdout.")
+    parser.add_argument("--check", action="store_true", help="Verify that rows in the legacy CSV format survive a round trip, then exit.")
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = check_round_trip()
+        for expected, rebuilt in mismatches:
+            print(f"Expected: {expected}\nRebuilt:  {rebuilt}")
+        print("Round trip FAILED." if mismatches else f"Round trip OK ({len(_BASELINE_ROWS)} rows).")
+        sys.exit(1 if mismatches else 0)
+    if not args.event_log:
+        parser.error("event_log is required unless --check is given.")
+
+    if args.output:
+        with open(args.output, "w") as out:
+            count = to_legacy_csv(args.event_log, out)
+        print(f"Wrote {count} putts to {args.output}.")
+    else:
+        to_legacy_csv(args.event_log, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 import datetime
 import json
+from session_event_log import is_event_log, read_events
 
 class SessionReporter:
     def __init__(self, input_csv_path):
@@ -21,104 +22,109 @@ class SessionReporter:
         self.most_makes_in_60_seconds = 0
 
     def load_and_process_data(self):
+        for current_frame_time, classification, detailed_classification in self._putts():
+            # Only process rows that represent a classified putt (not intermediate frames)
+            if detailed_classification:
+                self.putt_counter += 1
+                putt_index = self.putt_counter # Use sequential putt index
+
+                self.putt_data.append({
+                    'Putt Index': putt_index,
+                    'Putt Classification': classification,
+                    'Putt Detailed Classification': detailed_classification,
+                    'Putt Time': current_frame_time # Store the time for each putt
+                })
+                self.total_putts += 1
+
+                if self.session_duration < current_frame_time:
+                    self.session_duration = current_frame_time
+
+                if classification == "MAKE":
+                    self.total_makes += 1
+                    self.current_consecutive_makes += 1
+                    self.make_timestamps.append(current_frame_time)
+                    # Update makes by category
+                    make_category = detailed_classification.replace("MAKE - ", "")
+                    self.makes_by_category[make_category] = self.makes_by_category.get(make_category, 0) + 1
+                else: # MISS
+                    self.total_misses += 1
+                    self.max_consecutive_makes = max(self.max_consecutive_makes, self.current_consecutive_makes)
+                    self.current_consecutive_makes = 0
+
+                    # Update misses by category
+                    if "CATCH" in detailed_classification:
+                        self.misses_by_category["CATCH"] += 1
+                    elif "TIMEOUT" in detailed_classification:
+                        self.misses_by_category["TIMEOUT"] += 1
+                    elif detailed_classification.startswith("MISS - RETURN:"): # More robust check for RETURN putts
+                        self.misses_by_category["RETURN"] += 1
+
+        # Final check for max consecutive makes after loop
+        self.max_consecutive_makes = max(self.max_consecutive_makes, self.current_consecutive_makes)
+
+        # Calculate consecutive makes counts
+        temp_consecutive = 0
+        for putt in self.putt_data:
+            if putt['Putt Classification'] == "MAKE":
+                temp_consecutive += 1
+            else:
+                for threshold in sorted(self.consecutive_makes_counts.keys()):
+                    if temp_consecutive >= threshold:
+                        self.consecutive_makes_counts[threshold] += 1
+                temp_consecutive = 0
+        # After loop, check for any remaining consecutive makes
+        for threshold in sorted(self.consecutive_makes_counts.keys()):
+            if temp_consecutive >= threshold:
+                self.consecutive_makes_counts[threshold] += 1
+
+        # Calculate Putts Per Minute and Makes Per Minute
+        if self.total_putts > 0:
+            self.make_percentage = (self.total_makes / self.total_putts) * 100
+            self.miss_percentage = (self.total_misses / self.total_putts) * 100
+        else:
+            self.make_percentage = 0
+            self.miss_percentage = 0
+
+        if self.session_duration > 0:
+            self.putts_per_minute = self.total_putts / (self.session_duration / 60)
+            self.makes_per_minute = self.total_makes / (self.session_duration / 60)
+        else:
+            self.putts_per_minute = 0
+            self.makes_per_minute = 0
+
+        # Calculate Fastest 21 Makes
+        if len(self.make_timestamps) >= 21:
+            for i in range(len(self.make_timestamps) - 20):
+                time_diff = self.make_timestamps[i + 20] - self.make_timestamps[i]
+                if time_diff < self.fastest_21_makes:
+                    self.fastest_21_makes = time_diff
+
+        # Calculate Most Makes in 60 seconds
+        if len(self.make_timestamps) > 0:
+            for i in range(len(self.make_timestamps)):
+                count = 0
+                for j in range(i, len(self.make_timestamps)):
+                    if self.make_timestamps[j] - self.make_timestamps[i] <= 60:
+                        count += 1
+                    else:
+                        break
+                if count > self.most_makes_in_60_seconds:
+                    self.most_makes_in_60_seconds = count
+
+    def _putts(self):
+        """Yields (current_frame_time, classification, detailed_classification) from an event log or a legacy CSV."""
+        if is_event_log(self.input_csv_path):
+            for event in read_events(self.input_csv_path, transitions=False):
+                yield event.time, event.classification, event.detailed_classification
+            return
         with open(self.input_csv_path, 'r') as f:
             reader = self._csv_dict_reader(f) # Use a generator to handle potential file issues
             for row in reader:
                 # Skip header row if it's mistakenly processed as a data row
                 if row['current_frame_time'] == 'current_frame_time':
                     continue
-                
-                # Only process rows that represent a classified putt (not intermediate frames)
                 if row['detailed_classification']:
-                    self.putt_counter += 1
-                    putt_index = self.putt_counter # Use sequential putt index
-                    current_frame_time = float(row['current_frame_time']) # Get current_frame_time
-
-                    self.putt_data.append({
-                        'Putt Index': putt_index,
-                        'Putt Classification': row['classification'],
-                        'Putt Detailed Classification': row['detailed_classification'],
-                        'Putt Time': current_frame_time # Store the time for each putt
-                    })
-                    self.total_putts += 1
-
-                    if self.session_duration < current_frame_time:
-                        self.session_duration = current_frame_time
-
-                    classification = row['classification']
-                    detailed_classification = row['detailed_classification']
-
-                    if classification == "MAKE":
-                        self.total_makes += 1
-                        self.current_consecutive_makes += 1
-                        self.make_timestamps.append(current_frame_time)
-                        # Update makes by category
-                        make_category = detailed_classification.replace("MAKE - ", "")
-                        self.makes_by_category[make_category] = self.makes_by_category.get(make_category, 0) + 1
-                    else: # MISS
-                        self.total_misses += 1
-                        self.max_consecutive_makes = max(self.max_consecutive_makes, self.current_consecutive_makes)
-                        self.current_consecutive_makes = 0
-
-                        # Update misses by category
-                        if "CATCH" in detailed_classification:
-                            self.misses_by_category["CATCH"] += 1
-                        elif "TIMEOUT" in detailed_classification:
-                            self.misses_by_category["TIMEOUT"] += 1
-                        elif detailed_classification.startswith("MISS - RETURN:"): # More robust check for RETURN putts
-                            self.misses_by_category["RETURN"] += 1
-            
-            # Final check for max consecutive makes after loop
-            self.max_consecutive_makes = max(self.max_consecutive_makes, self.current_consecutive_makes)
-
-            # Calculate consecutive makes counts
-            temp_consecutive = 0
-            for putt in self.putt_data:
-                if putt['Putt Classification'] == "MAKE":
-                    temp_consecutive += 1
-                else:
-                    for threshold in sorted(self.consecutive_makes_counts.keys()):
-                        if temp_consecutive >= threshold:
-                            self.consecutive_makes_counts[threshold] += 1
-                    temp_consecutive = 0
-            # After loop, check for any remaining consecutive makes
-            for threshold in sorted(self.consecutive_makes_counts.keys()):
-                if temp_consecutive >= threshold:
-                    self.consecutive_makes_counts[threshold] += 1
-
-            # Calculate Putts Per Minute and Makes Per Minute
-            if self.total_putts > 0:
-                self.make_percentage = (self.total_makes / self.total_putts) * 100
-                self.miss_percentage = (self.total_misses / self.total_putts) * 100
-            else:
-                self.make_percentage = 0
-                self.miss_percentage = 0
-
-            if self.session_duration > 0:
-                self.putts_per_minute = self.total_putts / (self.session_duration / 60)
-                self.makes_per_minute = self.total_makes / (self.session_duration / 60)
-            else:
-                self.putts_per_minute = 0
-                self.makes_per_minute = 0
-
-            # Calculate Fastest 21 Makes
-            if len(self.make_timestamps) >= 21:
-                for i in range(len(self.make_timestamps) - 20):
-                    time_diff = self.make_timestamps[i + 20] - self.make_timestamps[i]
-                    if time_diff < self.fastest_21_makes:
-                        self.fastest_21_makes = time_diff
-
-            # Calculate Most Makes in 60 seconds
-            if len(self.make_timestamps) > 0:
-                for i in range(len(self.make_timestamps)):
-                    count = 0
-                    for j in range(i, len(self.make_timestamps)):
-                        if self.make_timestamps[j] - self.make_timestamps[i] <= 60:
-                            count += 1
-                        else:
-                            break
-                    if count > self.most_makes_in_60_seconds:
-                        self.most_makes_in_60_seconds = count
+                    yield float(row['current_frame_time']), row['classification'], row['detailed_classification']
 
     def _csv_dict_reader(self, file_obj):
         """A robust CSV DictReader."""
@@ -236,7 +242,7 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Generate a session report from advanced evaluation results.")
-    parser.add_argument("--input_csv", type=str, required=True, help="Path to the advanced_evaluation_results.csv file.")
+    parser.add_argument("--input_csv", type=str, required=True, help="Path to a session event log (.pel) or a putt classification CSV.")
     # Default output directory is now relative to the script's location
     default_output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Session.Reports")
     parser.add_argument("--output_dir", type=str, default=default_output_dir, help="Directory to save the session report.")
@@ -0,0 +1,127 @@
+"""
+Fast startup helpers for run_tracker: a camera index cache and a per-phase startup timer.
+
+Probing every camera index costs an open and release of each device, which is the slowest part
+of starting a live session after the model load. The last camera that opened for a calibration
+file is cached per machine (camera_cache.json, keyed by host name and calibration path), so a
+normal start opens exactly one device: the requested index, else the cached one. Indices 0-9
+are probed only when both fail, and the first camera that opens is kept open rather than
+released and reopened.
+"""
+import os
+import json
+import time
+import socket
+
+import cv2
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CAMERA_CACHE_PATH = os.path.join(script_dir, "camera_cache.json")
+PROBE_INDICES = range(10)
+
+
+def _cache_key(config_path):
+    return f"{socket.gethostname()}|{os.path.abspath(config_path)}"
+
+
+def load_cached_camera(config_path, cache_path=CAMERA_CACHE_PATH):
+    """Returns the camera index that last opened for config_path on this machine, or None."""
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f).get(_cache_key(config_path))
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return None
+
+
+def save_cached_camera(config_path, camera_index, cache_path=CAMERA_CACHE_PATH):
+    """Records camera_index as the good camera for config_path on this machine."""
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            cache = {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    if cache.get(_cache_key(config_path)) == camera_index:
+        return
+    cache[_cache_key(config_path)] = camera_index
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def _open(index):
+    cap = cv2.VideoCapture(index)
+    if cap.isOpened():
+        return cap
+    cap.release()
+    return None
+
+
+def open_camera(requested_index, config_path, logger, cache_path=CAMERA_CACHE_PATH):
+    """
+    Opens a camera with as few device opens as possible.
+
+    Tries the requested index, then the index cached for this machine and calibration file,
+    then probes PROBE_INDICES. The index that opened is written back to the cache.
+
+    Returns:
+        tuple: (cap, camera_index), with cap already opened, or (None, None) if no camera opens.
+    """
+    tried = set()
+    candidates = [(requested_index, "requested"), (load_cached_camera(config_path, cache_path), "cached")]
+    for index, origin in candidates:
+        if index is None or index in tried:
+            continue
+        tried.add(index)
+        cap = _open(index)
+        if cap is not None:
+            logger.info(f"Opened {origin} camera {index}.")
+            break
+        logger.warning(f"Could not open {origin} camera {index}.")
+    else:
+        logger.info(f"Probing cameras {PROBE_INDICES.start}-{PROBE_INDICES.stop - 1}.")
+        for index in PROBE_INDICES:
+            if index in tried:
+                continue
+            cap = _open(index)
+            if cap is not None:
+                logger.warning(f"Using first available camera {index}.")
+                break
+        else:
+            return None, None
+
+    try:
+        save_cached_camera(config_path, index, cache_path)
+    except (IOError, OSError) as e:
+        logger.error(f"Error saving the camera cache: {e}")
+    return cap, index
+
+
+class StartupTimer:
+    """Records how long each startup phase took, for a one-line report once the first frame arrives."""
+
+    def __init__(self, start=None):
+        """
+        Args:
+            start (float): time.perf_counter() value at process start, so module imports count too.
+        """
+        self.start = start if start is not None else time.perf_counter()
+        self.mark = self.start
+        self.phases = []
+
+    def lap(self, name):
+        """Ends the current phase, naming it, and starts the next one."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.mark))
+        self.mark = now
+
+    def add(self, name, seconds):
+        """Records a phase that ran concurrently with the others (e.g. a background model load)."""
+        self.phases.append((name, seconds))
+
+    def report(self):
+        total = time.perf_counter() - self.start
+        parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        return f"Startup took {total:.2f}s: {parts}."
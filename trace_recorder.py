@@ -0,0 +1,141 @@
+"""
+Structured, low-overhead tracing for the putt classifier.
+
+Instead of formatting debug strings every frame, the classifier records compact numeric events
+(state changes, ROI entries/exits, classifications) into a preallocated ring buffer. Recording
+is a single row write; nothing is formatted or written to disk until the buffer is dumped,
+which run_tracker does at the end of a session or on demand. The decoder turns a dump back
+into readable text:
+
+    python trace_recorder.py logs/trace_20250101_120000.npz
+"""
+import os
+import json
+import argparse
+import numpy as np
+
+EVENT_STATE = 1           # value: new state id, aux: previous state id
+EVENT_ROI_ENTER = 2       # value: ROI bits entered
+EVENT_ROI_EXIT = 3        # value: ROI bits exited
+EVENT_CLASSIFICATION = 4  # value: id of the detailed classification string
+EVENT_BALLS_IGNORED = 5   # value: number of balls in IGNORE_AREA_ROI (logged when it changes)
+EVENT_PUTT_START = 6      # value: id of the first ramp entry ROI name
+
+EVENT_NAMES = {
+    EVENT_STATE: "STATE",
+    EVENT_ROI_ENTER: "ENTER",
+    EVENT_ROI_EXIT: "EXIT",
+    EVENT_CLASSIFICATION: "CLASSIFIED",
+    EVENT_BALLS_IGNORED: "IGNORED",
+    EVENT_PUTT_START: "PUTT_START",
+}
+
+TRACE_DTYPE = np.dtype([
+    ("frame", "<u4"),
+    ("time", "<f8"),
+    ("event", "u1"),
+    ("state", "u1"),
+    ("value", "<u4"),
+    ("aux", "<u4"),
+    ("x", "<i2"),
+    ("y", "<i2"),
+])
+
+
+class TraceRecorder:
+    """
+    Fixed-size ring buffer of TRACE_DTYPE records.
+
+    Strings (state names, classifications) are interned once and referenced by id, so a record
+    never allocates. When the buffer is full the oldest records are overwritten.
+    """
+
+    def __init__(self, capacity=65536, bit_names=None):
+        """
+        Args:
+            capacity (int): Number of records kept.
+            bit_names (dict): Optional name -> bit mapping used to decode ROI masks (ROI_BITS).
+        """
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self.count = 0  # Total records ever written
+        self.strings = []
+        self._string_ids = {}
+        self.bit_names = dict(bit_names or {})
+
+    def intern(self, text):
+        """Returns the id of a string, adding it to the string table on first use."""
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def record(self, event, frame, time, state=0, value=0, aux=0, point=None):
+        x, y = point if point is not None else (-1, -1)
+        self.records[self.count % self.capacity] = (frame, time, event, state, value, aux, x, y)
+        self.count += 1
+
+    def ordered_records(self):
+        """The retained records, oldest first."""
+        if self.count <= self.capacity:
+            return self.records[:self.count].copy()
+        head = self.count % self.capacity
+        return np.concatenate((self.records[head:], self.records[:head]))
+
+    def dump(self, path):
+        """Writes the retained records and string tables to an .npz file and returns its path."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        metadata = {"strings": self.strings, "bit_names": self.bit_names,
+                    "dropped": max(0, self.count - self.capacity)}
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, records=self.ordered_records(), metadata=np.array(json.dumps(metadata)))
+        os.replace(tmp_path, path)
+        return path
+
+
+def load_trace(path):
+    """Returns (records, metadata) from a dump written by TraceRecorder.dump."""
+    with np.load(path) as data:
+        return data["records"], json.loads(str(data["metadata"]))
+
+
+def _mask_names(mask, bit_names):
+    return "|".join(name for name, bit in bit_names.items() if mask & bit) or "-"
+
+
+def decode_trace(records, metadata):
+    """Yields one readable line per record."""
+    strings, bit_names = metadata["strings"], metadata["bit_names"]
+    if metadata.get("dropped"):
+        yield f"({metadata['dropped']} older records were overwritten)"
+    for r in records:
+        event = int(r["event"])
+        if event == EVENT_STATE:
+            detail = f"{strings[r['aux']]} -> {strings[r['value']]}"
+        elif event in (EVENT_ROI_ENTER, EVENT_ROI_EXIT):
+            detail = _mask_names(int(r["value"]), bit_names)
+        elif event in (EVENT_CLASSIFICATION, EVENT_PUTT_START):
+            detail = strings[r["value"]]
+        else:
+            detail = str(int(r["value"]))
+        position = f" at ({r['x']}, {r['y']})" if r["x"] >= 0 else ""
+        yield (f"frame {r['frame']:>7} {r['time']:9.2f}s [{strings[r['state']]}] "
+               f"{EVENT_NAMES.get(event, event)}: {detail}{position}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode a classifier trace dump into readable text.")
+    parser.add_argument("trace", help="Path to a trace_*.npz file.")
+    parser.add_argument("--output", help="Write the decoded text here instead of printing it.")
+    args = parser.parse_args()
+
+    records, metadata = load_trace(args.trace)
+    lines = decode_trace(records, metadata)
+    if args.output:
+        with open(args.output, "w") as f:
+            for line in lines:
+                f.write(line + "\n")
+    else:
+        for line in lines:
+            print(line)
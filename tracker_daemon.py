@@ -0,0 +1,512 @@
+"""
+Long-running tracker service that keeps the detector and the camera warm between sessions.
+
+run_tracker.py starts cold for every session: it imports the inference stack, probes the
+cameras, opens the capture device and loads the model before the first frame. The daemon does
+all of that once. Between sessions a keep-warm thread keeps grabbing (and discarding) camera
+frames, so exposure stays settled and the device stays open. A session start only loads the
+player's calibration and builds a classifier, then hands the open camera to a TrackerPipeline.
+
+Sessions are controlled over a small HTTP API bound to localhost:
+
+    GET  /status           daemon state and the running session, if any
+    POST /sessions/start   {"player_id": 1, "session_id": 41, "duel_id": null, "league_round_id": null,
+                            "time_limit_seconds": null, "config": null}
+    POST /sessions/stop    ends the running session, scores it and records it in the database
+
+    python tracker_daemon.py serve --camera_index 0
+    python tracker_daemon.py start --player_id 1 --session_id 41
+    python tracker_daemon.py stop
+
+One session runs at a time; a start request while a session is running is refused with 409.
+A start request while the camera is still held by a stuck read is refused with 503.
+"""
+import os
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+log_dir = os.path.join(script_dir, "logs")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Fields accepted by POST /sessions/start and their types.
+START_FIELDS = {
+    "player_id": int, "session_id": int, "duel_id": int, "league_round_id": int,
+    "time_limit_seconds": int, "config": str,
+}
+
+
+class SessionConflict(Exception):
+    """Raised when a session is started while another one is running, or stopped when none is."""
+
+
+class CameraBusy(Exception):
+    """Raised when a session is started while a previous reader of the camera is still inside a read."""
+
+
+def parse_start_request(body):
+    """
+    Validates a POST /sessions/start body.
+
+    Raises:
+        ValueError: If a field is unknown or has the wrong type, or player_id or session_id is missing.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object.")
+    request = {}
+    for key, value in body.items():
+        if key not in START_FIELDS:
+            raise ValueError(f"Unknown field '{key}'. Expected some of {', '.join(START_FIELDS)}.")
+        if value is None:
+            continue
+        try:
+            request[key] = START_FIELDS[key](value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {key}: {value!r}.")
+    for key in ("player_id", "session_id"):
+        if key not in request:
+            raise ValueError(f"{key} is required.")
+    return request
+
+
+class _KeepWarm(threading.Thread):
+    """Grabs and discards camera frames, without decoding them, while no session is running."""
+
+    def __init__(self, cap, logger, wait_for=()):
+        """
+        Args:
+            cap: The daemon's open capture.
+            logger: The daemon's logger.
+            wait_for (iterable): Threads that may still be inside a read of cap (e.g. the capture stage
+                of the session that just ended). cv2.VideoCapture is not thread-safe, so cap is only
+                touched once they have exited.
+        """
+        super().__init__(name="keep-warm", daemon=True)
+        self.cap = cap
+        self.logger = logger
+        self.wait_for = tuple(wait_for)
+        self.stop_event = threading.Event()
+        self.failed = False
+
+    def run(self):
+        for reader in self.wait_for:
+            while reader.is_alive():
+                if self.stop_event.is_set():
+                    return
+                reader.join(0.1)
+        while not self.stop_event.is_set():
+            if not self.cap.grab():
+                self.failed = True
+                self.logger.error("Camera stopped delivering frames while idle.")
+                return
+
+
+class _Session:
+    """One running session: its pipeline, scoring state and the thread that classifies."""
+
+    def __init__(self, request, pipeline, tracker_session, putt_log_filename):
+        self.request = request
+        self.pipeline = pipeline
+        self.tracker_session = tracker_session
+        self.putt_log_filename = putt_log_filename
+        self.started_at = time.time()
+        self.thread = None
+        self.finished = threading.Event()
+        self.summary = None
+
+    def status(self):
+        s = self.tracker_session
+        return {
+            "player_id": self.request["player_id"],
+            "session_id": self.request["session_id"],
+            "running_seconds": round(time.time() - self.started_at, 1),
+            "frames": s.frame_count,
+            "total_makes": s.total_makes,
+            "total_misses": s.total_misses,
+            "consecutive_makes": s.consecutive_makes,
+            "max_consecutive_makes": s.max_consecutive_makes,
+        }
+
+
+class TrackerDaemon:
+    """Owns the warm detector and camera and runs one session at a time on them."""
+
+    def __init__(self, video_source, logger, model_path, engine="ultralytics", threads=None, from_frame_bus=False,
+                 queue_size=2, roi_crop=True, roi_crop_padding=32, stats_publisher=None):
+        """
+        Loads the detector, opens the camera and warms both up.
+
+        Args:
+            video_source: Camera index, or frame bus name with from_frame_bus.
+            logger: The daemon's debug logger; sessions log here too.
+            model_path (str): YOLOv8 model, or an exported model for engine.
+            engine (str): Inference backend, one of inference_engines.ENGINES.
+            threads (int): Optional number of intra-op CPU threads for the engine.
+            from_frame_bus (bool): Read frames from a shared-memory frame bus instead of a camera.
+            queue_size (int): Capacity of the pipeline queues of each session.
+            roi_crop (bool): Restrict inference to the union rectangle of the session's ROIs.
+            roi_crop_padding (int): Pixels of margin added around the ROI crop.
+            stats_publisher (StatsPushServer): Optional. Pushes every session's live stats to overlay clients.
+
+        Raises:
+            IOError: If the video source cannot be opened.
+        """
+        # The heavy imports happen here, once per daemon instead of once per session.
+        import cv2
+        from video_processor import VideoProcessor
+        from frame_bus import FrameBusCapture
+
+        self.logger = logger
+        self.video_source = video_source
+        self.queue_size = queue_size
+        self.roi_crop = roi_crop
+        self.roi_crop_padding = roi_crop_padding
+        self.stats_publisher = stats_publisher
+        self._lock = threading.Lock()
+        self._session = None
+        self._last_summary = None
+        self._warmed_crops = set()
+        self._camera_readers = [] # Threads that may be inside a read of self.cap
+
+        t0 = time.perf_counter()
+        self.cap = FrameBusCapture(video_source) if from_frame_bus else cv2.VideoCapture(video_source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source {video_source}.")
+        self.frame_shape = (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 1080, int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1920, 3)
+        self.detector = VideoProcessor(model_path=model_path, min_bbox_area=50, engine=engine, threads=threads, logger=logger)
+        self.detector.warmup(self.frame_shape)
+        self._warmed_crops.add(None)
+        self.logger.info(f"Detector '{engine}' loaded and video source {video_source} opened in {time.perf_counter() - t0:.1f}s.")
+        self._keep_warm = None
+        self._start_keep_warm()
+
+    @property
+    def session_running(self):
+        return self._session is not None and not self._session.finished.is_set()
+
+    def status(self):
+        with self._lock:
+            return {
+                "video_source": str(self.video_source),
+                "camera_ok": not (self._keep_warm is not None and self._keep_warm.failed),
+                "session": self._session.status() if self.session_running else None,
+                "last_session": self._last_summary,
+            }
+
+    def start_session(self, request):
+        """
+        Starts a session on the warm camera and detector.
+
+        Raises:
+            SessionConflict: If a session is already running.
+            ValueError: If the player's calibration cannot be loaded.
+        """
+        from roi_config import load_and_prepare_rois
+        from putt_classifier import PuttClassifier
+        from tracker_pipeline import TrackerPipeline
+        from tracker_session import TrackerSession
+        from session_event_log import SessionEventLog, EVENT_LOG_EXTENSION
+
+        with self._lock:
+            if self.session_running:
+                raise SessionConflict(f"Session {self._session.request['session_id']} is already running.")
+            if self._session is not None:
+                self._session.thread.join() # Finished on its own (time limit); its summary is already recorded
+                self._session = None
+
+            t0 = time.perf_counter()
+            player_id = request["player_id"]
+            config = request.get("config") or os.path.join(script_dir, f"calibration_output_{player_id}.json")
+            rois = load_and_prepare_rois(config, self.logger)
+            if rois is None:
+                raise ValueError(f"Could not load the calibration for player {player_id} from {config}.")
+            if "camera_index" in rois and rois["camera_index"] != self.video_source:
+                self.logger.warning(f"Calibration {config} was made for camera {rois['camera_index']}; the daemon serves {self.video_source}.")
+
+            self.detector.crop_rect = None
+            if self.roi_crop:
+                self.detector.set_roi_crop(rois, padding=self.roi_crop_padding)
+            if self.detector.crop_rect not in self._warmed_crops:
+                # A new crop size means a new input shape for the engine.
+                self.detector.warmup(self.frame_shape, runs=1)
+                self._warmed_crops.add(self.detector.crop_rect)
+
+            busy = self._take_camera()
+            if busy:
+                self._start_keep_warm(wait_for=busy) # Resumes once the stuck read returns
+                raise CameraBusy(f"The camera is still inside a read by '{busy[0].name}'; try again shortly.")
+
+            log_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            putt_log_filename = os.path.join(log_dir, f"putt_classification_log_{log_timestamp}{EVENT_LOG_EXTENSION}")
+            obs_dir = os.path.join(script_dir, "obs_text_files")
+            classifier = PuttClassifier(yolo_model=self.detector.model, rois=rois, logger=self.logger)
+            tracker_session = TrackerSession(classifier, SessionEventLog(putt_log_filename), self.logger, obs_dir,
+                                             time_limit_seconds=request.get("time_limit_seconds"),
+                                             stats_publisher=self.stats_publisher)
+
+            pipeline = TrackerPipeline(self.cap, self.detector.process_frame, self.logger, is_live_feed=True,
+                                       queue_size=self.queue_size)
+            session = _Session(request, pipeline, tracker_session, putt_log_filename)
+            session.thread = threading.Thread(target=self._run_session, args=(session,), name=f"session-{request['session_id']}", daemon=True)
+            self._session = session
+            pipeline.start()
+            session.thread.start()
+            self.logger.info(f"Session {request['session_id']} for player {player_id} started in {(time.perf_counter() - t0) * 1000:.0f} ms.")
+            return session.status()
+
+    def stop_session(self, timeout=30.0):
+        """
+        Stops the running session and waits until it is scored and recorded.
+
+        Raises:
+            SessionConflict: If no session is running.
+        """
+        with self._lock:
+            session = self._session
+            if session is None or not self.session_running:
+                raise SessionConflict("No session is running.")
+            session.pipeline.stop_event.set()
+        if not session.finished.wait(timeout):
+            self.logger.error(f"Session {session.request['session_id']} did not finish within {timeout}s.")
+        return session.summary
+
+    def shutdown(self):
+        """Stops any running session and releases the camera."""
+        try:
+            self.stop_session()
+        except SessionConflict:
+            pass
+        busy = self._take_camera()
+        if busy:
+            # Releasing a capture under a concurrent read can crash OpenCV; the process is exiting anyway.
+            self.logger.error(f"Not releasing the camera: '{busy[0].name}' is still inside a read.")
+        else:
+            self.cap.release()
+        self.logger.info("Tracker daemon stopped.")
+
+    def _run_session(self, session):
+        from tracker_session import report_session
+
+        request = session.request
+        try:
+            for packet in session.pipeline.results():
+                session.tracker_session.process(packet)
+                if session.tracker_session.time_limit_reached:
+                    break
+        except Exception as e:
+            self.logger.error(f"Session {request['session_id']} failed: {e}", exc_info=True)
+        finally:
+            session.pipeline.stop()
+            duration = session.tracker_session.close()
+            summary = dict(session.status(), duration_seconds=duration, putt_log=session.putt_log_filename)
+            try:
+                report_session(session.putt_log_filename, request["player_id"], request["session_id"],
+                               os.path.join(script_dir, "Session.Reports"), self.logger,
+                               duel_id=request.get("duel_id"), league_round_id=request.get("league_round_id"))
+            except Exception as e:
+                self.logger.error(f"Error reporting session {request['session_id']}: {e}", exc_info=True)
+            session.summary = summary
+            self._last_summary = summary
+            # pipeline.stop() gives up on a capture thread stuck in read(); keep-warm waits for it.
+            self._start_keep_warm(wait_for=(session.pipeline.capture_stage,))
+            session.finished.set()
+            self.logger.info(f"Session {request['session_id']} ended: {summary}")
+
+    def _start_keep_warm(self, wait_for=()):
+        self._keep_warm = _KeepWarm(self.cap, self.logger, wait_for)
+        self._camera_readers = [*self._keep_warm.wait_for, self._keep_warm]
+        self._keep_warm.start()
+
+    def _take_camera(self, timeout=2.0):
+        """
+        Stops keep-warm and waits for every thread that may read the camera to exit.
+
+        Returns:
+            list: The threads still inside a read after timeout. The camera may only be used
+                (or released) when this is empty.
+        """
+        if self._keep_warm is not None:
+            self._keep_warm.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for reader in self._camera_readers:
+            reader.join(max(0.0, deadline - time.monotonic()))
+        busy = [reader for reader in self._camera_readers if reader.is_alive()]
+        if not busy:
+            self._keep_warm = None
+            self._camera_readers = []
+        return busy
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Maps the HTTP API onto the TrackerDaemon in self.server.tracker."""
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._reply(200, self.server.tracker.status())
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}."})
+
+    def do_POST(self):
+        daemon = self.server.tracker
+        try:
+            if self.path == "/sessions/start":
+                self._reply(200, daemon.start_session(parse_start_request(self._read_json())))
+            elif self.path == "/sessions/stop":
+                self._reply(200, daemon.stop_session())
+            else:
+                self._reply(404, {"error": f"Unknown path {self.path}."})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+        except SessionConflict as e:
+            self._reply(409, {"error": str(e)})
+        except CameraBusy as e:
+            self._reply(503, {"error": str(e)})
+        except Exception as e:
+            daemon.logger.error(f"Error handling {self.path}: {e}", exc_info=True)
+            self._reply(500, {"error": "An unexpected tracker error occurred."})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        self.server.tracker.logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+
+def serve(daemon, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serves the HTTP API until SIGINT or SIGTERM, then shuts the daemon down."""
+    server = ThreadingHTTPServer((host, port), _RequestHandler)
+    server.tracker = daemon
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, stack: threading.Thread(target=server.shutdown).start())
+    daemon.logger.info(f"Tracker daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.shutdown()
+
+
+def send_request(method, path, body=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60.0):
+    """Calls the daemon's API and returns (HTTP status, decoded JSON body)."""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def setup_logging():
+    logger = logging.getLogger("tracker_daemon")
+    logger.setLevel(logging.DEBUG)
+    os.makedirs(log_dir, exist_ok=True)
+    from tracker_logging import CompressingRotatingFileHandler, start_queued_logging, prune_logs_in_background
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    log_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_path = os.path.join(log_dir, f"tracker_daemon_{log_timestamp}.log")
+    handlers = (CompressingRotatingFileHandler(log_path), logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    # The daemon runs for days, so its log rotates instead of growing without bound.
+    start_queued_logging(logger, handlers)
+    prune_logs_in_background(log_dir, keep=(log_path,), logger=logger)
+    return logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the tracker warm and run sessions on request.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address of the daemon's HTTP API. Keep it on localhost.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port of the daemon's HTTP API.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Load the detector, open the camera and serve session requests.")
+    source = serve_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--camera_index", type=int, help="Index of the camera to keep open.")
+    source.add_argument("--frame_bus", metavar="NAME", help="Read frames from a shared-memory frame bus instead of a camera.")
+    serve_parser.add_argument("--model", default=os.path.join(script_dir, "models", "best.pt"), help="Path to the YOLOv8 model file, or an exported model for --engine.")
+    serve_parser.add_argument("--engine", default="ultralytics", help="Inference backend for the detector (see inference_engines.ENGINES).")
+    serve_parser.add_argument("--threads", type=int, help="Number of intra-op CPU threads for the inference engine.")
+    serve_parser.add_argument("--queue_size", type=int, default=2, help="Capacity of the queues between the pipeline stages.")
+    serve_parser.add_argument("--no_roi_crop", action="store_true", help="Run the detector on full frames instead of the session's ROI crop.")
+    serve_parser.add_argument("--roi_crop_padding", type=int, default=32, help="Pixels of margin added around the ROI crop.")
+    serve_parser.add_argument("--push_port", type=int, nargs="?", const=8766, metavar="PORT", help="Push live stats over Server-Sent Events and serve a HUD browser source on localhost:PORT.")
+
+    start_parser = subparsers.add_parser("start", help="Start a session on a running daemon.")
+    start_parser.add_argument("--player_id", type=int, required=True)
+    start_parser.add_argument("--session_id", type=int, required=True)
+    start_parser.add_argument("--duel_id", type=int)
+    start_parser.add_argument("--league_round_id", type=int)
+    start_parser.add_argument("--time_limit_seconds", type=int)
+    start_parser.add_argument("--config", help="ROI configuration. Defaults to calibration_output_<player_id>.json.")
+
+    subparsers.add_parser("stop", help="Stop the running session.")
+    subparsers.add_parser("status", help="Show the daemon's state.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        logger = setup_logging()
+        push_server = None
+        if args.push_port is not None:
+            from overlay_push import StatsPushServer
+            try:
+                push_server = StatsPushServer(logger, port=args.push_port).start()
+            except OSError as e:
+                logger.error(f"Could not start the overlay push server on port {args.push_port}: {e}")
+        try:
+            daemon = TrackerDaemon(args.frame_bus if args.frame_bus else args.camera_index, logger, args.model,
+                                   engine=args.engine, threads=args.threads, from_frame_bus=args.frame_bus is not None,
+                                   queue_size=args.queue_size, roi_crop=not args.no_roi_crop,
+                                   roi_crop_padding=args.roi_crop_padding, stats_publisher=push_server)
+        except IOError as e:
+            logger.error(f"{e} Exiting.")
+            if push_server is not None:
+                push_server.close()
+            return
+        try:
+            serve(daemon, args.host, args.port)
+        finally:
+            if push_server is not None:
+                push_server.close()
+        return
+
+    if args.command == "start":
+        body = {key: getattr(args, key) for key in START_FIELDS}
+        status, reply = send_request("POST", "/sessions/start", body, args.host, args.port)
+    elif args.command == "stop":
+        status, reply = send_request("POST", "/sessions/stop", host=args.host, port=args.port)
+    else:
+        status, reply = send_request("GET", "/status", host=args.host, port=args.port)
+    print(json.dumps(reply, indent=2))
+    if status != 200:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Non-blocking debug logging for the tracker.
+
+Log calls on the capture, inference and classifier threads only put the record on a bounded
+queue (a QueueHandler). A QueueListener thread formats and writes them. If the queue is full
+because the disk is stalled, records are counted and dropped instead of blocking a frame.
+DEBUG records can be sampled (keep 1 in N) before they are even queued.
+
+Files rotate by size. Rotated files are gzip-compressed on the listener thread. prune_logs
+compresses the debug logs of finished sessions and deletes the oldest finished debug logs and
+traces once they exceed a size budget, so a kiosk disk stops filling up. Putt logs and detection
+caches are session data; they are never pruned and do not count towards the budget.
+"""
+import os
+import time
+import glob
+import gzip
+import queue
+import atexit
+import shutil
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_MAX_BYTES = 20 * 1024 * 1024    # Size at which a log file is rotated
+LOG_BACKUP_COUNT = 5                # Compressed rotations kept per log file
+LOG_DIR_BUDGET_BYTES = 500 * 1024 * 1024
+QUEUE_SIZE = 10000
+FINISHED_AFTER_SECONDS = 6 * 3600  # A debug log untouched this long belongs to a finished session
+
+# Files prune_logs may compress or delete, oldest first. Everything else in logs/ is kept.
+PRUNABLE_PATTERNS = ("debug_log_*", "tracker_debug.log*", "multi_bay_*.log*", "tracker_daemon_*.log*", "trace_*.npz")
+
+
+class LevelSampler(logging.Filter):
+    """Keeps 1 in N records of each sampled level. Levels without a rate always pass."""
+
+    def __init__(self, rates=None):
+        """
+        Args:
+            rates (dict): Level (e.g. logging.DEBUG) -> N. N <= 1 keeps every record.
+        """
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._counts = {}
+        self.dropped = 0
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1)
+        if rate <= 1:
+            return True
+        count = self._counts.get(record.levelno, 0)
+        self._counts[record.levelno] = count + 1
+        if count % rate == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """A QueueHandler that drops records instead of raising or blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """
+    A RotatingFileHandler whose rotated files are gzip-compressed (<name>.1.gz, <name>.2.gz, ...).
+
+    Only for files a single process writes: a process that rotates renames the file out from
+    under every other writer.
+    """
+
+    def __init__(self, filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, **kwargs):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, **kwargs)
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+
+
+def start_queued_logging(logger, handlers, sampler=None, queue_size=QUEUE_SIZE):
+    """
+    Routes logger through a bounded queue to handlers, which run on a listener thread.
+
+    Any handlers already on logger are replaced. The listener is stopped (and the queue
+    drained) at interpreter exit.
+
+    Args:
+        logger (logging.Logger): The logger to make non-blocking.
+        handlers (list): The handlers that do the I/O, with their formatters set.
+        sampler (LevelSampler): Optional. Applied before records are queued.
+        queue_size (int): Records buffered before new ones are dropped.
+
+    Returns:
+        QueueListener: The started listener.
+    """
+    queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    if sampler is not None:
+        queue_handler.addFilter(sampler)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener):
+    """Writes out the queued records and stops the listener. Safe to call more than once."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def dropped_records(logger):
+    """Number of records a queued logger dropped because its queue was full."""
+    return sum(getattr(handler, "dropped", 0) for handler in logger.handlers if isinstance(handler, QueueHandler))
+
+
+def prune_logs(log_dir, keep=(), budget_bytes=LOG_DIR_BUDGET_BYTES, logger=None):
+    """
+    Compresses finished debug logs and deletes the oldest finished ones over the size budget.
+
+    Only files matching PRUNABLE_PATTERNS count towards the budget. A file modified within
+    FINISHED_AFTER_SECONDS may belong to another running tracker and is never touched.
+
+    Args:
+        log_dir (str): The logs directory.
+        keep (iterable): Paths in use by this process; never touched.
+        budget_bytes (int): Total size of the prunable files above which the oldest finished ones are deleted.
+        logger: Optional logger for what was removed.
+    """
+    keep = tuple(os.path.abspath(path) for path in keep) # Also covers their rotated files
+    now = time.time()
+
+    def finished(path):
+        return not os.path.abspath(path).startswith(keep) and now - os.path.getmtime(path) >= FINISHED_AFTER_SECONDS
+
+    for path in glob.glob(os.path.join(log_dir, "debug_log_*.txt")):
+        try:
+            if finished(path):
+                _gzip_rotator(path, path + ".gz")
+        except OSError as e:
+            if logger is not None:
+                logger.error(f"Error compressing {path}: {e}")
+
+    candidates = set()
+    for pattern in PRUNABLE_PATTERNS:
+        candidates.update(glob.glob(os.path.join(log_dir, pattern)))
+    try:
+        total = sum(os.path.getsize(path) for path in candidates)
+        candidates = sorted((path for path in candidates if finished(path)), key=os.path.getmtime)
+    except OSError:
+        return
+    removed = 0
+    for path in candidates:
+        if total <= budget_bytes:
+            break
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if logger is None:
+        return
+    budget_mb = budget_bytes // (1024 * 1024)
+    if removed:
+        logger.info(f"Removed {removed} old log files to keep the logs in {log_dir} under {budget_mb} MB.")
+    if total > budget_bytes:
+        logger.warning(f"Logs in {log_dir} take {total // (1024 * 1024)} MB, over the {budget_mb} MB budget, "
+                       f"but the rest are in use or less than {FINISHED_AFTER_SECONDS // 3600} hours old.")
+
+
+def prune_logs_in_background(log_dir, keep=(), budget_bytes=LOG_DIR_BUDGET_BYTES, logger=None):
+    """Runs prune_logs on a daemon thread so startup does not wait on the disk."""
+    thread = threading.Thread(target=prune_logs, args=(log_dir, keep, budget_bytes, logger), name="prune-logs", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,391 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Drop policies for the bounded queues between pipeline stages.
+DROP_OLDEST = "drop_oldest"  # Discard the stalest queued frame to make room (live feeds)
+DROP_NEWEST = "drop_newest"  # Discard the incoming frame when the queue is full
+BLOCK = "block"              # Wait for room; never drop a frame (recorded videos)
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+END_OF_STREAM = object()  # Queued by a producer after its last packet
+
+
+class FramePacket:
+    """A captured frame plus the metadata that travels with it through the pipeline."""
+    __slots__ = ("index", "capture_time", "video_time", "frame", "detections")
+
+    def __init__(self, index, capture_time, video_time, frame):
+        self.index = index                # Sequential capture index, used to verify ordering
+        self.capture_time = capture_time  # Wall-clock time (time.time()) when the frame was read
+        self.video_time = video_time      # Position in the source, in seconds
+        self.frame = frame
+        self.detections = None            # Filled in by the inference stage
+
+
+class StageQueue:
+    """A bounded FIFO between two pipeline stages that applies a drop policy when full."""
+
+    def __init__(self, maxsize, drop_policy=DROP_OLDEST):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}'. Expected one of {DROP_POLICIES}.")
+        self.maxsize = max(1, maxsize)
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+    def put(self, packet, stop_event):
+        """
+        Queues a packet according to the drop policy.
+
+        Returns:
+            bool: True if the packet was queued, False if it was dropped or the pipeline is stopping.
+        """
+        if self.drop_policy == BLOCK:
+            return self._put_blocking(packet, stop_event)
+
+        while True:
+            try:
+                self._queue.put_nowait(packet)
+                return True
+            except queue.Full:
+                if self.drop_policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+            # DROP_OLDEST: evict the head of the queue and retry
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def put_end(self, stop_event):
+        """Queues the end-of-stream marker. The marker itself is never dropped."""
+        self._put_blocking(END_OF_STREAM, stop_event)
+
+    def get(self, stop_event):
+        """Returns the next packet, or None at end of stream or when the pipeline is stopped."""
+        while not stop_event.is_set():
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            return None if item is END_OF_STREAM else item
+        return None
+
+    def get_nowait(self):
+        """Returns the next packet, None if nothing is queued, or END_OF_STREAM once the producer has finished."""
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Discards everything queued so blocked producers can exit."""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put_blocking(self, item, stop_event):
+        while not stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class _Stage(threading.Thread):
+    """Base class for a pipeline worker thread that tracks its own throughput."""
+
+    def __init__(self, name, stop_event, logger):
+        super().__init__(name=name, daemon=True)
+        self.stop_event = stop_event
+        self.logger = logger
+        self.processed = 0
+        self.busy_time = 0.0
+        self.error = None
+
+    def stage_fps(self):
+        """Frames per second this stage could sustain on its own (excludes time spent waiting)."""
+        return self.processed / self.busy_time if self.busy_time > 0 else 0.0
+
+
+class CaptureStage(_Stage):
+    """
+    Reads frames from a cv2.VideoCapture as fast as the source delivers them, or no faster
+    than the interval returned by frame_interval (used for the idle power mode).
+
+    While throttled, frames between two reads are still taken from the device with grab(),
+    which skips decoding them. Otherwise they would pile up in the driver buffer and the
+    first frames after motion resumes would be stale, with capture times that are too late.
+    """
+
+    def __init__(self, cap, out_queue, stop_event, logger, is_live_feed, frame_interval=None):
+        super().__init__("capture", stop_event, logger)
+        self.cap = cap
+        self.out_queue = out_queue
+        self.is_live_feed = is_live_feed
+        self.frame_interval = frame_interval
+        self.grabbed = 0  # Frames discarded undecoded while throttled
+
+    def run(self):
+        start_time = time.time()
+        last_read = 0.0
+        throttled = False
+        try:
+            while not self.stop_event.is_set():
+                if self.frame_interval is not None:
+                    interval = self.frame_interval()
+                    if (interval > 0) != throttled:
+                        throttled = interval > 0
+                        self.logger.info("Capture entering idle frame rate." if throttled else "Capture back to full frame rate.")
+                    if time.time() < last_read + interval:
+                        # Not due yet: drop the device's next frame undecoded.
+                        if not self.cap.grab():
+                            self.logger.info("End of video or cannot read frame.")
+                            break
+                        self.grabbed += 1
+                        continue
+                    last_read = time.time()
+                t0 = time.perf_counter()
+                ret, frame = self.cap.read()
+                capture_time = time.time()
+                if not ret:
+                    self.logger.info("End of video or cannot read frame.")
+                    break
+                if self.is_live_feed:
+                    video_time = capture_time - start_time
+                else:
+                    video_time = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                packet = FramePacket(self.processed, capture_time, video_time, frame)
+                self.processed += 1
+                self.busy_time += time.perf_counter() - t0
+                self.out_queue.put(packet, self.stop_event)
+        except Exception as e:
+            self.error = e
+            self.logger.error(f"Capture stage failed: {e}", exc_info=True)
+        finally:
+            self.out_queue.put_end(self.stop_event)
+
+    def release_capture(self):
+        """
+        Releases the capture once this thread has exited.
+
+        Releasing a cv2.VideoCapture during a concurrent read can crash OpenCV, e.g. when a USB
+        camera stalls inside read(). In that case the capture is left open and False is returned.
+        """
+        if self.is_alive():
+            self.logger.error("Capture thread is still blocked reading a frame; not releasing the video source under it.")
+            return False
+        self.cap.release()
+        return True
+
+
+class InferenceStage(_Stage):
+    """Runs the ball detector on each captured frame, in capture order."""
+
+    def __init__(self, detect, in_queue, out_queue, stop_event, logger, detect_batch=None, batch_size=1,
+                 motion_gate=None, scheduler=None, tracker=None):
+        super().__init__("inference", stop_event, logger)
+        self.detect = detect
+        self.motion_gate = motion_gate
+        self.scheduler = scheduler
+        self.tracker = tracker
+        self.detect_batch = detect_batch
+        self.batch_size = batch_size if detect_batch is not None else 1
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+
+    def run(self):
+        try:
+            if self.batch_size > 1:
+                self._run_batched()
+            else:
+                self._run_single()
+        except Exception as e:
+            self.error = e
+            self.logger.error(f"Inference stage failed: {e}", exc_info=True)
+        finally:
+            self.out_queue.put_end(self.stop_event)
+
+    def _run_single(self):
+        last_detections = []
+        while True:
+            packet = self.in_queue.get(self.stop_event)
+            if packet is None:
+                return
+            t0 = time.perf_counter()
+            if self.scheduler is not None and not self.scheduler.should_detect(packet.capture_time):
+                # Rate-limited frame: the ball may be moving, so extrapolate it when a tracker is available.
+                run_detector = False
+                # Without a live track (none yet, or all coasted out) the last detections stand.
+                predicted = self.tracker.predict(packet.capture_time) if self.tracker is not None else None
+                packet.detections = predicted if predicted else list(last_detections)
+            elif self.motion_gate is not None and not self.motion_gate.check(packet.frame, packet.capture_time):
+                # Nothing moved inside the ROIs: the previous detections still describe the scene.
+                run_detector = False
+                packet.detections = list(last_detections)
+                if self.tracker is not None:
+                    # Confirms the resting ball so its track does not coast out before the next rate-limited frame.
+                    self.tracker.update(last_detections, packet.capture_time)
+            else:
+                run_detector = True
+                packet.detections = self.detect(packet.frame)
+                last_detections = packet.detections
+                if self.tracker is not None:
+                    self.tracker.update(packet.detections, packet.capture_time)
+            # Skipped frames still go to the classifier so its timeouts keep advancing.
+            if self.scheduler is not None:
+                self.scheduler.record(packet.capture_time, run_detector)
+            self.processed += 1
+            self.busy_time += time.perf_counter() - t0
+            self.out_queue.put(packet, self.stop_event)
+
+    def _run_batched(self):
+        end_of_stream = False
+        while not end_of_stream:
+            batch = []
+            while len(batch) < self.batch_size:
+                packet = self.in_queue.get(self.stop_event)
+                if packet is None:
+                    end_of_stream = True
+                    break
+                batch.append(packet)
+            if not batch:
+                return
+
+            t0 = time.perf_counter()
+            batch_detections = self.detect_batch([packet.frame for packet in batch])
+            self.processed += len(batch)
+            self.busy_time += time.perf_counter() - t0
+            for packet, detections in zip(batch, batch_detections):
+                packet.detections = detections
+                self.out_queue.put(packet, self.stop_event)
+
+
+class TrackerPipeline:
+    """
+    Capture -> inference -> classification pipeline connected by bounded queues.
+
+    Capture and inference each run on their own thread; the classifier/output stage is the
+    caller's thread, which iterates over results(). Packets are delivered in capture order
+    with the timestamps recorded at capture time, so end-to-end throughput is bounded by the
+    slowest stage instead of the sum of all stages.
+    """
+
+    def __init__(self, cap, detect, logger, is_live_feed, queue_size=2, drop_policy=None,
+                 detect_batch=None, batch_size=1, motion_gate=None, idle_fps=None, scheduler=None,
+                 tracker=None):
+        """
+        Args:
+            cap: An opened cv2.VideoCapture (camera or video file).
+            detect (callable): Takes a frame and returns the detected_balls list.
+            logger: Logger used for pipeline status and errors.
+            is_live_feed (bool): True for a camera, False for a recorded video.
+            queue_size (int): Capacity of each inter-stage queue.
+            drop_policy (str): One of DROP_POLICIES. Defaults to DROP_OLDEST for live feeds,
+                so capture never stalls, and BLOCK for recorded videos, so no frame is skipped.
+            detect_batch (callable): Optional. Takes a list of frames and returns one
+                detected_balls list per frame. Used when batch_size > 1.
+            batch_size (int): Number of frames handed to detect_batch at once. The capture
+                queue is enlarged so decoding can run at least one batch ahead.
+            motion_gate (MotionGate): Optional. Skips the detector on frames without motion
+                inside the ROIs. Only used when batch_size is 1.
+            idle_fps (float): Optional. Rate at which a live feed's frames are passed on once motion_gate
+                reports idle. The device is still read at its own rate, see CaptureStage.
+            scheduler (DetectionScheduler): Optional. Lowers the detector rate depending on the
+                classifier state reported through set_classifier_state. Only used when batch_size is 1.
+            tracker (BallTracker): Optional. Predicts ball positions on frames the scheduler skips,
+                instead of repeating the last detections.
+        """
+        if drop_policy is None:
+            drop_policy = DROP_OLDEST if is_live_feed else BLOCK
+        if detect_batch is not None and batch_size > 1:
+            queue_size = max(queue_size, 2 * batch_size)
+        self.logger = logger
+        self.stop_event = threading.Event()
+        self.capture_queue = StageQueue(queue_size, drop_policy)
+        self.result_queue = StageQueue(queue_size, drop_policy)
+        frame_interval = None
+        if motion_gate is not None and idle_fps and is_live_feed:
+            frame_interval = lambda: (1.0 / idle_fps) if motion_gate.is_idle(time.time()) else 0.0
+        self.motion_gate = motion_gate
+        self.scheduler = scheduler
+        self.capture_stage = CaptureStage(cap, self.capture_queue, self.stop_event, logger, is_live_feed,
+                                          frame_interval=frame_interval)
+        self.inference_stage = InferenceStage(detect, self.capture_queue, self.result_queue, self.stop_event, logger,
+                                              detect_batch=detect_batch, batch_size=batch_size,
+                                              motion_gate=motion_gate, scheduler=scheduler, tracker=tracker)
+        self.delivered = 0
+        self.start_time = None
+        self._last_index = -1
+
+    def start(self):
+        self.start_time = time.time()
+        self.capture_stage.start()
+        self.inference_stage.start()
+        self.logger.info(f"Tracker pipeline started (queue size {self.capture_queue.maxsize}, drop policy '{self.capture_queue.drop_policy}', batch size {self.inference_stage.batch_size}).")
+
+    def results(self):
+        """Yields processed FramePackets in capture order until the source is exhausted or stop() is called."""
+        while True:
+            packet = self.result_queue.get(self.stop_event)
+            if packet is None:
+                return
+            if packet.index <= self._last_index:
+                # Cannot happen with FIFO queues and a single inference worker; guard against regressions.
+                self.logger.error(f"Out-of-order frame {packet.index} after {self._last_index}; dropping it.")
+                continue
+            self._last_index = packet.index
+            self.delivered += 1
+            yield packet
+
+    def set_classifier_state(self, state):
+        """Reports the classifier state after a frame so the scheduler can adjust the detector rate."""
+        if self.scheduler is not None:
+            self.scheduler.set_state(state)
+
+    def stop(self):
+        """
+        Stops both worker threads and logs a throughput summary.
+
+        A thread still blocked after its join timeout (e.g. capture inside a stalled read) is left
+        running; release the source with release_capture(), not cap.release().
+        """
+        self.stop_event.set()
+        self.capture_queue.drain()
+        self.result_queue.drain()
+        self.capture_stage.join(timeout=2.0)
+        self.inference_stage.join(timeout=2.0)
+        for stage in (self.capture_stage, self.inference_stage):
+            if stage.is_alive():
+                self.logger.error(f"Pipeline {stage.name} thread did not stop within 2s.")
+        self.log_stats()
+
+    def release_capture(self):
+        """Releases the video source unless the capture thread is still inside a read. See CaptureStage.release_capture."""
+        return self.capture_stage.release_capture()
+
+    def log_stats(self):
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        end_to_end_fps = self.delivered / elapsed if elapsed > 0 else 0.0
+        self.logger.info(
+            f"Pipeline stats: captured={self.capture_stage.processed}, inferred={self.inference_stage.processed}, "
+            f"delivered={self.delivered}, dropped(capture)={self.capture_queue.dropped}, "
+            f"dropped(results)={self.result_queue.dropped}, capture_fps={self.capture_stage.stage_fps():.1f}, "
+            f"inference_fps={self.inference_stage.stage_fps():.1f}, end_to_end_fps={end_to_end_fps:.1f}"
+        )
+        if self.capture_stage.grabbed:
+            self.logger.info(f"Capture discarded {self.capture_stage.grabbed} frames undecoded at the idle frame rate.")
+        if self.motion_gate is not None:
+            self.logger.info(f"Motion gate skipped the detector on {self.motion_gate.frames_skipped} of {self.motion_gate.frames_checked} frames.")
+        if self.scheduler is not None:
+            for state, rates in self.scheduler.report().items():
+                self.logger.info(f"Effective rate in '{state}': {rates['frame_fps']} fps, detector {rates['detection_fps']} fps "
+                                 f"({rates['detections']}/{rates['frames']} frames over {rates['seconds']}s).")
@@ -0,0 +1,214 @@
+"""
+Scoring for one putting session, shared by run_tracker and multi_bay_host.
+
+A TrackerSession turns each frame's detections into putt classifications. It starts the
+session clock when the ball first reaches the ramp, keeps the make/miss counters, writes the
+putt log and the OBS text files, and enforces the session time limit.
+"""
+import time
+
+from putt_classifier import RoiFlags
+from obs_writer import ObsWriter, stats_to_obs_values
+
+class TrackerSession:
+    """Per-frame scoring state of one session: clock, counters, putt log and OBS output."""
+
+    def __init__(self, classifier, event_log, debug_logger, obs_dir, time_limit_seconds=None,
+                 offline_mode=False, detection_writer=None, stats_publisher=None):
+        """
+        Args:
+            classifier (PuttClassifier): This session's classifier.
+            event_log (SessionEventLog): Receives one record per putt. Closed by close().
+            debug_logger: Logger for session events and errors.
+            obs_dir (str): Directory of this session's OBS text files. They are reset right away and
+                written by a background ObsWriter, so scoring never waits on the disk. None writes no
+                OBS files (e.g. when re-scoring archived sessions).
+            time_limit_seconds (int): Optional session duration limit, counted from the session clock.
+            offline_mode (bool): Drive the session clock with the video's timestamps instead of capture times.
+            detection_writer (DetectionCacheWriter): Optional. Receives every frame's detections.
+            stats_publisher (StatsPushServer): Optional. Receives a snapshot (see snapshot()) whenever
+                the session starts, its clock starts, a putt is scored and it ends.
+        """
+        self.classifier = classifier
+        self.event_log = event_log
+        self.logger = debug_logger
+        self.obs_dir = obs_dir
+        self.obs_writer = ObsWriter(obs_dir, debug_logger) if obs_dir is not None else None
+        if self.obs_writer is not None:
+            self.obs_writer.reset()
+        self.time_limit_seconds = time_limit_seconds
+        self.offline_mode = offline_mode
+        self.detection_writer = detection_writer
+        self.stats_publisher = stats_publisher
+        self.last_detailed_classification = ""
+        self.closed = False
+
+        self.session_start_time = None # This will be the time of the first putt in ramp
+        self.frame_time = None
+        self.frame_count = 0
+        self.total_makes = 0
+        self.total_misses = 0
+        self.consecutive_makes = 0
+        self.max_consecutive_makes = 0
+        self.scoring_active = False
+        self.roi_flags = RoiFlags(0) # ROI membership of the primary ball in the previous frame
+        self.time_limit_reached = False
+        self._publish()
+
+        if time_limit_seconds:
+            debug_logger.info(f"Session time limit is active: {time_limit_seconds} seconds ({time_limit_seconds / 60:.2f} minutes).")
+
+    @property
+    def stats(self):
+        """(total_makes, total_misses, consecutive_makes, max_consecutive_makes), as the overlay shows them."""
+        return self.total_makes, self.total_misses, self.consecutive_makes, self.max_consecutive_makes
+
+    def current_video_time(self):
+        """Session-relative time of the last frame, 0 before the session clock starts."""
+        if self.session_start_time is None or self.frame_time is None:
+            return 0.0
+        return self.frame_time - self.session_start_time
+
+    def process(self, packet):
+        """
+        Classifies one frame's detections and scores the putt, if one finished.
+
+        Once the time limit is reached, time_limit_reached is set and the frame is not scored;
+        the caller should end the session.
+
+        Returns:
+            FrameResult: The classifier's output for the frame.
+        """
+        self.frame_count += 1
+        self.frame_time = packet.video_time if self.offline_mode else packet.capture_time
+
+        # Detect first putt in ramp to start session timer
+        if self.session_start_time is None and self.roi_flags.ramp:
+            self.session_start_time = self.frame_time
+            self.logger.info(f"First putt detected in ramp. Session timer started at {self.session_start_time}.")
+            self._publish()
+
+        current_video_time = self.current_video_time() # Session-relative time of capture
+
+        if self.detection_writer is not None:
+            self.detection_writer.append(self.frame_time, packet.detections)
+
+        result = self.classifier.update_and_classify(packet.detections, current_video_time) # Pass session-relative time
+        self.roi_flags = result.roi_flags
+
+        # Check for session time limit
+        if self.time_limit_seconds is not None and current_video_time >= self.time_limit_seconds:
+            self.logger.info(f"Session time limit of {self.time_limit_seconds} seconds reached. Ending session.")
+            self.time_limit_reached = True
+            return result
+
+        if result.classification:
+            self._score(result, current_video_time)
+        return result
+
+    def _score(self, result, current_video_time):
+        classification = result.classification
+        self.event_log.append(current_video_time, classification, result.detailed_classification,
+                              result.ball_center, result.transition_history)
+
+        if not self.scoring_active:
+            self.scoring_active = True
+            self.logger.info("Scoring activated: First putt detected.")
+
+        if classification.startswith("MAKE"):
+            self.total_makes += 1
+            self.consecutive_makes += 1
+            if self.consecutive_makes > self.max_consecutive_makes:
+                self.max_consecutive_makes = self.consecutive_makes
+        elif classification.startswith("MISS"):
+            self.total_misses += 1
+            self.consecutive_makes = 0
+
+        if self.obs_writer is not None:
+            obs_values = stats_to_obs_values(*self.stats)
+            obs_values["DetailedClassification.txt"] = result.detailed_classification
+            self.obs_writer.update(obs_values)
+        self.last_detailed_classification = result.detailed_classification
+        self._publish()
+
+    def snapshot(self):
+        """The session's stats as pushed to overlay clients."""
+        return {
+            "total_makes": self.total_makes,
+            "total_misses": self.total_misses,
+            "total_putts": self.total_makes + self.total_misses,
+            "consecutive_makes": self.consecutive_makes,
+            "max_consecutive_makes": self.max_consecutive_makes,
+            "detailed_classification": self.last_detailed_classification,
+            "session_time": self.current_video_time() if self.session_start_time is not None else None,
+            "time_limit_seconds": self.time_limit_seconds,
+            "running": self.session_start_time is not None and not self.closed,
+        }
+
+    def _publish(self):
+        if self.stats_publisher is not None:
+            self.stats_publisher.publish(self.snapshot())
+
+    def close(self):
+        """
+        Closes the event log, flushes the OBS files, saves the detection cache, if any, and logs the playing duration.
+
+        Returns:
+            int: Seconds from the session clock's start to the last frame (offline) or now (live), 0 if it never started.
+        """
+        self.closed = True
+        self._publish()
+        try:
+            self.event_log.close()
+        except (IOError, OSError) as e:
+            self.logger.error(f"Error closing the session event log: {e}")
+        if self.obs_writer is not None:
+            self.obs_writer.close()
+            self.logger.info(f"OBS files: {self.obs_writer.writes} written, {self.obs_writer.skipped} unchanged values skipped.")
+        if self.detection_writer is not None:
+            try:
+                cache_path = self.detection_writer.close(total_makes=self.total_makes, total_misses=self.total_misses,
+                                                         max_consecutive_makes=self.max_consecutive_makes)
+                self.logger.info(f"Saved detections for {self.detection_writer.frame_count} frames to {cache_path}.")
+            except (IOError, OSError) as e:
+                self.logger.error(f"Error saving detections: {e}")
+        end_time = self.frame_time if self.offline_mode and self.frame_time is not None else time.time()
+        # Calculate session_duration based on session_start_time if it was set
+        if self.session_start_time is not None:
+            session_duration = round(end_time - self.session_start_time)
+            self.logger.info(f"Session ended. Actual playing duration: {session_duration} seconds.")
+        else:
+            session_duration = 0
+            self.logger.info("Session ended. No putts detected in ramp, so playing duration is 0.")
+        return session_duration
+
+
+def report_session(event_log_path, player_id, session_id, reports_dir, debug_logger, duel_id=None, league_round_id=None):
+    """Generates the session report and records the session, player stats, duel and league results in the database."""
+    # Imported here so the database stack does not slow down tracker startup.
+    import data_manager
+    from session_reporter import SessionReporter
+
+    # Get player info for the report
+    player_info = data_manager.get_player_info(player_id)
+
+    reporter = SessionReporter(event_log_path) # Initialize with only the putt log path
+    reporter.load_and_process_data() # Load and process data from the CSV
+
+    # Generate report and get the report data
+    reporter.generate_report(reports_dir, player_info) # Pass output_dir and player_info
+
+    debug_logger.info(f"Session report generated for session {session_id}")
+
+    # Update session stats in the database using data from the reporter
+    data_manager.update_session(session_id, reporter)
+    debug_logger.info(f"Updated session {session_id} in the database.")
+
+    # Recalculate all-time player stats
+    data_manager.recalculate_player_stats(player_id)
+
+    if duel_id:
+        data_manager.submit_duel_session(duel_id, session_id, player_id)
+
+    if league_round_id:
+        data_manager.submit_league_session(league_round_id, player_id, session_id, reporter.total_makes)
@@ -1,20 +1,95 @@
+import math
 import cv2
-from ultralytics import YOLO
+import numpy as np
+from inference_engines import create_engine, DEFAULT_IMGSZ
+
+# Input size the detector was trained with; full frames are letterboxed to this size.
+MODEL_IMGSZ = DEFAULT_IMGSZ
+
+def compute_roi_crop_rect(rois, padding=32):
+    """
+    Computes the union bounding rectangle of the calibrated ROIs.
+
+    Args:
+        rois (dict): ROI name -> polygon points (list, NumPy array or {'points': [...]}),
+            as returned by load_and_prepare_rois.
+        padding (int): Extra pixels added on every side so balls straddling an ROI edge
+            are still fully inside the crop.
+
+    Returns:
+        tuple: (x1, y1, x2, y2) in full-frame pixels (x2/y2 exclusive), or None if no ROI has points.
+    """
+    polygons = []
+    for name, data in rois.items():
+        # The ignore area only ever removes detections, so it does not need to be searched.
+        if name in ("camera_index", "IGNORE_AREA_ROI"):
+            continue
+        if isinstance(data, dict) and 'points' in data:
+            data = data['points']
+        points = np.array(data, dtype=np.int32).reshape(-1, 2)
+        if len(points) > 0:
+            polygons.append(points)
+
+    if not polygons:
+        return None
+
+    x, y, w, h = cv2.boundingRect(np.concatenate(polygons))
+    return (max(0, x - padding), max(0, y - padding), x + w + padding, y + h + padding)
+
+def crop_frame(frame, crop_rect):
+    """
+    Returns the region of a frame to run inference on, its top-left offset and the inference size.
+
+    The inference size keeps the crop at the same pixel scale full frames are resized to,
+    so balls appear at the size the model was trained on while the input shrinks with
+    the crop area. An imgsz of None means the full frame is used with the model default.
+    """
+    if crop_rect is None:
+        return frame, (0, 0), None
+
+    frame_h, frame_w = frame.shape[:2]
+    x1, y1, x2, y2 = crop_rect
+    x1, y1 = min(max(0, x1), frame_w - 1), min(max(0, y1), frame_h - 1)
+    x2, y2 = min(frame_w, x2), min(frame_h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return frame, (0, 0), None
+
+    scale = min(1.0, MODEL_IMGSZ / max(frame_w, frame_h))
+    imgsz = math.ceil(max(x2 - x1, y2 - y1) * scale / 32) * 32
+    imgsz = int(min(MODEL_IMGSZ, max(32, imgsz)))
+    return frame[y1:y2, x1:x2], (x1, y1), imgsz
 
 class VideoProcessor:
-    def __init__(self, model_path, min_bbox_area=50):
+    def __init__(self, model_path, min_bbox_area=50, crop_rect=None, engine="ultralytics", threads=None, logger=None):
         """
         Initializes the VideoProcessor with the YOLO model.
 
         Args:
-            model_path (str): The path to the YOLOv8 model file (e.g., 'best.pt').
+            model_path (str): The path to the YOLOv8 model file (e.g., 'best.pt'), or an exported
+                model for the chosen engine.
             min_bbox_area (int): The minimum area of a bounding box to be considered a valid detection.
+            crop_rect (tuple): Optional (x1, y1, x2, y2) region to run inference on. See set_roi_crop.
+            engine (str): Inference backend, one of inference_engines.ENGINES.
+            threads (int): Optional number of intra-op threads for the engine.
+            logger: Optional logger for engine setup messages (e.g. model export).
         """
-        self.model = YOLO(model_path)
+        self.engine = create_engine(engine, model_path, threads=threads, logger=logger)
+        self.model = self.engine.model
         # These are placeholders; they will be updated by the first frame processed.
         self.original_width = 1920
         self.original_height = 1080
         self.min_bbox_area = min_bbox_area
+        self.crop_rect = crop_rect
+
+    def set_roi_crop(self, rois, padding=32):
+        """
+        Restricts inference to the union bounding rectangle of the calibrated ROIs.
+
+        Detections are mapped back to full-frame coordinates, so callers see the same
+        values as with full-frame inference.
+        """
+        self.crop_rect = compute_roi_crop_rect(rois, padding)
+        return self.crop_rect
 
     def process_frame(self, frame):
         """
@@ -31,17 +106,85 @@ class VideoProcessor:
         if self.original_height != frame.shape[0] or self.original_width != frame.shape[1]:
             self.original_height, self.original_width = frame.shape[:2]
 
-        results = self.model(frame, verbose=False)
-        detected_balls = []
+        crop, offset, imgsz = self._crop(frame)
+        return self._extract_detections(self.engine.predict([crop], imgsz)[0], offset)
+
+    def process_batch(self, frames):
+        """
+        Processes several frames with a single call to the detector.
+
+        Batching amortizes the per-call overhead of the model and keeps all CPU cores busy,
+        which makes it much faster than calling process_frame repeatedly when replaying
+        recorded sessions.
+
+        Args:
+            frames: A list of video frames (NumPy arrays) of the same size.
+
+        Returns:
+            A list with one detection list per input frame, in the same order and with the
+            same format as process_frame.
+        """
+        if not frames:
+            return []
+        if self.original_height != frames[0].shape[0] or self.original_width != frames[0].shape[1]:
+            self.original_height, self.original_width = frames[0].shape[:2]
+
+        crops = [self._crop(frame) for frame in frames]
+        offset, imgsz = crops[0][1], crops[0][2]
+        results = self.engine.predict([c[0] for c in crops], imgsz)
+        return [self._extract_detections(r, offset) for r in results]
 
-        for r in results:
-            for box in r.boxes:
-                if box.cls == 0:  # Assuming class 0 is 'golf_ball'
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    w, h = x2 - x1, y2 - y1
-                    if w * h >= self.min_bbox_area:
-                        center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
-                        confidence = box.conf[0].cpu().numpy()
-                        detected_balls.append((center_x, center_y, x1, y1, x2, y2, confidence))
+    def process_frames_with_crops(self, frames, crop_rects):
+        """
+        Processes frames from different cameras, each restricted to its own crop rectangle,
+        in as few detector calls as possible: frames whose crops share an inference size are
+        batched together.
+
+        Args:
+            frames: A list of video frames (NumPy arrays), possibly of different sizes.
+            crop_rects: One (x1, y1, x2, y2) crop rectangle or None per frame, see compute_roi_crop_rect.
+
+        Returns:
+            A list with one detection list per input frame, in the same order and with the
+            same format as process_frame.
+        """
+        crops = [crop_frame(frame, crop_rect) for frame, crop_rect in zip(frames, crop_rects)]
+        groups = {}
+        for i, (_, _, imgsz) in enumerate(crops):
+            groups.setdefault(imgsz, []).append(i)
+        detections = [None] * len(frames)
+        for imgsz, indices in groups.items():
+            results = self.engine.predict([crops[i][0] for i in indices], imgsz)
+            for i, boxes in zip(indices, results):
+                detections[i] = self._extract_detections(boxes, crops[i][1])
+        return detections
+
+    def warmup(self, frame_shape=(1080, 1920, 3), runs=2):
+        """
+        Runs the detector on blank frames so one-time initialization (memory allocation,
+        kernel selection, graph optimization) happens before the first real frame.
+        """
+        blank = np.zeros(frame_shape, dtype=np.uint8)
+        for _ in range(runs):
+            self.process_frame(blank)
+
+    def _crop(self, frame):
+        return crop_frame(frame, self.crop_rect)
+
+    def _extract_detections(self, boxes, offset=(0, 0)):
+        """
+        Converts one image's engine output ((N, 6) rows of x1, y1, x2, y2, confidence, class)
+        into the detected_balls list format, in full-frame coordinates.
+        """
+        offset_x, offset_y = offset
+        detected_balls = []
+        for x1, y1, x2, y2, confidence, cls in boxes:
+            if cls == 0:  # Assuming class 0 is 'golf_ball'
+                x1, x2 = x1 + offset_x, x2 + offset_x
+                y1, y2 = y1 + offset_y, y2 + offset_y
+                w, h = x2 - x1, y2 - y1
+                if w * h >= self.min_bbox_area:
+                    center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
+                    detected_balls.append((center_x, center_y, x1, y1, x2, y2, confidence))
 
         return detected_balls